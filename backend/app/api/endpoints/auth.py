@@ -4,13 +4,13 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import config
-from app.core.auth import get_password_hash, verify_password
+from app.core.auth import get_password_hash, get_password_hash_async, verify_password_async
 from app.db.base import get_db
 from app.models.user import User
+from app.repositories.user import get_user_by_username, create_user
 from app.schemas.user import UserCreate, UserInDB, Token, TokenData
 
 router = APIRouter()
@@ -18,16 +18,15 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 async def get_user(db: AsyncSession, username: str):
-    query = await db.execute(User.__table__.select().where(User.username == username))
-    user = query.first()
+    user = await get_user_by_username(db, username)
     if user:
-        return UserInDB(**user._mapping)
+        return UserInDB.from_orm(user)
 
 async def authenticate_user(db: AsyncSession, username: str, password: str):
     user = await get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -91,17 +90,15 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
+    hashed_password = await get_password_hash_async(user.password)
+    db_user = await create_user(
+        db,
         username=user.username,
         email=user.email,
         hashed_password=hashed_password,
         role=user.role,
         is_active=True
     )
-    db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
     
     # Generate token
     access_token_expires = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
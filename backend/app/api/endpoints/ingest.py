@@ -10,6 +10,7 @@ import os
 from app.db.base import get_db
 from app.schemas.upload import Upload, UploadCreate
 from app.schemas.message import Message, MessageCreate
+from app.services.ingestion import ingest_records
 from app.utils.xlsx_parser import XLSXParser
 from app.tasks.drive_sync import check_drive_for_new_files
 
@@ -62,15 +63,11 @@ async def manual_upload(
         # Deduplicate records
         unique_records = XLSXParser.deduplicate_records(records)
         
-        # In a real implementation, we would:
-        # 1. Create an Upload record in the database
-        # 2. Process each record and create Message records
-        # 3. Update Fan, Chatter, and Creator records as needed
+        # Store the records as messages, updating rollups, search and alerts
+        result = await ingest_records(db, file.filename, file_hash, unique_records)
         
         return {
-            "status": "success",
-            "file_name": file.filename,
-            "file_hash": file_hash,
+            **result,
             "records_count": len(unique_records),
             "processed": True
         }
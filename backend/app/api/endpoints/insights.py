@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
+from celery.result import AsyncResult
+import json
 
-from app.core.auth import get_current_user, check_analyst_access
-from app.db.base import get_db
+from app.core.auth import get_current_user, check_analyst_access, check_streaming_analyst_access
+from app.db.base import get_db, database
+from app.repositories import ai_insight as insight_repo
 from app.models.user import User
 from app.models.ai_insight import AIInsight, TargetType
 from app.schemas.ai_insight import (
@@ -12,54 +16,75 @@ from app.schemas.ai_insight import (
     AIInsightCreate, 
     AIInsightUpdate,
     AIInsightGenerateRequest,
-    AIInsightGenerateResponse
+    AIInsightGenerateResponse,
+    AIInsightBatchGenerateRequest,
+    AIInsightBatchGenerateResponse,
+    AIInsightTaskStatus,
+    AIInsightBulkRequest,
+    AIInsightBulkResponse
 )
 from app.services.ai_service import AIService
+from app.services.insight_context import build_target_data
+from app.tasks import ai_insights as insight_tasks
+from celery_worker import celery_app
 
 router = APIRouter()
 ai_service = AIService()
 
 @router.get("/", response_model=List[AIInsightResponse])
 async def get_insights(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
     target_type: Optional[str] = None,
     target_id: Optional[int] = None,
     is_archived: bool = False,
+    tags: Optional[str] = None,
+    cursor: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Get all insights with optional filtering.
-    """
-    query = db.query(AIInsight).filter(AIInsight.is_archived == is_archived)
+    Get all insights with optional filtering, newest first.
     
+    tags is a comma-separated list; only insights carrying all of them are returned.
+    For large result sets page with cursor instead of skip: pass the X-Next-Cursor
+    header of the previous response.
+    """
+    enum_target_type = None
     if target_type:
         try:
             enum_target_type = TargetType[target_type.upper()]
-            query = query.filter(AIInsight.target_type == enum_target_type)
         except KeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid target_type: {target_type}"
             )
     
-    if target_id is not None:
-        query = query.filter(AIInsight.target_id == target_id)
-    
-    insights = query.order_by(AIInsight.created_at.desc()).offset(skip).limit(limit).all()
+    insights = await insight_repo.list_insights(
+        db,
+        is_archived=is_archived,
+        target_type=enum_target_type,
+        target_id=target_id,
+        tags=[tag.strip() for tag in tags.split(",") if tag.strip()] if tags else None,
+        before_id=cursor,
+        skip=skip,
+        limit=limit
+    )
+    if len(insights) == limit and insights:
+        response.headers["X-Next-Cursor"] = str(insights[-1].id)
     return insights
 
 @router.get("/{insight_id}", response_model=AIInsightResponse)
 async def get_insight(
     insight_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific insight by ID.
     """
-    insight = db.query(AIInsight).filter(AIInsight.id == insight_id).first()
+    insight = await insight_repo.get_insight(db, insight_id)
     if insight is None:
         raise HTTPException(status_code=404, detail="Insight not found")
     return insight
@@ -68,7 +93,7 @@ async def get_insight(
 async def create_insight(
     insight: AIInsightCreate,
     current_user: User = Depends(check_analyst_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new insight manually.
@@ -82,7 +107,8 @@ async def create_insight(
             detail=f"Invalid target_type: {insight.target_type}"
         )
     
-    db_insight = AIInsight(
+    db_insight = await insight_repo.create_insight(
+        db,
         target_type=enum_target_type,
         target_id=insight.target_id,
         summary=insight.summary,
@@ -92,9 +118,6 @@ async def create_insight(
         action_items=insight.action_items,
         metadata=insight.metadata
     )
-    db.add(db_insight)
-    db.commit()
-    db.refresh(db_insight)
     return db_insight
 
 @router.put("/{insight_id}", response_model=AIInsightResponse)
@@ -102,191 +125,145 @@ async def update_insight(
     insight_id: int,
     insight_update: AIInsightUpdate,
     current_user: User = Depends(check_analyst_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update an insight.
     Only accessible by admin, manager, and ops_analyst roles.
     """
-    db_insight = db.query(AIInsight).filter(AIInsight.id == insight_id).first()
+    db_insight = await insight_repo.get_insight(db, insight_id)
     if db_insight is None:
         raise HTTPException(status_code=404, detail="Insight not found")
     
     update_data = insight_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_insight, key, value)
-    
-    db.commit()
-    db.refresh(db_insight)
+    db_insight = await insight_repo.update_insight(db, db_insight, update_data)
     return db_insight
 
 @router.delete("/{insight_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_insight(
     insight_id: int,
     current_user: User = Depends(check_analyst_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete an insight.
     Only accessible by admin, manager, and ops_analyst roles.
     """
-    db_insight = db.query(AIInsight).filter(AIInsight.id == insight_id).first()
+    db_insight = await insight_repo.get_insight(db, insight_id)
     if db_insight is None:
         raise HTTPException(status_code=404, detail="Insight not found")
     
-    db.delete(db_insight)
-    db.commit()
+    await insight_repo.delete_insight(db, db_insight)
     return None
 
 @router.post("/archive/{insight_id}", response_model=AIInsightResponse)
 async def archive_insight(
     insight_id: int,
     current_user: User = Depends(check_analyst_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Archive an insight.
     Only accessible by admin, manager, and ops_analyst roles.
     """
-    db_insight = db.query(AIInsight).filter(AIInsight.id == insight_id).first()
+    db_insight = await insight_repo.get_insight(db, insight_id)
     if db_insight is None:
         raise HTTPException(status_code=404, detail="Insight not found")
     
-    db_insight.is_archived = True
-    db.commit()
-    db.refresh(db_insight)
+    db_insight = await insight_repo.update_insight(db, db_insight, {"is_archived": True})
     return db_insight
 
 @router.post("/unarchive/{insight_id}", response_model=AIInsightResponse)
 async def unarchive_insight(
     insight_id: int,
     current_user: User = Depends(check_analyst_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Unarchive an insight.
+    Unarchive an insight, making it the live insight for its target.
     Only accessible by admin, manager, and ops_analyst roles.
     """
-    db_insight = db.query(AIInsight).filter(AIInsight.id == insight_id).first()
+    db_insight = await insight_repo.get_insight(db, insight_id)
     if db_insight is None:
         raise HTTPException(status_code=404, detail="Insight not found")
     
-    db_insight.is_archived = False
-    db.commit()
-    db.refresh(db_insight)
+    db_insight = await insight_repo.update_insight(db, db_insight, {"is_archived": False})
     return db_insight
 
-async def _generate_insight_task(
-    target_type: str,
-    target_id: Optional[int],
-    custom_prompt: Optional[str],
-    db: Session
-):
-    """Background task to generate an insight"""
-    
-    # Get target data based on target type and ID
-    target_data = {}
-    
-    if target_type.upper() == "FAN" and target_id:
-        # Query fan data
-        from app.models.fan import Fan
-        fan = db.query(Fan).filter(Fan.id == target_id).first()
-        if fan:
-            target_data = {
-                "name": fan.name,
-                "total_spent": fan.total_spent,
-                "first_seen": str(fan.first_seen),
-                "last_active": str(fan.last_active),
-                "analyzed_at": datetime.now().isoformat()
-            }
-    
-    elif target_type.upper() == "CHATTER" and target_id:
-        # Query chatter data
-        from app.models.chatter import Chatter
-        chatter = db.query(Chatter).filter(Chatter.id == target_id).first()
-        if chatter:
-            target_data = {
-                "name": chatter.name,
-                "performance_score": chatter.performance_score,
-                "timezone": chatter.timezone,
-                "analyzed_at": datetime.now().isoformat()
-            }
-    
-    elif target_type.upper() == "CREATOR" and target_id:
-        # Query creator data
-        from app.models.creator import Creator
-        creator = db.query(Creator).filter(Creator.id == target_id).first()
-        if creator:
-            target_data = {
-                "name": creator.name,
-                "earnings_total": creator.earnings_total,
-                "join_date": str(creator.join_date) if creator.join_date else "Unknown",
-                "analyzed_at": datetime.now().isoformat()
-            }
-    
-    elif target_type.upper() == "MESSAGE" and target_id:
-        # Query message data
-        from app.models.message import Message
-        message = db.query(Message).filter(Message.id == target_id).first()
-        if message:
-            target_data = {
-                "fan_message": message.content,
-                "chatter_response": "Response not available",  # Would need to query the response
-                "analyzed_at": datetime.now().isoformat()
-            }
-    
-    else:  # GENERAL or fallback
-        # Get general stats
-        from app.models.fan import Fan
-        from app.models.chatter import Chatter
-        from app.models.creator import Creator
-        
-        total_fans = db.query(Fan).count()
-        active_fans = db.query(Fan).filter(
-            Fan.last_active >= datetime.now().date()
-        ).count()
-        total_chatters = db.query(Chatter).count()
-        total_creators = db.query(Creator).count()
-        
-        target_data = {
-            "total_fans": total_fans,
-            "active_fans": active_fans,
-            "total_chatters": total_chatters,
-            "total_creators": total_creators,
-            "analyzed_at": datetime.now().isoformat()
-        }
-    
-    # Generate insight using AI service
-    insight_data = await ai_service.generate_insight(target_type, target_data, custom_prompt)
+async def _bulk_mutation(action: str, request: AIInsightBulkRequest, db: AsyncSession) -> dict:
+    filters = request.filter.dict(exclude_none=True) if request.filter else {}
+    if not insight_repo.has_bulk_conditions(db, ids=request.ids, **filters):
+        # Never let an empty request (or one with only empty filters) touch every insight
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide ids or at least one filter"
+        )
     
-    # Create new insight in database
-    try:
-        enum_target_type = TargetType[target_type.upper()]
-    except KeyError:
-        enum_target_type = TargetType.GENERAL
+    if request.run_async:
+        task = await run_in_threadpool(
+            insight_tasks.bulk_mutate_insights.apply_async,
+            kwargs={
+                "action": action,
+                "ids": request.ids,
+                "filters": json.loads(request.filter.json(exclude_none=True)) if request.filter else {}
+            },
+            priority=insight_tasks.BATCH_PRIORITY
+        )
+        return {"status": "processing", "action": action, "task_id": task.id}
     
-    db_insight = AIInsight(
-        target_type=enum_target_type,
-        target_id=target_id,
-        summary=insight_data["summary"],
-        details=insight_data["details"],
-        tags=insight_data["tags"],
-        confidence_score=insight_data["confidence_score"],
-        action_items=insight_data["action_items"],
-        metadata=insight_data["metadata"]
-    )
-    db.add(db_insight)
-    db.commit()
+    if action == "delete":
+        affected = await insight_repo.bulk_delete(db, ids=request.ids, **filters)
+    elif action == "unarchive":
+        affected = await insight_repo.restore_insights(db, ids=request.ids, **filters)
+    else:
+        affected = await insight_repo.bulk_set_archived(db, action == "archive", ids=request.ids, **filters)
+    return {"status": "success", "action": action, "affected": affected}
+
+@router.post("/bulk/archive", response_model=AIInsightBulkResponse)
+async def bulk_archive_insights(
+    request: AIInsightBulkRequest,
+    current_user: User = Depends(check_analyst_access),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Archive every insight matching the given ids and/or filter in one statement.
+    Set run_async for very large selections; poll the task via /tasks/{task_id}.
+    Only accessible by admin, manager, and ops_analyst roles.
+    """
+    return await _bulk_mutation("archive", request, db)
+
+@router.post("/bulk/unarchive", response_model=AIInsightBulkResponse)
+async def bulk_unarchive_insights(
+    request: AIInsightBulkRequest,
+    current_user: User = Depends(check_analyst_access),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Unarchive insights matching the given ids and/or filter. Each restored insight becomes
+    the live insight for its target (the newest match wins where several share a target).
+    Only accessible by admin, manager, and ops_analyst roles.
+    """
+    return await _bulk_mutation("unarchive", request, db)
+
+@router.post("/bulk/delete", response_model=AIInsightBulkResponse)
+async def bulk_delete_insights(
+    request: AIInsightBulkRequest,
+    current_user: User = Depends(check_analyst_access),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete every insight matching the given ids and/or filter in one statement.
+    Only accessible by admin, manager, and ops_analyst roles.
+    """
+    return await _bulk_mutation("delete", request, db)
 
 @router.post("/generate", response_model=AIInsightGenerateResponse)
 async def generate_insight(
     request: AIInsightGenerateRequest,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(check_analyst_access),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(check_analyst_access)
 ):
     """
-    Generate a new insight using AI.
+    Generate a new insight using AI. It replaces (archives) the current live insight for the same target.
     Only accessible by admin, manager, and ops_analyst roles.
     """
     try:
@@ -299,17 +276,124 @@ async def generate_insight(
             detail=f"Invalid target_type: {request.target_type}"
         )
     
-    # Add task to background
-    background_tasks.add_task(
-        _generate_insight_task,
-        target_type=request.target_type,
-        target_id=request.target_id,
-        custom_prompt=request.custom_prompt,
-        db=db
+    # Queue on the ai-insights workers so LLM latency never occupies an API worker
+    task = await run_in_threadpool(
+        insight_tasks.generate_insight.apply_async,
+        kwargs={
+            "target_type": target_type,
+            "target_id": request.target_id,
+            "custom_prompt": request.custom_prompt
+        },
+        priority=insight_tasks.INTERACTIVE_PRIORITY
     )
     
     return {
         "status": "processing",
         "message": f"Generating insight for {request.target_type} {request.target_id if request.target_id else 'general'}",
-        "insight_id": None
+        "insight_id": None,
+        "task_id": task.id
     }
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/generate/stream")
+async def stream_insight(
+    request: AIInsightGenerateRequest,
+    current_user: User = Depends(check_streaming_analyst_access)
+):
+    """
+    Generate an insight and stream it as Server-Sent Events.
+    Emits "token" events with raw model deltas, "section" events as SUMMARY/DETAILS/TAGS/
+    CONFIDENCE/ACTION ITEMS are parsed, then an "insight" event with the stored insight.
+    Only accessible by admin, manager, and ops_analyst roles.
+    """
+    try:
+        enum_target_type = TargetType[request.target_type.upper()]
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid target_type: {request.target_type}"
+        )
+    
+    async def events():
+        # The stream outlives the request scope, so it manages its own session
+        async with database.SessionLocal() as db:
+            try:
+                target_data = await build_target_data(db, enum_target_type.name, request.target_id)
+                async for event, data in ai_service.stream_insight(
+                    enum_target_type.value, target_data, request.custom_prompt
+                ):
+                    if event == "insight":
+                        db_insight = await insight_repo.create_insight(
+                            db,
+                            **insight_repo.generated_insight_fields(enum_target_type, request.target_id, data)
+                        )
+                        data = {**data, "insight_id": db_insight.id}
+                    yield _sse(event, data)
+            except Exception as e:
+                yield _sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/generate/batch", response_model=AIInsightBatchGenerateResponse)
+async def generate_insights_for_targets(
+    request: AIInsightBatchGenerateRequest,
+    current_user: User = Depends(check_analyst_access)
+):
+    """
+    Generate insights for many targets on the ai-insights queue.
+    Pass target_ids, or a creator_id with target_type "fan" to cover all of that creator's fans.
+    Only accessible by admin, manager, and ops_analyst roles.
+    """
+    target_type = request.target_type.upper()
+    if request.target_ids is None:
+        if request.creator_id is None or target_type != "FAN":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide target_ids, or creator_id with target_type fan"
+            )
+    
+    task = await run_in_threadpool(
+        insight_tasks.generate_insights_batch.apply_async,
+        kwargs={
+            "target_type": target_type,
+            "target_ids": request.target_ids,
+            "creator_id": request.creator_id,
+            "custom_prompt": request.custom_prompt
+        },
+        priority=insight_tasks.BATCH_PRIORITY
+    )
+    
+    scope = f"{len(request.target_ids)} targets" if request.target_ids is not None else f"fans of creator {request.creator_id}"
+    return {
+        "status": "scheduled",
+        "message": f"Generating {request.target_type.value} insights for {scope}",
+        "task_id": task.id
+    }
+
+def _task_status(task_id: str) -> dict:
+    result = AsyncResult(task_id, app=celery_app)
+    state = result.state
+    return {
+        "task_id": task_id,
+        "state": state,
+        "progress": result.info if state == "PROGRESS" else None,
+        "result": result.result if state == "SUCCESS" else None,
+        "error": str(result.result) if state == "FAILURE" else None
+    }
+
+@router.get("/tasks/{task_id}", response_model=AIInsightTaskStatus)
+async def get_insight_task_status(
+    task_id: str,
+    current_user: User = Depends(check_analyst_access)
+):
+    """
+    Poll an insight generation task.
+    A finished single-insight task reports the new insight_id in its result.
+    """
+    return await run_in_threadpool(_task_status, task_id)
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, WebSocket, status
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, List, Optional, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
+import asyncio
+import json
 
-from app.db.base import get_db
-from app.schemas.notification import Notification, NotificationSeverity
+from app.core import config
+from app.core.auth import authenticate_token, check_manager_access, get_current_user, get_streaming_user
+from app.db.base import get_db, database
+from app.models.notification import NotificationSeverity as NotificationSeverityModel
+from app.models.user import User
+from app.repositories import notification as notification_repo
+from app.schemas.notification import Notification, NotificationCreate, NotificationSeverity
+from app.services.notification_service import get_notification_hub, notification_payload
+
+# Most notifications replayed to a reconnecting client
+CATCH_UP_LIMIT = 200
 
 router = APIRouter()
 
@@ -14,74 +25,173 @@ async def get_notifications(
     is_read: Optional[bool] = None,
     is_archived: Optional[bool] = None,
     limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get notifications with optional filters, newest first
+    """
+    return await notification_repo.list_notifications(
+        db,
+        current_user.id,
+        severity=NotificationSeverityModel(severity.value) if severity else None,
+        is_read=is_read,
+        is_archived=is_archived,
+        limit=limit
+    )
+
+@router.post("", response_model=Notification, status_code=status.HTTP_201_CREATED)
+async def create_notification(
+    notification: NotificationCreate,
+    current_user: User = Depends(check_manager_access),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get notifications with optional filters
-    """
-    # In a real implementation, we would query the database for notifications
-    # For now, return placeholder data
-    import random
-    
-    notifications = []
-    severities = [NotificationSeverity.NORMAL, NotificationSeverity.CAUTION, NotificationSeverity.RISK]
-    
-    for i in range(1, 10):
-        notification_severity = severity or random.choice(severities)
-        notification_read = is_read if is_read is not None else random.choice([True, False])
-        notification_archived = is_archived if is_archived is not None else random.choice([True, False])
-        
-        related_types = ["fan", "chatter", "creator", None]
-        related_type = random.choice(related_types)
-        related_id = random.randint(1, 100) if related_type else None
-        
-        message = ""
-        if notification_severity == NotificationSeverity.NORMAL:
-            message = random.choice([
-                "New fan signed up",
-                "Creator posted new content",
-                "Weekly report generated",
-                "Chatter completed training"
-            ])
-        elif notification_severity == NotificationSeverity.CAUTION:
-            message = random.choice([
-                "Fan engagement dropping",
-                "Chatter response time increasing",
-                "Creator content frequency decreasing",
-                "Unusual login pattern detected"
-            ])
-        else:  # RISK
-            message = random.choice([
-                "Fan at high risk of churn",
-                "Creator revenue down 30%",
-                "Chatter showing burnout signs",
-                "Multiple payment failures detected"
-            ])
-        
-        notifications.append({
-            "id": i,
-            "message": message,
-            "severity": notification_severity,
-            "related_id": related_id,
-            "related_type": related_type,
-            "is_read": notification_read,
-            "is_archived": notification_archived,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        })
-    
-    return notifications
+    Create a notification and push it to connected clients.
+    Leave user_id empty to notify every user.
+    Only accessible by admin and manager roles.
+    """
+    fields = notification.dict()
+    fields["severity"] = NotificationSeverityModel(notification.severity.value)
+    created = await notification_repo.create_notifications(db, [fields])
+    return created[0]
+
+async def _notification_events(user_id: int, last_event_id: Optional[int]) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """Missed notifications after ``last_event_id``, then live ones; None marks an idle keepalive"""
+    hub = get_notification_hub()
+    # Subscribe before reading the backlog so nothing published in between is lost
+    queue = hub.subscribe(user_id)
+    try:
+        sent_id = last_event_id or 0
+        if last_event_id is not None:
+            async with database.SessionLocal() as db:
+                missed = await notification_repo.notifications_after(db, user_id, last_event_id, CATCH_UP_LIMIT)
+            for notification in missed:
+                sent_id = notification.id
+                yield notification_payload(notification)
+
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=config.NOTIFICATION_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            # Anything already replayed from the backlog is skipped
+            if payload["id"] > sent_id:
+                sent_id = payload["id"]
+                yield payload
+    finally:
+        hub.unsubscribe(user_id, queue)
+
+@router.get("/stream")
+async def stream_notifications(
+    last_event_id: Optional[int] = Header(None),
+    current_user: User = Depends(get_streaming_user)
+):
+    """
+    Push notifications to the client as Server-Sent Events.
+    Each "notification" event carries its id, so a reconnecting client sending
+    Last-Event-ID first receives what it missed. Comment lines keep idle
+    connections open through proxies.
+    """
+    async def events():
+        async for payload in _notification_events(current_user.id, last_event_id):
+            if payload is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def notifications_socket(
+    websocket: WebSocket,
+    token: str = Query(...),
+    last_event_id: Optional[int] = Query(None)
+):
+    """
+    Push notifications over a WebSocket as JSON messages.
+    Browsers cannot set headers on a WebSocket, so the access token is passed as a query parameter.
+    """
+    try:
+        async with database.SessionLocal() as db:
+            user = await authenticate_token(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+
+    async def send():
+        async for payload in _notification_events(user.id, last_event_id):
+            await websocket.send_json({"type": "keepalive"} if payload is None else {"type": "notification", "data": payload})
+
+    async def receive():
+        # Client messages are ignored; this only notices the disconnect
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@router.get("/unread-count", response_model=Dict[str, int])
+async def get_unread_count(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Number of unread, unarchived notifications for the badge, served from cached counters
+    """
+    return {"unread": await notification_repo.count_unread(db, current_user.id)}
+
+@router.post("/read-all", response_model=Dict[str, Any])
+async def mark_all_notifications_read(
+    severity: Optional[NotificationSeverity] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Mark every unread notification (optionally of one severity) as read in a single update
+    """
+    updated = await notification_repo.mark_read(
+        db,
+        current_user.id,
+        severity=NotificationSeverityModel(severity.value) if severity else None
+    )
+    return {
+        "status": "success",
+        "updated": updated
+    }
+
+async def _get_visible_notification(db: AsyncSession, user: User, notification_id: int):
+    notification = await notification_repo.get_notification(db, user.id, notification_id)
+    if notification is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notification not found"
+        )
+    return notification
 
 @router.post("/{notification_id}/read", response_model=Dict[str, Any])
 async def mark_notification_read(
     notification_id: int,
+    current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Mark a notification as read
     """
-    # In a real implementation, we would update the notification in the database
-    # For now, return a placeholder response
+    await _get_visible_notification(db, current_user, notification_id)
+    await notification_repo.mark_read(db, current_user.id, [notification_id])
     return {
         "status": "success",
         "message": f"Notification {notification_id} marked as read"
@@ -90,13 +200,14 @@ async def mark_notification_read(
 @router.post("/{notification_id}/archive", response_model=Dict[str, Any])
 async def archive_notification(
     notification_id: int,
+    current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Archive a notification
     """
-    # In a real implementation, we would update the notification in the database
-    # For now, return a placeholder response
+    await _get_visible_notification(db, current_user, notification_id)
+    await notification_repo.archive(db, current_user.id, [notification_id])
     return {
         "status": "success",
         "message": f"Notification {notification_id} archived"
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from app.core.auth import get_current_user, check_admin_access
+from app.db.base import get_db
+from app.models.user import User
+from app.repositories import ai_insight as insight_repo
+from app.repositories import message as message_repo
+from app.schemas.search import InsightSearchResult, MessageSearchResult, IndexRebuildResponse
+from app.services.semantic_search import INSIGHTS, MESSAGES, get_semantic_index, insight_entry
+from app.tasks import embeddings as embedding_tasks
+from app.tasks.ai_insights import BATCH_PRIORITY
+
+router = APIRouter()
+
+async def _insight_results(db: AsyncSession, hits) -> List[InsightSearchResult]:
+    insights = await insight_repo.get_insights_by_ids(db, [hit_id for hit_id, _ in hits])
+    # The index can briefly reference rows deleted by another process
+    return [
+        InsightSearchResult(score=score, insight=insights[hit_id])
+        for hit_id, score in hits
+        if hit_id in insights
+    ]
+
+@router.get("/insights", response_model=List[InsightSearchResult])
+async def search_insights(
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+    exact: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Find insights whose summary and details are semantically closest to a query.
+    """
+    hits = await get_semantic_index().search(INSIGHTS, q, k=k, exact=exact)
+    return await _insight_results(db, hits)
+
+@router.get("/insights/{insight_id}/similar", response_model=List[InsightSearchResult])
+async def similar_insights(
+    insight_id: int,
+    k: int = Query(10, ge=1, le=100),
+    exact: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Find the insights most similar to an existing one.
+    """
+    insight = await insight_repo.get_insight(db, insight_id)
+    if insight is None:
+        raise HTTPException(status_code=404, detail="Insight not found")
+
+    _, text = insight_entry(insight)
+    hits = await get_semantic_index().search(INSIGHTS, text, k=k, exact=exact, exclude_id=insight_id)
+    return await _insight_results(db, hits)
+
+@router.get("/messages", response_model=List[MessageSearchResult])
+async def search_messages(
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+    exact: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Find past messages that resemble a piece of conversation.
+    """
+    hits = await get_semantic_index().search(MESSAGES, q, k=k, exact=exact)
+    messages = await message_repo.get_messages_by_ids(db, [hit_id for hit_id, _ in hits])
+    results = []
+    for hit_id, score in hits:
+        message = messages.get(hit_id)
+        if message is None:
+            continue
+        results.append(MessageSearchResult(
+            score=score,
+            id=message.id,
+            fan_id=message.fan_id,
+            chatter_id=message.chatter_id,
+            creator_id=message.creator_id,
+            sent_time=message.sent_time,
+            message_type=message.message_type.value if message.message_type else None,
+            content=message.content
+        ))
+    return results
+
+@router.post("/rebuild/{namespace}", response_model=IndexRebuildResponse)
+async def rebuild_index(
+    namespace: str,
+    current_user: User = Depends(check_admin_access)
+):
+    """
+    Re-embed every insight or message in the background.
+    Only accessible by admin users.
+    """
+    if namespace not in (INSIGHTS, MESSAGES):
+        raise HTTPException(status_code=400, detail=f"Invalid namespace: {namespace}")
+
+    task = await run_in_threadpool(
+        embedding_tasks.rebuild_index.apply_async,
+        kwargs={"namespace": namespace},
+        priority=BATCH_PRIORITY
+    )
+    return {
+        "status": "processing",
+        "message": f"Rebuilding the {namespace} index",
+        "task_id": task.id
+    }
@@ -1,15 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
-import uuid
+import json
 
-from app.db.base import get_db
+from app.db.base import get_db, database
+from app.repositories import experiment as experiment_repo
+from app.schemas.experiment import AssignmentRequest, BacktestRequest, ExperimentEventBatch
+from app.services.backtest import MAX_PROGRESS_CHUNKS, run_backtest
+from app.services.experiment_assignment import assign_variant_keys
+from app.services.experiment_events import get_event_buffer
+from app.services.experiment_stats import experiment_analysis, running_results
+from app.services.experiment_store import assign_fans, experiment_cache, load_experiment, lookup_assignments
 
 router = APIRouter()
 
-# In-memory storage for test results
-test_results = {}
+def _variant_specs(test_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Variants from either a "variants" list or the Testing page's variant_a/variant_b fields"""
+    if test_data.get("variants"):
+        return [
+            {
+                "key": variant.get("key") or f"variant_{chr(ord('a') + position)}",
+                "content": variant.get("content", {}),
+                "weight": variant.get("weight", 1.0)
+            }
+            for position, variant in enumerate(test_data["variants"])
+        ]
+    return [
+        {"key": key, "content": test_data.get(key, {}), "weight": 1.0}
+        for key in ("variant_a", "variant_b")
+    ]
+
+async def _get_experiment_or_404(db: AsyncSession, test_id: str) -> Dict[str, Any]:
+    experiment = await load_experiment(db, test_id)
+    if experiment is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    return experiment
 
 @router.post("/start", response_model=Dict[str, Any])
 async def start_test(
@@ -19,32 +48,33 @@ async def start_test(
     """
     Start a new A/B test
     """
-    test_id = str(uuid.uuid4())
-    
-    # Store test configuration
-    test_results[test_id] = {
-        "id": test_id,
-        "name": test_data.get("name", f"Test {test_id[:8]}"),
-        "variant_a": test_data.get("variant_a", {}),
-        "variant_b": test_data.get("variant_b", {}),
-        "start_date": datetime.now(),
-        "end_date": None,
-        "status": "running",
-        "metrics": {
-            "variant_a": {
-                "impressions": 0,
-                "conversions": 0,
-                "revenue": 0.0
-            },
-            "variant_b": {
-                "impressions": 0,
-                "conversions": 0,
-                "revenue": 0.0
-            }
-        }
-    }
-    
-    return {"test_id": test_id, "status": "started"}
+    variants = _variant_specs(test_data)
+    if len(variants) < 2:
+        raise HTTPException(status_code=400, detail="A test needs at least two variants")
+    if len({variant["key"] for variant in variants}) != len(variants):
+        raise HTTPException(status_code=400, detail="Variant keys must be unique")
+    if any(float(variant["weight"]) < 0 for variant in variants) or not sum(float(variant["weight"]) for variant in variants):
+        raise HTTPException(status_code=400, detail="Variant weights must be non-negative and not all zero")
+    traffic_allocation = float(test_data.get("traffic_allocation", 1.0))
+    if not 0 < traffic_allocation <= 1:
+        raise HTTPException(status_code=400, detail="traffic_allocation must be in (0, 1]")
+
+    experiment = await experiment_repo.create_experiment(db, test_data.get("name"), variants, traffic_allocation)
+    return {"test_id": experiment.id, "status": "started"}
+
+@router.post("/stop/{test_id}", response_model=Dict[str, Any])
+async def stop_test(
+    test_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stop a running A/B test
+    """
+    await _get_experiment_or_404(db, test_id)
+    await experiment_repo.complete_experiment(db, test_id)
+    experiment_cache.invalidate(test_id)
+    experiment = await _get_experiment_or_404(db, test_id)
+    return {"test_id": test_id, "status": experiment["status"], "end_date": experiment["end_date"]}
 
 @router.get("/results/{test_id}", response_model=Dict[str, Any])
 async def get_test_results(
@@ -54,26 +84,175 @@ async def get_test_results(
     """
     Get results for a specific test
     """
-    if test_id not in test_results:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Test not found"
-        )
-    
-    # In a real implementation, we would calculate metrics from the database
-    # For now, return the stored test with some simulated metrics
-    test = test_results[test_id]
-    
-    # Simulate some metrics if the test is running
-    if test["status"] == "running":
-        import random
-        
-        test["metrics"]["variant_a"]["impressions"] += random.randint(5, 20)
-        test["metrics"]["variant_a"]["conversions"] += random.randint(0, 3)
-        test["metrics"]["variant_a"]["revenue"] += random.uniform(0, 10)
-        
-        test["metrics"]["variant_b"]["impressions"] += random.randint(5, 20)
-        test["metrics"]["variant_b"]["conversions"] += random.randint(0, 4)
-        test["metrics"]["variant_b"]["revenue"] += random.uniform(0, 12)
-    
-    return test
+    experiment = await _get_experiment_or_404(db, test_id)
+    metrics = await experiment_repo.get_variant_metrics(db, test_id)
+    analysis = await experiment_analysis(db, test_id)
+
+    # Variants are also keyed at the top level, as the Testing page reads them
+    return {
+        "id": experiment["id"],
+        "name": experiment["name"],
+        "start_date": experiment["start_date"],
+        "end_date": experiment["end_date"],
+        "status": experiment["status"],
+        **{variant["key"]: variant["content"] for variant in experiment["variants"]},
+        "variants": [
+            {"key": variant["key"], "content": variant["content"], "weight": variant["weight"]}
+            for variant in experiment["variants"]
+        ],
+        "metrics": {
+            variant["key"]: metrics.get(variant["id"], {"impressions": 0, "conversions": 0, "revenue": 0.0})
+            for variant in experiment["variants"]
+        },
+        "analysis": analysis
+    }
+
+@router.get("/results", response_model=Dict[str, Any])
+async def get_running_results(
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Lifts, intervals and significance for every running test, keyed by test id
+    """
+    return await running_results(db)
+
+@router.post("/assign/{test_id}", response_model=Dict[str, Any])
+async def assign(
+    test_id: str,
+    request: AssignmentRequest,
+    include_recorded: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Variant to send each fan, null for fans outside the test's traffic
+
+    Computed by hashing the test and fan ids against the variant weights, so
+    the same fan always gets the same variant and nothing is stored or read
+    beyond the cached test definition. With ``include_recorded`` variants
+    recorded through /assignments take precedence.
+    """
+    experiment = await _get_experiment_or_404(db, test_id)
+    assignments = dict(zip(request.fan_ids, assign_variant_keys(experiment, request.fan_ids)))
+    if include_recorded:
+        keys = {variant["id"]: variant["key"] for variant in experiment["variants"]}
+        for fan_id, variant_id in (await lookup_assignments(db, test_id, request.fan_ids)).items():
+            assignments[fan_id] = keys[variant_id]
+    return {"test_id": test_id, "status": experiment["status"], "assignments": assignments}
+
+@router.get("/assignments/{test_id}", response_model=Dict[str, Any])
+async def get_assignments(
+    test_id: str,
+    fan_ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the variants recorded for the given fans
+    """
+    experiment = await _get_experiment_or_404(db, test_id)
+    keys = {variant["id"]: variant["key"] for variant in experiment["variants"]}
+    assignments = await lookup_assignments(db, test_id, fan_ids)
+    return {
+        "test_id": test_id,
+        "assignments": {fan_id: keys[variant_id] for fan_id, variant_id in assignments.items()}
+    }
+
+@router.post("/assignments/{test_id}", response_model=Dict[str, Any])
+async def record_assignments(
+    test_id: str,
+    assignments: Dict[int, str] = Body(..., embed=True),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record which variant each fan was shown
+
+    A fan keeps the first variant recorded for them; the response has the
+    assignments in effect.
+    """
+    experiment = await _get_experiment_or_404(db, test_id)
+    if experiment["status"] != "running":
+        raise HTTPException(status_code=400, detail="Test is not running")
+    ids = {variant["key"]: variant["id"] for variant in experiment["variants"]}
+    unknown = set(assignments.values()) - set(ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown variants: {', '.join(sorted(unknown))}")
+
+    keys = {variant_id: key for key, variant_id in ids.items()}
+    effective = await assign_fans(db, test_id, {fan_id: ids[key] for fan_id, key in assignments.items()})
+    return {
+        "test_id": test_id,
+        "assignments": {fan_id: keys[variant_id] for fan_id, variant_id in effective.items()}
+    }
+
+@router.post("/events/{test_id}", response_model=Dict[str, Any])
+async def record_events(
+    test_id: str,
+    batch: ExperimentEventBatch,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record impressions, conversions and revenue for a running test
+
+    Events are added to buffered counters and reach the results within
+    EXPERIMENT_EVENT_FLUSH_SECONDS; no row is written per event.
+    """
+    experiment = await _get_experiment_or_404(db, test_id)
+    if experiment["status"] != "running":
+        raise HTTPException(status_code=400, detail="Test is not running")
+    ids = {variant["key"]: variant["id"] for variant in experiment["variants"]}
+    unknown = {event.variant for event in batch.events} - set(ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown variants: {', '.join(sorted(unknown))}")
+
+    # One increment per variant however many events the batch carries
+    totals: Dict[int, List[float]] = {}
+    for event in batch.events:
+        variant_totals = totals.setdefault(ids[event.variant], [0, 0, 0.0])
+        variant_totals[0] += event.impressions
+        variant_totals[1] += event.conversions
+        variant_totals[2] += event.revenue
+    buffer = get_event_buffer()
+    for variant_id, (impressions, conversions, revenue) in totals.items():
+        await buffer.record(variant_id, impressions, conversions, revenue)
+    return {"test_id": test_id, "accepted": len(batch.events)}
+
+@router.post("/backtest", response_model=Dict[str, Any])
+async def backtest(
+    request: BacktestRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Estimate variants defined as message predicates from historical messages
+
+    The whole range is read in one grouped query. Use /backtest/stream for
+    progress on large ranges.
+    """
+    result = None
+    async for event, data in run_backtest(db, request):
+        if event == "result":
+            result = data
+    return result
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/backtest/stream")
+async def stream_backtest(request: BacktestRequest):
+    """
+    Run a backtest and stream it as Server-Sent Events.
+    Emits a "progress" event as each slice of the date range is aggregated,
+    then a "result" event with the same body as /backtest.
+    """
+    async def events():
+        # The stream outlives the request scope, so it manages its own session
+        async with database.SessionLocal() as db:
+            try:
+                async for event, data in run_backtest(db, request, chunks=MAX_PROGRESS_CHUNKS):
+                    yield _sse(event, data)
+            except Exception as e:
+                yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from app.core.auth import get_current_user, check_admin_access, check_manager_access
+from app.core.security import get_password_hash_async
 from app.db.base import get_db
+from app.repositories import user as user_repo
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
 
@@ -14,25 +16,25 @@ async def get_users(
     skip: int = 0, 
     limit: int = 100, 
     current_user: User = Depends(check_manager_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all users. Only accessible by admin and manager roles.
     """
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = await user_repo.list_users(db, skip=skip, limit=limit)
     return users
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user: UserCreate, 
     current_user: User = Depends(check_admin_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new user. Only accessible by admin role.
     """
     # Check if username already exists
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await user_repo.get_user_by_username(db, user.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,7 +42,7 @@ async def create_user(
         )
     
     # Check if email already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await user_repo.get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -48,18 +50,15 @@ async def create_user(
         )
     
     # Create new user
-    from app.api.endpoints.auth import get_password_hash
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
+    hashed_password = await get_password_hash_async(user.password)
+    db_user = await user_repo.create_user(
+        db,
         username=user.username,
         email=user.email,
         full_name=user.full_name,
         hashed_password=hashed_password,
         role=user.role
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
     
     return db_user
 
@@ -67,12 +66,12 @@ async def create_user(
 async def get_user(
     user_id: int, 
     current_user: User = Depends(check_manager_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific user by ID. Only accessible by admin and manager roles.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await user_repo.get_user_by_id(db, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -82,12 +81,12 @@ async def update_user(
     user_id: int, 
     user_update: UserUpdate, 
     current_user: User = Depends(check_admin_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a user. Only accessible by admin role.
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await user_repo.get_user_by_id(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -96,26 +95,21 @@ async def update_user(
     
     # Handle password update separately
     if "password" in update_data:
-        from app.api.endpoints.auth import get_password_hash
-        update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+        update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
     
-    for key, value in update_data.items():
-        setattr(db_user, key, value)
-    
-    db.commit()
-    db.refresh(db_user)
+    db_user = await user_repo.update_user(db, db_user, update_data)
     return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int, 
     current_user: User = Depends(check_admin_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a user. Only accessible by admin role.
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await user_repo.get_user_by_id(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -126,6 +120,5 @@ async def delete_user(
             detail="Cannot delete your own user account"
         )
     
-    db.delete(db_user)
-    db.commit()
+    await user_repo.delete_user(db, db_user)
     return None
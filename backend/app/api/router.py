@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, users, ingest, dashboard, testing, simulator, insights, notifications
+from app.api.endpoints import auth, users, ingest, dashboard, testing, simulator, insights, notifications, search
 
 api_router = APIRouter()
 
@@ -13,3 +13,4 @@ api_router.include_router(testing.router, prefix="/test", tags=["testing"])
 api_router.include_router(simulator.router, prefix="/simulate", tags=["simulator"])
 api_router.include_router(insights.router, prefix="/insights", tags=["insights"])
 api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
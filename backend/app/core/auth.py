@@ -2,16 +2,24 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import List, Optional
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import app.core.config as config
-from app.db.base import get_db
+from app.core.principal_cache import principal_cache
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_password,
+    verify_password_async
+)
+from app.db.base import get_db, database
+from app.repositories.user import get_user_by_username
 from app.models.user import User, UserRole
 from app.schemas.user import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def authenticate_token(token: str, db: AsyncSession) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,13 +33,26 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == token_data.username).first()
+    # Hot users are served from the principal cache without a database round trip
+    user = await principal_cache.get(token_data.username)
     if user is None:
-        raise credentials_exception
+        user = await get_user_by_username(db, token_data.username)
+        if user is None:
+            raise credentials_exception
+        await principal_cache.set(token_data.username, user)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await authenticate_token(token, db)
+
+async def get_streaming_user(token: str = Depends(oauth2_scheme)) -> User:
+    # Long-lived streams authenticate with their own short session instead of
+    # holding a request-scoped connection open for the life of the stream
+    async with database.SessionLocal() as db:
+        return await authenticate_token(token, db)
+
 def check_admin_access(current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
@@ -56,6 +77,15 @@ def check_analyst_access(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
+def check_streaming_analyst_access(current_user: User = Depends(get_streaming_user)):
+    # check_analyst_access for streams, without a request-scoped session
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER, UserRole.OPS_ANALYST]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
+
 def check_trainer_access(current_user: User = Depends(get_current_user)):
     # All authenticated users can access trainer-level resources
     return current_user
@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 # Load environment variables from .env file if it exists
 load_dotenv()
 
+# The backend directory, anchoring relative file paths below
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fandom_intelligence.db")
 if DATABASE_URL.startswith("postgres://"):
@@ -11,18 +14,115 @@ if DATABASE_URL.startswith("postgres://"):
 
 # Redis configuration for Celery
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
 
 # JWT Authentication
 SECRET_KEY = os.getenv("SECRET_KEY", "development_secret_key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Authenticated principal cache ("memory" or "redis"). The memory backend only invalidates in its own
+# process, so with several workers a deactivated or demoted user keeps access on the others for up to
+# the TTL; multi-worker deployments should use "redis"
+PRINCIPAL_CACHE_BACKEND = os.getenv("PRINCIPAL_CACHE_BACKEND", "memory")
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "5"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+# Password hashing runs in a bounded thread pool so bcrypt never blocks the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
 # OpenAI API
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+
+# LLM backend: "openai" (any OpenAI-compatible server at OPENAI_BASE_URL), "mock", or "auto" (openai when a key is set)
+AI_PROVIDER = os.getenv("AI_PROVIDER", "auto")
+# Prompts per /completions request for batch generation; 1 sends one chat request per prompt
+AI_LLM_BATCH_SIZE = int(os.getenv("AI_LLM_BATCH_SIZE", "1"))
+# Simulated per-request latency of the mock provider, for load tests
+AI_MOCK_LATENCY_SECONDS = float(os.getenv("AI_MOCK_LATENCY_SECONDS", "0"))
+
+# AI request throttling. Concurrency is per process; the RPM/TPM budget is per process with the
+# "memory" rate limit backend and shared by every API and Celery worker with "redis"
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_RATE_LIMIT_BACKEND = os.getenv("AI_RATE_LIMIT_BACKEND", "memory")
+AI_REQUESTS_PER_MINUTE = int(os.getenv("AI_REQUESTS_PER_MINUTE", "500"))
+AI_TOKENS_PER_MINUTE = int(os.getenv("AI_TOKENS_PER_MINUTE", "40000"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "5"))
+AI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("AI_RETRY_BASE_DELAY_SECONDS", "1.0"))
+AI_REQUEST_TIMEOUT_SECONDS = float(os.getenv("AI_REQUEST_TIMEOUT_SECONDS", "60"))
+AI_BATCH_CHUNK_SIZE = int(os.getenv("AI_BATCH_CHUNK_SIZE", "200"))
+# Request JSON responses (response_format json_object) instead of the line format
+AI_STRUCTURED_OUTPUT = os.getenv("AI_STRUCTURED_OUTPUT", "false").lower() == "true"
+
+# Prompt size limits so every insight costs a predictable number of tokens
+AI_PROMPT_HISTORY_TOKENS = int(os.getenv("AI_PROMPT_HISTORY_TOKENS", "1500"))
+AI_PROMPT_MESSAGE_TOKENS = int(os.getenv("AI_PROMPT_MESSAGE_TOKENS", "60"))
+
+# Insight response cache ("disk", "redis" or "none")
+AI_CACHE_BACKEND = os.getenv("AI_CACHE_BACKEND", "disk")
+# Relative paths resolve against the backend directory, not the process working directory
+AI_CACHE_PATH = os.path.abspath(os.path.join(BASE_DIR, os.getenv("AI_CACHE_PATH", "insight_cache.db")))
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "50000"))
+
+# Superseded insights are deleted this many days after their replacement (0 keeps them)
+INSIGHT_SUPERSEDED_RETENTION_DAYS = int(os.getenv("INSIGHT_SUPERSEDED_RETENTION_DAYS", "30"))
+
+# Real-time notification delivery: "memory" reaches clients of this process only, "redis" every API
+# worker and Celery task through a pub/sub channel
+NOTIFICATION_BROKER = os.getenv("NOTIFICATION_BROKER", "memory")
+NOTIFICATION_CHANNEL = os.getenv("NOTIFICATION_CHANNEL", "notifications")
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "100"))
+NOTIFICATION_KEEPALIVE_SECONDS = float(os.getenv("NOTIFICATION_KEEPALIVE_SECONDS", "15"))
+# Unread badge counts are cached (in Redis when NOTIFICATION_BROKER is "redis") and recounted after this long
+NOTIFICATION_UNREAD_CACHE_TTL_SECONDS = int(os.getenv("NOTIFICATION_UNREAD_CACHE_TTL_SECONDS", "300"))
+# Archived notifications move to notifications_archive this many days after being archived (0 keeps them),
+# and are deleted from the archive this many days after creation (0 keeps them). Keep the first well above
+# ALERT_DEDUP_DAYS: moved rows no longer block repeats of their dedup_key.
+NOTIFICATION_ARCHIVE_AFTER_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_AFTER_DAYS", "30"))
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_RETENTION_DAYS", "365"))
+
+# A/B test definitions are cached per worker for this long; stored fan assignments never change and
+# are cached without expiry up to the given number of fans
+EXPERIMENT_CACHE_TTL_SECONDS = float(os.getenv("EXPERIMENT_CACHE_TTL_SECONDS", "5"))
+EXPERIMENT_ASSIGNMENT_CACHE_SIZE = int(os.getenv("EXPERIMENT_ASSIGNMENT_CACHE_SIZE", "100000"))
+# Impressions/conversions are buffered ("memory" per worker, "redis" shared) and added to the variant
+# counters every EXPERIMENT_EVENT_FLUSH_SECONDS
+EXPERIMENT_EVENT_BACKEND = os.getenv("EXPERIMENT_EVENT_BACKEND", "memory")
+EXPERIMENT_EVENT_FLUSH_SECONDS = float(os.getenv("EXPERIMENT_EVENT_FLUSH_SECONDS", "5"))
+
+# Chatter simulator sessions ("memory" per worker, "redis" shared) expire this long after their last
+# message; only the last SIMULATOR_MAX_TURNS turns of each conversation are kept
+SIMULATOR_SESSION_BACKEND = os.getenv("SIMULATOR_SESSION_BACKEND", "memory")
+SIMULATOR_SESSION_TTL_SECONDS = int(os.getenv("SIMULATOR_SESSION_TTL_SECONDS", "3600"))
+SIMULATOR_MAX_SESSIONS = int(os.getenv("SIMULATOR_MAX_SESSIONS", "10000"))
+SIMULATOR_MAX_TURNS = int(os.getenv("SIMULATOR_MAX_TURNS", "200"))
+SIMULATOR_MAX_MESSAGE_CHARS = int(os.getenv("SIMULATOR_MAX_MESSAGE_CHARS", "1000"))
+
+# Alert rules evaluated after each ingestion batch (JSON list of rule specs; empty uses the built-in rules)
+ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "")
+ALERT_WINDOW_DAYS = int(os.getenv("ALERT_WINDOW_DAYS", "7"))
+# The same rule fires at most once per entity within this many days
+ALERT_DEDUP_DAYS = int(os.getenv("ALERT_DEDUP_DAYS", "7"))
+
+# Semantic search ("hashing" or a local sentence-transformers model name)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "hashing")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+# The index lives on the disk of the host that serves search. Processes elsewhere (Celery workers on
+# other hosts) set EMBEDDING_INDEX_WRITER=queue to send their index updates to the "embeddings" queue,
+# which is consumed on that host, instead of writing a local copy nobody searches
+EMBEDDING_INDEX_PATH = os.path.abspath(os.path.join(BASE_DIR, os.getenv("EMBEDDING_INDEX_PATH", "embedding_index")))
+EMBEDDING_INDEX_WRITER = os.getenv("EMBEDDING_INDEX_WRITER", "local")
+EMBEDDING_IVF_MIN_VECTORS = int(os.getenv("EMBEDDING_IVF_MIN_VECTORS", "50000"))
+EMBEDDING_IVF_NPROBE = int(os.getenv("EMBEDDING_IVF_NPROBE", "8"))
 
 # Google Drive integration
 GOOGLE_DRIVE_CREDENTIALS = os.getenv("GOOGLE_DRIVE_CREDENTIALS", "{}")
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID", "")
+GOOGLE_DRIVE_CHECK_INTERVAL_MINUTES = int(os.getenv("GOOGLE_DRIVE_CHECK_INTERVAL_MINUTES", "15"))
 
 # CORS settings
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
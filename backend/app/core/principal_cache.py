@@ -0,0 +1,90 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.core import config
+from app.models.user import User, UserRole
+
+# Columns needed to authorize a request; the password hash is never cached
+PRINCIPAL_FIELDS = ("id", "username", "email", "full_name", "role", "is_active", "created_at")
+
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated users keyed by token subject.
+
+    The in-process backend is an LRU bounded by ``max_size``; invalidation
+    only reaches the local process, so other workers may keep serving a
+    changed user until ``ttl_seconds`` pass. The Redis backend shares
+    entries between workers so an invalidation is seen everywhere
+    immediately.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url)
+
+    @staticmethod
+    def _redis_key(subject: str) -> str:
+        return f"principal:{subject}"
+
+    async def get(self, subject: str) -> Optional[User]:
+        """Return a detached User for the subject, or None on a miss"""
+        if self._redis is not None:
+            raw = await self._redis.get(self._redis_key(subject))
+            return User(**self._loads(raw)) if raw else None
+
+        entry = self._entries.get(subject)
+        if entry is None:
+            return None
+        expires_at, fields = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(subject, None)
+            return None
+        self._entries.move_to_end(subject)
+        return User(**fields)
+
+    async def set(self, subject: str, user: User):
+        fields = {name: getattr(user, name) for name in PRINCIPAL_FIELDS}
+        if self._redis is not None:
+            await self._redis.set(self._redis_key(subject), self._dumps(fields), ex=self.ttl_seconds)
+            return
+
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, fields)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, subject: str):
+        self._entries.pop(subject, None)
+        if self._redis is not None:
+            await self._redis.delete(self._redis_key(subject))
+
+    async def clear(self):
+        self._entries.clear()
+
+    @staticmethod
+    def _dumps(fields: Dict[str, Any]) -> str:
+        data = dict(fields)
+        data["role"] = fields["role"].name if fields["role"] is not None else None
+        data["created_at"] = fields["created_at"].isoformat() if fields["created_at"] else None
+        return json.dumps(data)
+
+    @staticmethod
+    def _loads(raw: bytes) -> Dict[str, Any]:
+        data = json.loads(raw)
+        data["role"] = UserRole[data["role"]] if data["role"] else None
+        data["created_at"] = datetime.fromisoformat(data["created_at"]) if data["created_at"] else None
+        return data
+
+principal_cache = PrincipalCache(
+    ttl_seconds=config.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=config.PRINCIPAL_CACHE_MAX_SIZE,
+    redis_url=config.REDIS_URL if config.PRINCIPAL_CACHE_BACKEND == "redis" else None
+)
@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy import Column, Integer, DateTime, func
+from sqlalchemy.pool import NullPool
 from typing import Generator
 from fastapi import Depends
 import datetime
@@ -20,16 +21,19 @@ Base = declarative_base()
 #     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
 class Database:
-    def __init__(self):
+    def __init__(self, **engine_kwargs):
         # Convert the DATABASE_URL to use asyncpg driver
         db_url = config.DATABASE_URL
         if db_url.startswith('postgresql://'):
             db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://')
+        elif db_url.startswith('sqlite://'):
+            db_url = db_url.replace('sqlite://', 'sqlite+aiosqlite://')
         
         self.engine = create_async_engine(
             db_url,
             echo=False,
-            future=True
+            future=True,
+            **engine_kwargs
         )
         self.SessionLocal = sessionmaker(
             autocommit=False,
@@ -41,6 +45,22 @@ class Database:
 
 database = Database()
 
+# Celery tasks run each job in a fresh event loop, so they must not reuse pooled connections
+task_database = Database(poolclass=NullPool)
+
+async def create_tables():
+    # Schema creation is synchronous DDL, so run it through the async connection
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+def dialect_insert(db: AsyncSession, entity):
+    """INSERT construct of the session's dialect, which supports ON CONFLICT clauses"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(entity)
+
 async def get_db() -> Generator:
     async with database.SessionLocal() as session:
         try:
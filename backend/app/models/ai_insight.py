@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Enum, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Enum, ForeignKey, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -14,17 +15,28 @@ class TargetType(enum.Enum):
 
 class AIInsight(Base):
     __tablename__ = "ai_insights"
+    __table_args__ = (
+        # Listing for one target, newest first (ids are assigned in creation order)
+        Index("ix_ai_insights_target_listing", "is_archived", "target_type", "target_id", "id"),
+        Index("ix_ai_insights_listing", "is_archived", "id"),
+        # Tag containment (tags @> '["vip"]'); SQLite falls back to json_each scans
+        Index("ix_ai_insights_tags", "tags", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     target_type = Column(Enum(TargetType), nullable=False)
     target_id = Column(Integer, nullable=True)
     summary = Column(String, nullable=False)
     details = Column(String, nullable=False)
-    tags = Column(JSON, nullable=True)
+    # JSONB on Postgres so tag filters can use the GIN index
+    tags = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     confidence_score = Column(Float, nullable=False)
     action_items = Column(JSON, nullable=True)
-    metadata = Column(JSON, nullable=True)
+    # "metadata" is reserved by the declarative base, so map the column under another attribute
+    metadata_ = Column("metadata", JSON, nullable=True)
     is_archived = Column(Boolean, default=False)
+    # Set when a newer insight for the same target archived this one
+    superseded_by_id = Column(Integer, ForeignKey("ai_insights.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
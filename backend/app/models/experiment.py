@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import enum
+
+from app.db.base import Base
+
+class ExperimentStatus(enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+class Experiment(Base):
+    __tablename__ = "experiments"
+
+    # UUID strings, as handed out by the A/B Testing Lab before tests were persisted
+    id = Column(String(36), primary_key=True)
+    name = Column(String, nullable=False)
+    status = Column(Enum(ExperimentStatus), default=ExperimentStatus.RUNNING, nullable=False)
+    # Share of fans enrolled; the rest are never assigned a variant
+    traffic_allocation = Column(Float, nullable=False, default=1.0)
+    start_date = Column(DateTime(timezone=True), server_default=func.now())
+    end_date = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    variants = relationship(
+        "ExperimentVariant",
+        back_populates="experiment",
+        cascade="all, delete-orphan",
+        order_by="ExperimentVariant.position",
+        lazy="selectin"
+    )
+
+class ExperimentVariant(Base):
+    __tablename__ = "experiment_variants"
+    __table_args__ = (UniqueConstraint("experiment_id", "key", name="uq_experiment_variants_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    experiment_id = Column(String(36), ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String, nullable=False)  # "variant_a", "variant_b", ...
+    position = Column(Integer, nullable=False, default=0)
+    content = Column(JSON, nullable=True)
+    # Relative share of traffic
+    weight = Column(Float, nullable=False, default=1.0)
+    impressions = Column(Integer, nullable=False, default=0)
+    conversions = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    experiment = relationship("Experiment", back_populates="variants")
+
+class ExperimentAssignment(Base):
+    """The variant a fan was shown; the first assignment recorded for a fan sticks"""
+    __tablename__ = "experiment_assignments"
+
+    experiment_id = Column(String(36), ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True)
+    fan_id = Column(Integer, ForeignKey("fans.id", ondelete="CASCADE"), primary_key=True)
+    variant_id = Column(Integer, ForeignKey("experiment_variants.id", ondelete="CASCADE"), nullable=False)
+    assigned_at = Column(DateTime(timezone=True), server_default=func.now())
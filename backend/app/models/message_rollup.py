@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, Float, Date
+
+from app.db.base import Base
+
+class MessageRollup(Base):
+    """Per-day message totals for each creator, chatter and fan, maintained as messages are ingested"""
+    __tablename__ = "message_rollups"
+
+    entity_type = Column(String, primary_key=True)  # "creator", "chatter" or "fan"
+    entity_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    message_count = Column(Integer, default=0, nullable=False)
+    ppv_offered = Column(Integer, default=0, nullable=False)
+    ppv_purchased = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0.0, nullable=False)
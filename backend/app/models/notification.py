@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Boolean, Index, and_
 from sqlalchemy.sql import func
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 import enum
@@ -18,7 +18,74 @@ class Notification(Base):
     severity = Column(Enum(NotificationSeverity), default=NotificationSeverity.NORMAL)
     related_id = Column(Integer)
     related_type = Column(String)
+    # Recipient; NULL notifications go to every user, who each keep their own
+    # read and archive state in notification_receipts
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    # Generated alerts carry a key so the same condition is only reported once
+    dedup_key = Column(String, unique=True)
     is_read = Column(Boolean, default=False)
     is_archived = Column(Boolean, default=False)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Partial indexes only hold the rows the badge and the inbox read, so they stay
+    # small however many read or archived notifications accumulate. The predicates
+    # are written like the repository's filters so both databases match them.
+    __table_args__ = (
+        Index(
+            "ix_notifications_unread", "user_id",
+            postgresql_where=and_(is_read == False, is_archived == False),  # noqa: E712
+            sqlite_where=and_(is_read == False, is_archived == False)  # noqa: E712
+        ),
+        Index(
+            "ix_notifications_inbox", "user_id", "id",
+            postgresql_where=is_archived == False,  # noqa: E712
+            sqlite_where=is_archived == False  # noqa: E712
+        ),
+        # Rows waiting for the retention job to move them to notifications_archive
+        Index(
+            "ix_notifications_archived", "updated_at",
+            postgresql_where=is_archived == True,  # noqa: E712
+            sqlite_where=is_archived == True  # noqa: E712
+        ),
+    )
+
+class NotificationReceipt(Base):
+    """
+    One user's read and archive state for a broadcast notification
+
+    Broadcast rows are shared, so their own is_read and is_archived stay as
+    created; a user reading or archiving one only writes their receipt.
+    """
+    __tablename__ = "notification_receipts"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    notification_id = Column(Integer, ForeignKey("notifications.id", ondelete="CASCADE"), primary_key=True)
+    is_read = Column(Boolean, nullable=False, default=False)
+    is_archived = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class NotificationArchive(Base):
+    """
+    Cold storage for notifications moved out of the hot table by the retention job
+
+    On PostgreSQL the table is range-partitioned by month of created_at, so
+    expired history is dropped a partition at a time instead of row by row.
+    """
+    __tablename__ = "notifications_archive"
+
+    # Partitioned tables need the partition key in the primary key
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True)
+    message = Column(String, nullable=False)
+    severity = Column(Enum(NotificationSeverity))
+    related_id = Column(Integer)
+    related_type = Column(String)
+    user_id = Column(Integer)
+    dedup_key = Column(String)
+    is_read = Column(Boolean)
+    is_archived = Column(Boolean)
+    updated_at = Column(TIMESTAMP(timezone=True))
+    moved_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
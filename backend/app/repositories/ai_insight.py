@@ -0,0 +1,372 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, func, or_, select, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.ai_insight import AIInsight, TargetType
+from app.models.message import Message
+from app.services.semantic_search import INSIGHTS, index_safely, insight_entry, remove_safely
+
+def _to_columns(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Map API field names onto AIInsight attributes"""
+    fields = dict(fields)
+    if "metadata" in fields:
+        fields["metadata_"] = fields.pop("metadata")
+    return fields
+
+def generated_insight_fields(target_type: TargetType, target_id: Optional[int], insight_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Column values for an insight produced by AIService"""
+    return {
+        "target_type": target_type,
+        "target_id": target_id,
+        "summary": insight_data["summary"],
+        "details": insight_data["details"],
+        "tags": insight_data["tags"],
+        "confidence_score": insight_data["confidence_score"],
+        "action_items": insight_data["action_items"],
+        "metadata": insight_data["metadata"]
+    }
+
+async def get_insight(db: AsyncSession, insight_id: int) -> Optional[AIInsight]:
+    return await db.get(AIInsight, insight_id)
+
+async def get_insights_by_ids(db: AsyncSession, insight_ids: List[int]) -> Dict[int, AIInsight]:
+    if not insight_ids:
+        return {}
+    result = await db.execute(select(AIInsight).where(AIInsight.id.in_(insight_ids)))
+    return {insight.id: insight for insight in result.scalars().all()}
+
+def _tag_conditions(db: AsyncSession, tags: List[str]) -> List[Any]:
+    """Conditions matching insights whose tags include every one of ``tags``"""
+    if db.get_bind().dialect.name == "postgresql":
+        # JSONB containment, served by the GIN index
+        return [type_coerce(AIInsight.tags, JSONB).contains(tags)]
+
+    conditions = []
+    for tag in tags:
+        tag_values = func.json_each(AIInsight.tags).table_valued("value")
+        conditions.append(exists(select(1).select_from(tag_values).where(tag_values.c.value == tag)))
+    return conditions
+
+async def list_insights(
+    db: AsyncSession,
+    is_archived: bool = False,
+    target_type: Optional[TargetType] = None,
+    target_id: Optional[int] = None,
+    tags: Optional[List[str]] = None,
+    before_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[AIInsight]:
+    """
+    Newest insights first
+
+    Pass the last id of the previous page as ``before_id`` to page with a
+    keyset seek instead of OFFSET; ``skip`` is only applied without it.
+    """
+    query = select(AIInsight).where(AIInsight.is_archived == is_archived)
+    if target_type is not None:
+        query = query.where(AIInsight.target_type == target_type)
+    if target_id is not None:
+        query = query.where(AIInsight.target_id == target_id)
+    if tags:
+        query = query.where(*_tag_conditions(db, tags))
+
+    if before_id is not None:
+        query = query.where(AIInsight.id < before_id)
+    else:
+        query = query.offset(skip)
+
+    query = query.order_by(AIInsight.id.desc()).limit(limit)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+async def _archive_live(db: AsyncSession, targets: List[Tuple[TargetType, Optional[int]]]) -> List[int]:
+    """Archive the live insights of ``targets``; returns the archived ids"""
+    target_ids_by_type: Dict[TargetType, List[Optional[int]]] = {}
+    for target_type, target_id in targets:
+        target_ids_by_type.setdefault(target_type, []).append(target_id)
+
+    conditions = []
+    for target_type, target_ids in target_ids_by_type.items():
+        ids = [target_id for target_id in target_ids if target_id is not None]
+        by_id = AIInsight.target_id.in_(ids)
+        if len(ids) < len(target_ids):
+            by_id = or_(by_id, AIInsight.target_id.is_(None))
+        conditions.append(and_(AIInsight.target_type == target_type, by_id))
+
+    result = await db.execute(
+        update(AIInsight)
+        .where(AIInsight.is_archived.is_(False), or_(*conditions))
+        .values(is_archived=True)
+        .returning(AIInsight.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars().all())
+
+async def _link_superseded(db: AsyncSession, archived_ids: List[int]):
+    """Point archived insights at the newest live insight for the same target"""
+    if not archived_ids:
+        return
+    newer = aliased(AIInsight)
+    successor = (
+        select(func.max(newer.id))
+        .where(
+            newer.target_type == AIInsight.target_type,
+            newer.target_id.is_not_distinct_from(AIInsight.target_id),
+            newer.is_archived.is_(False),
+            newer.id > AIInsight.id
+        )
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(AIInsight)
+        .where(AIInsight.id.in_(archived_ids))
+        .values(superseded_by_id=successor)
+        .execution_options(synchronize_session=False)
+    )
+
+async def create_insight(db: AsyncSession, **fields: Any) -> AIInsight:
+    """
+    Store a new insight as the single live insight for its target
+
+    Any live insight for the same (target_type, target_id) is archived and
+    linked to the new one in the same transaction.
+    """
+    db_insight = AIInsight(**_to_columns(fields))
+    archived_ids = await _archive_live(db, [(db_insight.target_type, db_insight.target_id)])
+    db.add(db_insight)
+    await db.flush()
+    await _link_superseded(db, archived_ids)
+    await db.commit()
+    await db.refresh(db_insight)
+    await index_safely(INSIGHTS, [insight_entry(db_insight)])
+    return db_insight
+
+async def create_insights_bulk(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """Store generated insights with the same supersession rules as create_insight"""
+    # Only the last row per target survives, matching what sequential creates would leave live
+    latest = {(row["target_type"], row["target_id"]): row for row in rows}
+    db_insights = [AIInsight(**_to_columns(row)) for row in latest.values()]
+    if not db_insights:
+        return 0
+
+    archived_ids = await _archive_live(db, list(latest))
+    db.add_all(db_insights)
+    await db.flush()
+    await _link_superseded(db, archived_ids)
+    entries = [insight_entry(db_insight) for db_insight in db_insights]
+    await db.commit()
+    await index_safely(INSIGHTS, entries)
+    return len(db_insights)
+
+async def update_insight(db: AsyncSession, db_insight: AIInsight, update_data: Dict[str, Any]) -> AIInsight:
+    columns = _to_columns(update_data)
+    # Unarchiving goes through restore_insights so the target keeps a single live insight
+    restore = columns.get("is_archived") is False and db_insight.is_archived
+    if restore:
+        columns.pop("is_archived")
+    for key, value in columns.items():
+        setattr(db_insight, key, value)
+    await db.commit()
+    if restore:
+        await restore_insights(db, ids=[db_insight.id])
+    await db.refresh(db_insight)
+    if "summary" in update_data or "details" in update_data:
+        await index_safely(INSIGHTS, [insight_entry(db_insight)])
+    return db_insight
+
+async def delete_insight(db: AsyncSession, db_insight: AIInsight) -> None:
+    insight_id = db_insight.id
+    await db.delete(db_insight)
+    await db.commit()
+    await remove_safely(INSIGHTS, [insight_id])
+
+def _bulk_conditions(
+    db: AsyncSession,
+    ids: Optional[List[int]] = None,
+    target_type: Optional[str] = None,
+    target_ids: Optional[List[int]] = None,
+    is_archived: Optional[bool] = None,
+    tags: Optional[List[str]] = None,
+    creator_id: Optional[int] = None,
+    created_before: Optional[datetime] = None,
+    created_after: Optional[datetime] = None
+) -> List[Any]:
+    """WHERE conditions for a bulk mutation; every given filter must match"""
+    conditions = []
+    if ids is not None:
+        conditions.append(AIInsight.id.in_(ids))
+    if target_type is not None:
+        conditions.append(AIInsight.target_type == TargetType(getattr(target_type, "value", target_type)))
+    if target_ids is not None:
+        conditions.append(AIInsight.target_id.in_(target_ids))
+    if is_archived is not None:
+        conditions.append(AIInsight.is_archived == is_archived)
+    if tags:
+        conditions.extend(_tag_conditions(db, tags))
+    if creator_id is not None:
+        # The creator's own insights plus those about fans they have messaged
+        creator_fans = select(Message.fan_id).where(Message.creator_id == creator_id)
+        conditions.append(or_(
+            and_(AIInsight.target_type == TargetType.CREATOR, AIInsight.target_id == creator_id),
+            and_(AIInsight.target_type == TargetType.FAN, AIInsight.target_id.in_(creator_fans))
+        ))
+    if created_before is not None:
+        conditions.append(AIInsight.created_at < created_before)
+    if created_after is not None:
+        conditions.append(AIInsight.created_at >= created_after)
+    return conditions
+
+def has_bulk_conditions(db: AsyncSession, **filters: Any) -> bool:
+    """Whether the filters select anything narrower than every insight (empty lists are ignored)"""
+    return bool(_bulk_conditions(db, **filters))
+
+async def bulk_set_archived(db: AsyncSession, archived: bool, **filters: Any) -> int:
+    """Archive or unarchive every matching insight in one UPDATE; returns the affected count"""
+    conditions = _bulk_conditions(db, **filters)
+    if not conditions:
+        # A bulk mutation never touches every insight
+        return 0
+    result = await db.execute(
+        update(AIInsight)
+        .where(*conditions)
+        .values(is_archived=archived)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+async def restore_insights(db: AsyncSession, **filters: Any) -> int:
+    """
+    Unarchive matching insights, each becoming the live insight for its target
+
+    Where several match for one target the newest is restored. The insight
+    that was live for the target is archived and, like the matches left
+    archived, linked to the restored one, so nightly compaction does not
+    archive the restored insight again. Returns the number restored.
+    """
+    conditions = _bulk_conditions(db, **filters)
+    if not conditions:
+        return 0
+    result = await db.execute(
+        select(AIInsight.id, AIInsight.target_type, AIInsight.target_id)
+        .where(AIInsight.is_archived.is_(True), *conditions)
+    )
+    restored: Dict[Tuple[TargetType, Optional[int]], int] = {}
+    matched_ids = []
+    for insight_id, target_type, target_id in result.all():
+        matched_ids.append(insight_id)
+        restored[(target_type, target_id)] = max(insight_id, restored.get((target_type, target_id), 0))
+    if not restored:
+        return 0
+
+    restored_ids = list(restored.values())
+    kept_archived = [insight_id for insight_id in matched_ids if insight_id not in set(restored_ids)]
+    displaced_ids = await _archive_live(db, list(restored))
+    successor = aliased(AIInsight)
+    await db.execute(
+        update(AIInsight)
+        .where(AIInsight.id.in_(displaced_ids + kept_archived))
+        .values(superseded_by_id=(
+            select(successor.id)
+            .where(
+                successor.target_type == AIInsight.target_type,
+                successor.target_id.is_not_distinct_from(AIInsight.target_id),
+                successor.id.in_(restored_ids)
+            )
+            .scalar_subquery()
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(AIInsight)
+        .where(AIInsight.id.in_(restored_ids))
+        .values(is_archived=False, superseded_by_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(restored_ids)
+
+async def bulk_delete(db: AsyncSession, **filters: Any) -> int:
+    """Delete every matching insight in one DELETE; returns the affected count"""
+    conditions = _bulk_conditions(db, **filters)
+    if not conditions:
+        return 0
+    result = await db.execute(
+        delete(AIInsight)
+        .where(*conditions)
+        .returning(AIInsight.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_ids = list(result.scalars().all())
+    await db.commit()
+    await remove_safely(INSIGHTS, deleted_ids)
+    return len(deleted_ids)
+
+async def matching_insight_ids(db: AsyncSession, after_id: int, limit: int, **filters: Any) -> List[int]:
+    """Next ``limit`` matching ids above ``after_id``, for chunked bulk jobs"""
+    conditions = _bulk_conditions(db, **filters)
+    if not conditions:
+        return []
+    result = await db.execute(
+        select(AIInsight.id)
+        .where(AIInsight.id > after_id, *conditions)
+        .order_by(AIInsight.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+async def archive_duplicate_live_insights(db: AsyncSession, limit: int) -> int:
+    """
+    Archive up to ``limit`` live insights that have a newer live insight for the same target
+
+    Catches rows written before supersession existed and the rare duplicate
+    left by two concurrent generations for one target.
+    """
+    newer = aliased(AIInsight)
+    has_newer = exists(
+        select(1).where(
+            newer.target_type == AIInsight.target_type,
+            newer.target_id.is_not_distinct_from(AIInsight.target_id),
+            newer.is_archived.is_(False),
+            newer.id > AIInsight.id
+        )
+    )
+    result = await db.execute(
+        select(AIInsight.id)
+        .where(AIInsight.is_archived.is_(False), has_newer)
+        .order_by(AIInsight.id)
+        .limit(limit)
+    )
+    duplicate_ids = list(result.scalars().all())
+    if duplicate_ids:
+        await db.execute(
+            update(AIInsight)
+            .where(AIInsight.id.in_(duplicate_ids))
+            .values(is_archived=True)
+            .execution_options(synchronize_session=False)
+        )
+        await _link_superseded(db, duplicate_ids)
+    await db.commit()
+    return len(duplicate_ids)
+
+async def prune_superseded_insights(db: AsyncSession, superseded_before: datetime, limit: int) -> int:
+    """Delete up to ``limit`` archived insights whose successor took over before ``superseded_before``"""
+    successor = aliased(AIInsight)
+    # A restored successor took over when it was unarchived, which may be long after it was created
+    took_over_at = func.coalesce(successor.updated_at, successor.created_at)
+    result = await db.execute(
+        select(AIInsight.id)
+        .join(successor, successor.id == AIInsight.superseded_by_id)
+        .where(AIInsight.is_archived.is_(True), took_over_at < superseded_before)
+        .order_by(AIInsight.id)
+        .limit(limit)
+    )
+    prune_ids = list(result.scalars().all())
+    if not prune_ids:
+        return 0
+    return await bulk_delete(db, ids=prune_ids)
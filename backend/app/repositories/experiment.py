@@ -0,0 +1,126 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import dialect_insert
+from app.models.experiment import Experiment, ExperimentAssignment, ExperimentStatus, ExperimentVariant
+
+# Rows per insert statement, well under SQLite's bound-parameter limit
+INSERT_CHUNK_SIZE = 500
+
+async def create_experiment(
+    db: AsyncSession,
+    name: Optional[str],
+    variants: List[Dict[str, Any]],
+    traffic_allocation: float = 1.0
+) -> Experiment:
+    """Store a running experiment with its variants, in the order given"""
+    experiment_id = str(uuid.uuid4())
+    experiment = Experiment(
+        id=experiment_id,
+        name=name or f"Test {experiment_id[:8]}",
+        status=ExperimentStatus.RUNNING,
+        traffic_allocation=traffic_allocation,
+        start_date=datetime.now(timezone.utc),
+        variants=[
+            ExperimentVariant(
+                key=variant["key"],
+                position=position,
+                content=variant.get("content", {}),
+                weight=float(variant.get("weight", 1.0))
+            )
+            for position, variant in enumerate(variants)
+        ]
+    )
+    db.add(experiment)
+    await db.commit()
+    return experiment
+
+async def get_experiment(db: AsyncSession, experiment_id: str) -> Optional[Experiment]:
+    return await db.get(Experiment, experiment_id, populate_existing=True)
+
+async def list_experiments(db: AsyncSession, status: Optional[ExperimentStatus] = None) -> List[Experiment]:
+    query = select(Experiment)
+    if status is not None:
+        query = query.where(Experiment.status == status)
+    # Counters change underneath loaded rows (see apply_variant_deltas), so always refresh them
+    result = await db.execute(query.order_by(Experiment.start_date.desc()).execution_options(populate_existing=True))
+    return list(result.scalars().all())
+
+async def complete_experiment(db: AsyncSession, experiment_id: str) -> bool:
+    """Mark a running experiment completed; False if it was not running"""
+    result = await db.execute(
+        update(Experiment)
+        .where(Experiment.id == experiment_id, Experiment.status == ExperimentStatus.RUNNING)
+        .values(status=ExperimentStatus.COMPLETED, end_date=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+async def get_variant_metrics(db: AsyncSession, experiment_id: str) -> Dict[int, Dict[str, Any]]:
+    """Current counters per variant id"""
+    result = await db.execute(
+        select(
+            ExperimentVariant.id,
+            ExperimentVariant.impressions,
+            ExperimentVariant.conversions,
+            ExperimentVariant.revenue
+        ).where(ExperimentVariant.experiment_id == experiment_id)
+    )
+    return {
+        row.id: {"impressions": row.impressions, "conversions": row.conversions, "revenue": row.revenue}
+        for row in result
+    }
+
+async def apply_variant_deltas(db: AsyncSession, deltas: Dict[int, List[float]]):
+    """Add (impressions, conversions, revenue) deltas to each variant's counters in one executemany"""
+    table = ExperimentVariant.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("variant_id"))
+        .values(
+            impressions=table.c.impressions + bindparam("d_impressions"),
+            conversions=table.c.conversions + bindparam("d_conversions"),
+            revenue=table.c.revenue + bindparam("d_revenue")
+        )
+    )
+    await db.execute(statement, [
+        {"variant_id": variant_id, "d_impressions": impressions, "d_conversions": conversions, "d_revenue": revenue}
+        for variant_id, (impressions, conversions, revenue) in deltas.items()
+    ])
+    await db.commit()
+
+async def get_assignments(db: AsyncSession, experiment_id: str, fan_ids: List[int]) -> Dict[int, int]:
+    """Stored fan id -> variant id for the given fans"""
+    if not fan_ids:
+        return {}
+    result = await db.execute(
+        select(ExperimentAssignment.fan_id, ExperimentAssignment.variant_id)
+        .where(ExperimentAssignment.experiment_id == experiment_id, ExperimentAssignment.fan_id.in_(fan_ids))
+    )
+    return dict(result.all())
+
+async def record_assignments(db: AsyncSession, experiment_id: str, assignments: Dict[int, int]) -> Dict[int, int]:
+    """
+    Store fan id -> variant id assignments with a bulk insert
+
+    Fans that already have an assignment keep it, also when another worker
+    recorded it first. Returns the assignments in effect for these fans.
+    """
+    if not assignments:
+        return {}
+    rows = [
+        {"experiment_id": experiment_id, "fan_id": fan_id, "variant_id": variant_id}
+        for fan_id, variant_id in assignments.items()
+    ]
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        await db.execute(
+            dialect_insert(db, ExperimentAssignment).values(rows[start:start + INSERT_CHUNK_SIZE]).on_conflict_do_nothing(
+                index_elements=["experiment_id", "fan_id"]
+            )
+        )
+    await db.commit()
+    return await get_assignments(db, experiment_id, list(assignments))
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.message import Message
+from app.repositories.message_rollup import apply_message_deltas
+from app.services.alert_engine import evaluate_alerts_safely
+from app.services.semantic_search import MESSAGES, index_safely
+
+async def get_messages_by_ids(db: AsyncSession, message_ids: List[int]) -> Dict[int, Message]:
+    if not message_ids:
+        return {}
+    result = await db.execute(select(Message).where(Message.id.in_(message_ids)))
+    return {message.id: message for message in result.scalars().all()}
+
+async def create_messages(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Message]:
+    """
+    Insert messages, fold them into the daily rollups and index their content
+
+    The alert rules are evaluated once per batch, as of its latest day.
+    """
+    db_messages = [Message(**row) for row in rows]
+    db.add_all(db_messages)
+    await db.flush()
+    entries = [(db_message.id, db_message.content) for db_message in db_messages]
+    changed_days = await apply_message_deltas(db, db_messages)
+    await db.commit()
+    await index_safely(MESSAGES, entries)
+    if changed_days:
+        await evaluate_alerts_safely(db, max(changed_days))
+    return db_messages
+
+async def conditional_totals(
+    db: AsyncSession,
+    conditions: List[Any],
+    start: datetime,
+    end: datetime,
+    creator_id: Optional[int] = None
+) -> List[Tuple[int, int, float]]:
+    """
+    (messages, purchases, revenue) of the messages matching each condition
+
+    Every condition is a conditional aggregate of the same statement, so the
+    range is scanned once however many conditions there are, and a message
+    counts towards each condition it matches.
+    """
+    purchased = Message.purchased == True  # noqa: E712
+    columns = []
+    for condition in conditions:
+        columns += [
+            func.coalesce(func.sum(case((condition, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(condition, purchased), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(condition, purchased), Message.price), else_=0.0)), 0.0)
+        ]
+    query = select(*columns).where(Message.sent_time >= start, Message.sent_time < end)
+    if creator_id is not None:
+        query = query.where(Message.creator_id == creator_id)
+    row = (await db.execute(query)).one()
+    return [(int(row[i]), int(row[i + 1]), float(row[i + 2])) for i in range(0, len(row), 3)]
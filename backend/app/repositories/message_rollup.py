@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import dialect_insert
+from app.models.message import MessageType
+from app.models.message_rollup import MessageRollup
+
+# Message foreign keys each rollup entity is keyed by
+ENTITY_KEYS = {"creator": "creator_id", "chatter": "chatter_id", "fan": "fan_id"}
+ROLLUP_METRICS = ("message_count", "ppv_offered", "ppv_purchased", "revenue")
+
+# Rows per upsert statement, well under SQLite's bound-parameter limit
+UPSERT_CHUNK_SIZE = 500
+
+def _message_deltas(messages: Iterable[Any]) -> Dict[Tuple[str, int, date], List[float]]:
+    """Sum a batch of messages into (entity_type, entity_id, day) -> metric deltas"""
+    deltas: Dict[Tuple[str, int, date], List[float]] = {}
+    for message in messages:
+        if message.sent_time is None:
+            continue
+        is_ppv = message.message_type == MessageType.PPV
+        purchased = bool(message.purchased)
+        values = (1, int(is_ppv), int(is_ppv and purchased), (message.price or 0.0) if purchased else 0.0)
+        day = message.sent_time.date()
+        for entity_type, key in ENTITY_KEYS.items():
+            entity_id = getattr(message, key)
+            if entity_id is None:
+                continue
+            totals = deltas.setdefault((entity_type, entity_id, day), [0, 0, 0, 0.0])
+            for i, value in enumerate(values):
+                totals[i] += value
+    return deltas
+
+async def apply_message_deltas(db: AsyncSession, messages: Iterable[Any]) -> Set[date]:
+    """
+    Add a batch of new messages to the daily rollups
+
+    Only the batch is aggregated; existing rows are incremented in place with
+    an upsert. Returns the days that changed. The caller commits.
+    """
+    deltas = _message_deltas(messages)
+    rows = [
+        {"entity_type": entity_type, "entity_id": entity_id, "day": day, **dict(zip(ROLLUP_METRICS, totals))}
+        for (entity_type, entity_id, day), totals in deltas.items()
+    ]
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        statement = dialect_insert(db, MessageRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=["entity_type", "entity_id", "day"],
+            set_={
+                metric: getattr(MessageRollup, metric) + getattr(statement.excluded, metric)
+                for metric in ROLLUP_METRICS
+            }
+        )
+        await db.execute(statement)
+    return {day for _, _, day in deltas}
+
+async def window_totals(db: AsyncSession, entity_type: str, as_of: date, window_days: int) -> List[Any]:
+    """
+    Per-entity totals of the ``window_days`` ending at ``as_of`` and of the window before it
+
+    Rows have entity_id plus current_<metric> and previous_<metric> columns,
+    read from at most two windows of rollups rather than message history.
+    """
+    window_start = as_of - timedelta(days=window_days)
+    previous_start = window_start - timedelta(days=window_days)
+    in_current = MessageRollup.day > window_start
+    columns = []
+    for metric in ROLLUP_METRICS:
+        column = getattr(MessageRollup, metric)
+        columns.append(func.sum(case((in_current, column), else_=0)).label(f"current_{metric}"))
+        columns.append(func.sum(case((in_current, 0), else_=column)).label(f"previous_{metric}"))
+
+    result = await db.execute(
+        select(MessageRollup.entity_id, *columns)
+        .where(
+            MessageRollup.entity_type == entity_type,
+            MessageRollup.day > previous_start,
+            MessageRollup.day <= as_of
+        )
+        .group_by(MessageRollup.entity_id)
+    )
+    return list(result.all())
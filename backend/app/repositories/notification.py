@@ -0,0 +1,362 @@
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, not_, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.db.base import dialect_insert
+from app.models.notification import Notification, NotificationArchive, NotificationReceipt, NotificationSeverity
+from app.services.notification_service import publish_safely
+from app.services.unread_counter import BROADCAST, CounterKey, unread_counter
+
+def _counter_key(user_id: Optional[int]) -> CounterKey:
+    return BROADCAST if user_id is None else user_id
+
+def _dismissed_key(user_id: int) -> CounterKey:
+    """Counter of the broadcasts the user has read or archived"""
+    return f"{BROADCAST}:dismissed:{user_id}"
+
+def _visible_to(user_id: int):
+    """Notifications addressed to the user plus broadcasts"""
+    return or_(Notification.user_id == user_id, Notification.user_id.is_(None))
+
+def _receipt_of(user_id: int):
+    """Outer join condition for the user's receipt of a broadcast"""
+    return and_(NotificationReceipt.notification_id == Notification.id, NotificationReceipt.user_id == user_id)
+
+# The user's view of a notification: a broadcast's own flags or their receipt
+_IS_READ = or_(Notification.is_read == True, func.coalesce(NotificationReceipt.is_read, False) == True)  # noqa: E712
+_IS_ARCHIVED = or_(Notification.is_archived == True, func.coalesce(NotificationReceipt.is_archived, False) == True)  # noqa: E712
+
+async def _load_for(db: AsyncSession, user_id: int, query) -> List[Notification]:
+    """
+    Run a select of notifications visible to the user with their own read and archive state
+
+    The flags are set as loaded values, so the shared broadcast rows are
+    never written back.
+    """
+    result = await db.execute(query.add_columns(_IS_READ, _IS_ARCHIVED).outerjoin(NotificationReceipt, _receipt_of(user_id)))
+    notifications = []
+    for notification, is_read, is_archived in result.all():
+        set_committed_value(notification, "is_read", bool(is_read))
+        set_committed_value(notification, "is_archived", bool(is_archived))
+        notifications.append(notification)
+    return notifications
+
+async def list_notifications(
+    db: AsyncSession,
+    user_id: int,
+    severity: Optional[NotificationSeverity] = None,
+    is_read: Optional[bool] = None,
+    is_archived: Optional[bool] = None,
+    limit: int = 50
+) -> List[Notification]:
+    """Newest notifications visible to the user"""
+    query = select(Notification).where(_visible_to(user_id))
+    if severity is not None:
+        query = query.where(Notification.severity == severity)
+    if is_read is not None:
+        query = query.where(_IS_READ if is_read else not_(_IS_READ))
+    if is_archived is not None:
+        query = query.where(_IS_ARCHIVED if is_archived else not_(_IS_ARCHIVED))
+    return await _load_for(db, user_id, query.order_by(Notification.id.desc()).limit(limit))
+
+async def notifications_after(db: AsyncSession, user_id: int, after_id: int, limit: int) -> List[Notification]:
+    """Notifications visible to the user with ids above ``after_id``, oldest first"""
+    return await _load_for(
+        db, user_id,
+        select(Notification)
+        .where(_visible_to(user_id), Notification.id > after_id)
+        .order_by(Notification.id)
+        .limit(limit)
+    )
+
+async def create_notifications(
+    db: AsyncSession,
+    rows: List[Dict[str, Any]],
+    skip_duplicates: bool = False
+) -> List[Notification]:
+    """
+    Insert notifications in one statement and push them to connected clients
+
+    With ``skip_duplicates`` rows whose dedup_key already exists are dropped
+    and only the inserted notifications are returned.
+    """
+    if not rows:
+        return []
+    if skip_duplicates:
+        # The ORM cannot match RETURNING rows to skipped inserts, so insert at the table level and load the survivors
+        table = Notification.__table__
+        statement = dialect_insert(db, table).on_conflict_do_nothing(index_elements=["dedup_key"])
+        inserted_ids = (await db.scalars(statement.returning(table.c.id), rows)).all()
+        result = await db.scalars(select(Notification).where(Notification.id.in_(inserted_ids)).order_by(Notification.id))
+    else:
+        result = await db.scalars(insert(Notification).returning(Notification), rows)
+    notifications = list(result.all())
+    await db.commit()
+
+    deltas: Dict[CounterKey, int] = {}
+    for notification in notifications:
+        if not notification.is_read and not notification.is_archived:
+            key = _counter_key(notification.user_id)
+            deltas[key] = deltas.get(key, 0) + 1
+    await unread_counter.adjust(deltas)
+    await publish_safely(notifications)
+    return notifications
+
+async def _count_unread(db: AsyncSession, key: CounterKey) -> int:
+    recipient = Notification.user_id.is_(None) if key == BROADCAST else Notification.user_id == key
+    # Served by the partial ix_notifications_unread index
+    result = await db.execute(
+        select(func.count())
+        .select_from(Notification)
+        .where(recipient, Notification.is_read == False, Notification.is_archived == False)  # noqa: E712
+    )
+    return result.scalar_one()
+
+async def _count_dismissed(db: AsyncSession, user_id: int) -> int:
+    """Unread, unarchived broadcasts the user has read or archived"""
+    result = await db.execute(
+        select(func.count())
+        .select_from(NotificationReceipt)
+        .join(Notification, Notification.id == NotificationReceipt.notification_id)
+        .where(
+            NotificationReceipt.user_id == user_id,
+            or_(NotificationReceipt.is_read == True, NotificationReceipt.is_archived == True),  # noqa: E712
+            Notification.user_id.is_(None),
+            Notification.is_read == False,  # noqa: E712
+            Notification.is_archived == False  # noqa: E712
+        )
+    )
+    return result.scalar_one()
+
+async def count_unread(db: AsyncSession, user_id: int) -> int:
+    """
+    Unread, unarchived notifications visible to the user, from the cached counters when possible
+
+    That is the user's own unread count plus the shared broadcast count,
+    less the broadcasts the user has already read or archived.
+    """
+    counts = []
+    for key, recount in (
+        (user_id, lambda: _count_unread(db, user_id)),
+        (BROADCAST, lambda: _count_unread(db, BROADCAST)),
+        (_dismissed_key(user_id), lambda: _count_dismissed(db, user_id))
+    ):
+        count = await unread_counter.get(key)
+        if count is None:
+            count = await recount()
+            await unread_counter.set(key, count)
+        counts.append(count)
+    own, broadcast, dismissed = counts
+    # The counters expire independently, so keep a briefly stale badge from going negative
+    return own + max(broadcast - dismissed, 0)
+
+async def _mark(
+    db: AsyncSession,
+    user_id: int,
+    column: str,
+    notification_ids: Optional[List[int]] = None,
+    severity: Optional[NotificationSeverity] = None
+) -> int:
+    """
+    Set ``column`` (is_read or is_archived) on the user's matching notifications
+
+    The user's own notifications change in one UPDATE; broadcasts are shared,
+    so the user's receipts for them are upserted instead. Only rows that
+    change are touched and the unread counters move by those that were
+    unread and unarchived. Returns the number of notifications changed.
+    """
+    target = getattr(Notification, column)
+    other = Notification.is_archived if column == "is_read" else Notification.is_read
+    statement = update(Notification).where(Notification.user_id == user_id, target == False)  # noqa: E712
+    if notification_ids is not None:
+        statement = statement.where(Notification.id.in_(notification_ids))
+    else:
+        # Bulk changes only cover the inbox; archived rows are left as they are
+        statement = statement.where(Notification.is_archived == False)  # noqa: E712
+    if severity is not None:
+        statement = statement.where(Notification.severity == severity)
+
+    result = await db.execute(
+        statement
+        .values({column: True})
+        .returning(Notification.user_id, other)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.all()
+    dismissed = await _mark_broadcasts(db, user_id, column, notification_ids, severity)
+    await db.commit()
+
+    unread_changed = sum(1 for _, other_flag in changed if not other_flag)
+    await unread_counter.adjust({user_id: -unread_changed, _dismissed_key(user_id): dismissed["unread"]})
+    return len(changed) + dismissed["changed"]
+
+async def _mark_broadcasts(
+    db: AsyncSession,
+    user_id: int,
+    column: str,
+    notification_ids: Optional[List[int]],
+    severity: Optional[NotificationSeverity]
+) -> Dict[str, int]:
+    """
+    Upsert the user's receipts setting ``column`` on the matching broadcasts
+
+    Returns how many receipts changed and how many of those broadcasts were
+    still unread and unarchived for the user beforehand.
+    """
+    target = getattr(NotificationReceipt, column)
+    other = NotificationReceipt.is_archived if column == "is_read" else NotificationReceipt.is_read
+    query = (
+        select(Notification.id, Notification.is_read, Notification.is_archived)
+        .outerjoin(NotificationReceipt, _receipt_of(user_id))
+        .where(
+            Notification.user_id.is_(None),
+            getattr(Notification, column) == False,  # noqa: E712
+            func.coalesce(target, False) == False  # noqa: E712
+        )
+    )
+    if notification_ids is not None:
+        query = query.where(Notification.id.in_(notification_ids))
+    else:
+        query = query.where(not_(_IS_ARCHIVED))
+    if severity is not None:
+        query = query.where(Notification.severity == severity)
+    broadcasts = {row.id: not row.is_read and not row.is_archived for row in (await db.execute(query)).all()}
+    if not broadcasts:
+        return {"changed": 0, "unread": 0}
+
+    statement = dialect_insert(db, NotificationReceipt).values(
+        [{"user_id": user_id, "notification_id": notification_id, column: True} for notification_id in broadcasts]
+    )
+    # A concurrent request may have written the receipt since the select; only a real change counts
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "notification_id"],
+        set_={column: True, "updated_at": func.now()},
+        where=target == False  # noqa: E712
+    )
+    result = await db.execute(statement.returning(NotificationReceipt.notification_id, other))
+    changed = result.all()
+    return {
+        "changed": len(changed),
+        "unread": sum(1 for notification_id, other_flag in changed if broadcasts[notification_id] and not other_flag)
+    }
+
+async def mark_read(
+    db: AsyncSession,
+    user_id: int,
+    notification_ids: Optional[List[int]] = None,
+    severity: Optional[NotificationSeverity] = None
+) -> int:
+    """Mark the given notifications, or all of the user's unread ones, as read"""
+    return await _mark(db, user_id, "is_read", notification_ids, severity)
+
+async def archive(db: AsyncSession, user_id: int, notification_ids: List[int]) -> int:
+    return await _mark(db, user_id, "is_archived", notification_ids)
+
+async def get_notification(db: AsyncSession, user_id: int, notification_id: int) -> Optional[Notification]:
+    found = await _load_for(db, user_id, select(Notification).where(Notification.id == notification_id, _visible_to(user_id)))
+    return found[0] if found else None
+
+_ARCHIVE_COLUMNS = [column.name for column in NotificationArchive.__table__.columns if column.name != "moved_at"]
+_PARTITION_NAME = re.compile(r"^notifications_archive_y(\d{4})m(\d{2})$")
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def _next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+async def _ensure_archive_partitions(db: AsyncSession, oldest: datetime, newest: datetime):
+    """Create the monthly archive partitions covering ``oldest``..``newest`` (PostgreSQL only)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    month = _month_start(oldest)
+    while month <= newest:
+        upper = _next_month(month)
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS notifications_archive_y{month.year}m{month.month:02d} "
+            f"PARTITION OF notifications_archive "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        month = upper
+
+async def move_archived_notifications(db: AsyncSession, archived_before: datetime, limit: int) -> int:
+    """
+    Move up to ``limit`` notifications archived before ``archived_before`` to notifications_archive
+
+    The copy and the delete commit together, so each batch is moved exactly
+    once. Only archived rows move, so the unread counters are unaffected. A
+    broadcast only moves once it was archived for everyone, not when users
+    archive their own copy; its receipts go with it.
+    Returns the number of notifications moved.
+    """
+    result = await db.execute(
+        select(Notification.id, Notification.created_at)
+        .where(Notification.is_archived == True, Notification.updated_at < archived_before)  # noqa: E712
+        .order_by(Notification.id)
+        .limit(limit)
+    )
+    batch = result.all()
+    if not batch:
+        return 0
+    ids = [row.id for row in batch]
+    created = [row.created_at for row in batch]
+    await _ensure_archive_partitions(db, min(created), max(created))
+
+    source = Notification.__table__
+    await db.execute(
+        insert(NotificationArchive).from_select(
+            _ARCHIVE_COLUMNS,
+            select(*[source.c[name] for name in _ARCHIVE_COLUMNS]).where(source.c.id.in_(ids))
+        )
+    )
+    await db.execute(
+        delete(NotificationReceipt).where(NotificationReceipt.notification_id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    await db.execute(delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False))
+    await db.commit()
+    return len(ids)
+
+async def drop_archive_partitions(db: AsyncSession, created_before: datetime) -> List[str]:
+    """Drop monthly archive partitions that end on or before ``created_before`` (PostgreSQL only)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return []
+    result = await db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE parent.relname = 'notifications_archive'"
+    ))
+    dropped = []
+    for name in sorted(result.scalars().all()):
+        match = _PARTITION_NAME.match(name)
+        if match is None:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if _next_month(month) <= created_before:
+            await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    await db.commit()
+    return dropped
+
+async def prune_notification_archive(db: AsyncSession, created_before: datetime, limit: int) -> int:
+    """Delete up to ``limit`` archived notifications created before ``created_before``"""
+    result = await db.execute(
+        select(NotificationArchive.id, NotificationArchive.created_at)
+        .where(NotificationArchive.created_at < created_before)
+        .order_by(NotificationArchive.created_at)
+        .limit(limit)
+    )
+    keys = result.all()
+    if not keys:
+        return 0
+    await db.execute(
+        delete(NotificationArchive)
+        .where(NotificationArchive.created_at < created_before, NotificationArchive.id.in_([key.id for key in keys]))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(keys)
@@ -0,0 +1,46 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.principal_cache import principal_cache
+from app.models.user import User
+
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def list_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
+    result = await db.execute(select(User).order_by(User.id).offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+async def create_user(db: AsyncSession, **fields: Any) -> User:
+    db_user = User(**fields)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user(db: AsyncSession, db_user: User, update_data: Dict[str, Any]) -> User:
+    # Tokens carry the username, so a rename must also drop the old subject's entry
+    old_username = db_user.username
+    for key, value in update_data.items():
+        setattr(db_user, key, value)
+    await db.commit()
+    await db.refresh(db_user)
+    # Role or active-flag changes must not be served from a stale principal
+    for username in {old_username, db_user.username}:
+        await principal_cache.invalidate(username)
+    return db_user
+
+async def delete_user(db: AsyncSession, db_user: User) -> None:
+    await db.delete(db_user)
+    await db.commit()
+    await principal_cache.invalidate(db_user.username)
@@ -1,5 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel, Field
+from pydantic.utils import GetterDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -32,14 +33,28 @@ class AIInsightUpdate(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
     is_archived: Optional[bool] = None
 
+class AIInsightGetterDict(GetterDict):
+    """Read ORM attributes under their API field names and values"""
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key == "metadata":
+            key = "metadata_"
+        value = super().get(key, default)
+        # The ORM and API define separate TargetType enums
+        if isinstance(value, Enum):
+            return value.value
+        return value
+
 class AIInsightResponse(AIInsightBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
     is_archived: bool = False
+    superseded_by_id: Optional[int] = None
     
     class Config:
         orm_mode = True
+        getter_dict = AIInsightGetterDict
 
 class AIInsightGenerateRequest(BaseModel):
     target_type: TargetType
@@ -50,3 +65,43 @@ class AIInsightGenerateResponse(BaseModel):
     status: str
     message: str
     insight_id: Optional[int] = None
+    task_id: Optional[str] = None
+
+class AIInsightBatchGenerateRequest(BaseModel):
+    target_type: TargetType
+    target_ids: Optional[List[int]] = None
+    creator_id: Optional[int] = None
+    custom_prompt: Optional[str] = None
+
+class AIInsightBatchGenerateResponse(BaseModel):
+    status: str
+    message: str
+    task_id: str
+
+class AIInsightTaskStatus(BaseModel):
+    task_id: str
+    state: str
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class AIInsightBulkFilter(BaseModel):
+    target_type: Optional[TargetType] = None
+    target_ids: Optional[List[int]] = None
+    is_archived: Optional[bool] = None
+    tags: Optional[List[str]] = None
+    creator_id: Optional[int] = None
+    created_before: Optional[datetime] = None
+    created_after: Optional[datetime] = None
+
+class AIInsightBulkRequest(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[AIInsightBulkFilter] = None
+    # Run on the ai-insights queue in chunks; use for very large selections
+    run_async: bool = False
+
+class AIInsightBulkResponse(BaseModel):
+    status: str
+    action: str
+    affected: Optional[int] = None
+    task_id: Optional[str] = None
@@ -0,0 +1,49 @@
+from pydantic import BaseModel, Field, root_validator, validator
+from typing import List, Optional
+from datetime import datetime
+
+from app.schemas.message import MessageType
+
+class ExperimentEvent(BaseModel):
+    """Counts observed for one variant; a single impression by default"""
+    variant: str
+    impressions: int = Field(1, ge=0)
+    conversions: int = Field(0, ge=0)
+    revenue: float = Field(0.0, ge=0.0)
+
+class ExperimentEventBatch(BaseModel):
+    events: List[ExperimentEvent] = Field(..., min_items=1, max_items=10000)
+
+class AssignmentRequest(BaseModel):
+    fan_ids: List[int] = Field(..., min_items=1, max_items=50000)
+
+class BacktestVariant(BaseModel):
+    """Messages a strategy would have sent; every given condition must hold"""
+    key: str
+    message_types: Optional[List[MessageType]] = None
+    min_price: Optional[float] = Field(None, ge=0.0)
+    max_price: Optional[float] = Field(None, ge=0.0)
+    # Hours of the day (UTC) the message was sent in
+    send_hours: Optional[List[int]] = None
+
+    @validator("send_hours", each_item=True)
+    def valid_hour(cls, value):
+        if not 0 <= value <= 23:
+            raise ValueError("send hours must be between 0 and 23")
+        return value
+
+class BacktestRequest(BaseModel):
+    start: datetime
+    end: datetime
+    creator_id: Optional[int] = None
+    # The first variant is the baseline the others are compared with
+    variants: List[BacktestVariant] = Field(..., min_items=2, max_items=10)
+
+    @root_validator(skip_on_failure=True)
+    def valid_range(cls, values):
+        if values["end"] <= values["start"]:
+            raise ValueError("end must be after start")
+        keys = [variant.key for variant in values["variants"]]
+        if len(set(keys)) != len(keys):
+            raise ValueError("variant keys must be unique")
+        return values
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -13,9 +13,15 @@ class NotificationBase(BaseModel):
     severity: NotificationSeverity = NotificationSeverity.NORMAL
     related_id: Optional[int] = None
     related_type: Optional[str] = None
+    user_id: Optional[int] = None
     is_read: bool = False
     is_archived: bool = False
 
+    @validator("severity", pre=True)
+    def severity_value(cls, value):
+        # Rows carry the ORM enum; accept it as well as its string value
+        return getattr(value, "value", value)
+
 class NotificationCreate(NotificationBase):
     pass
 
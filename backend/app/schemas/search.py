@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+from app.schemas.ai_insight import AIInsightResponse
+
+class InsightSearchResult(BaseModel):
+    score: float
+    insight: AIInsightResponse
+
+class MessageSearchResult(BaseModel):
+    score: float
+    id: int
+    fan_id: Optional[int] = None
+    chatter_id: Optional[int] = None
+    creator_id: Optional[int] = None
+    sent_time: Optional[datetime] = None
+    message_type: Optional[str] = None
+    content: Optional[str] = None
+
+class IndexRebuildResponse(BaseModel):
+    status: str
+    message: str
+    task_id: str
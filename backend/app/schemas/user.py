@@ -25,6 +25,7 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     password: Optional[str] = None
     role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
 
 class UserResponse(UserBase):
     id: int
@@ -34,6 +35,9 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+class UserInDB(UserResponse):
+    hashed_password: str
+
 # Token schemas
 class Token(BaseModel):
     access_token: str
@@ -0,0 +1,219 @@
+import json
+import operator
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.models.chatter import Chatter
+from app.models.creator import Creator
+from app.models.fan import Fan
+from app.models.notification import NotificationSeverity
+from app.repositories import notification as notification_repo
+from app.repositories.message_rollup import ENTITY_KEYS, ROLLUP_METRICS, window_totals
+
+# Rules are declarative so they can be tuned without code changes (see ALERT_RULES_PATH).
+# "threshold" compares the current window's metric with value; "trend" compares the
+# relative change from the previous window, ignoring entities whose previous value is
+# below min_baseline. Messages are format strings over name, current, previous, change
+# and drop (the negated change).
+DEFAULT_ALERT_RULES = [
+    {
+        "name": "creator-revenue-drop",
+        "entity": "creator",
+        "metric": "revenue",
+        "kind": "trend",
+        "op": "<=",
+        "value": -0.3,
+        "min_baseline": 100.0,
+        "severity": "risk",
+        "message": "Creator {name} revenue down {drop:.0%} week over week"
+    },
+    {
+        "name": "creator-activity-drop",
+        "entity": "creator",
+        "metric": "message_count",
+        "kind": "trend",
+        "op": "<=",
+        "value": -0.4,
+        "min_baseline": 50,
+        "severity": "caution",
+        "message": "Creator {name} message volume down {drop:.0%}"
+    },
+    {
+        "name": "chatter-conversion-drop",
+        "entity": "chatter",
+        "metric": "conversion_rate",
+        "kind": "trend",
+        "op": "<=",
+        "value": -0.25,
+        "min_baseline": 0.05,
+        "severity": "caution",
+        "message": "Chatter {name} PPV conversion down {drop:.0%} to {current:.0%}"
+    },
+    {
+        "name": "fan-went-quiet",
+        "entity": "fan",
+        "metric": "message_count",
+        "kind": "trend",
+        "op": "<=",
+        "value": -1.0,
+        "min_baseline": 20,
+        "severity": "risk",
+        "message": "Fan {name} at high risk of churn: no messages this week after {previous:.0f} last week"
+    },
+    {
+        "name": "fan-spend-spike",
+        "entity": "fan",
+        "metric": "revenue",
+        "kind": "threshold",
+        "op": ">=",
+        "value": 500.0,
+        "severity": "normal",
+        "message": "Fan {name} spent ${current:,.2f} this week"
+    }
+]
+
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+_METRICS = ROLLUP_METRICS + ("conversion_rate",)
+_NAME_COLUMNS = {"creator": Creator, "chatter": Chatter, "fan": Fan}
+
+class CompiledRule:
+    """A validated rule with its comparison resolved to a NumPy ufunc"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec["name"]
+        self.entity = spec["entity"]
+        self.metric = spec["metric"]
+        self.kind = spec.get("kind", "threshold")
+        self.value = float(spec["value"])
+        self.min_baseline = float(spec.get("min_baseline", 0.0))
+        self.severity = NotificationSeverity(spec.get("severity", "caution"))
+        self.message = spec["message"]
+        if self.entity not in ENTITY_KEYS:
+            raise ValueError(f"Rule {self.name}: unknown entity {self.entity}")
+        if self.metric not in _METRICS:
+            raise ValueError(f"Rule {self.name}: unknown metric {self.metric}")
+        if self.kind not in ("threshold", "trend"):
+            raise ValueError(f"Rule {self.name}: unknown kind {self.kind}")
+        if spec.get("op") not in _OPERATORS:
+            raise ValueError(f"Rule {self.name}: unknown operator {spec.get('op')}")
+        self.compare = _OPERATORS[spec["op"]]
+
+    def matches(self, current: np.ndarray, previous: np.ndarray, change: np.ndarray) -> np.ndarray:
+        """Boolean mask over every entity at once"""
+        with np.errstate(invalid="ignore"):
+            if self.kind == "threshold":
+                return self.compare(current, self.value)
+            return (previous >= self.min_baseline) & self.compare(change, self.value)
+
+class AlertRuleSet:
+    """Rules compiled once and grouped by the entity type they evaluate"""
+
+    def __init__(self, specs: List[Dict[str, Any]]):
+        self.rules_by_entity: Dict[str, List[CompiledRule]] = {}
+        for spec in specs:
+            rule = CompiledRule(spec)
+            self.rules_by_entity.setdefault(rule.entity, []).append(rule)
+
+    @staticmethod
+    def _metric_arrays(rows: List[Any]) -> Dict[str, np.ndarray]:
+        arrays = {
+            f"{window}_{metric}": np.fromiter((getattr(row, f"{window}_{metric}") or 0 for row in rows), float, len(rows))
+            for window in ("current", "previous")
+            for metric in ROLLUP_METRICS
+        }
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for window in ("current", "previous"):
+                offered = arrays[f"{window}_ppv_offered"]
+                arrays[f"{window}_conversion_rate"] = np.where(
+                    offered > 0, arrays[f"{window}_ppv_purchased"] / offered, np.nan
+                )
+        return arrays
+
+    def evaluate(self, entity: str, rows: List[Any]) -> List[Dict[str, Any]]:
+        """Alerts raised by this entity type's rules over window_totals rows"""
+        rules = self.rules_by_entity.get(entity, [])
+        if not rules or not rows:
+            return []
+        entity_ids = np.fromiter((row.entity_id for row in rows), np.int64, len(rows))
+        arrays = self._metric_arrays(rows)
+
+        alerts = []
+        for rule in rules:
+            current = arrays[f"current_{rule.metric}"]
+            previous = arrays[f"previous_{rule.metric}"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                change = np.where(previous > 0, (current - previous) / previous, np.nan)
+            for i in np.flatnonzero(rule.matches(current, previous, change)):
+                alerts.append({
+                    "rule": rule,
+                    "entity_id": int(entity_ids[i]),
+                    "current": float(current[i]),
+                    "previous": float(previous[i]),
+                    "change": float(change[i])
+                })
+        return alerts
+
+_alert_rules: Optional[AlertRuleSet] = None
+
+def get_alert_rules() -> AlertRuleSet:
+    """Process-wide rule set, compiled on first use"""
+    global _alert_rules
+    if _alert_rules is None:
+        specs = DEFAULT_ALERT_RULES
+        if config.ALERT_RULES_PATH:
+            with open(config.ALERT_RULES_PATH) as f:
+                specs = json.load(f)
+        _alert_rules = AlertRuleSet(specs)
+    return _alert_rules
+
+async def _entity_names(db: AsyncSession, entity: str, entity_ids: List[int]) -> Dict[int, str]:
+    model = _NAME_COLUMNS[entity]
+    result = await db.execute(select(model.id, model.name).where(model.id.in_(entity_ids)))
+    return dict(result.all())
+
+async def evaluate_alerts(db: AsyncSession, as_of: date) -> int:
+    """
+    Evaluate every rule against the rollup windows ending at ``as_of``
+
+    Each (rule, entity) alerts at most once per ALERT_DEDUP_DAYS; repeats are
+    dropped by the notifications' unique dedup_key. Returns the number of
+    notifications created.
+    """
+    rule_set = get_alert_rules()
+    dedup_bucket = as_of.toordinal() // config.ALERT_DEDUP_DAYS
+    rows = []
+    for entity in rule_set.rules_by_entity:
+        alerts = rule_set.evaluate(entity, await window_totals(db, entity, as_of, config.ALERT_WINDOW_DAYS))
+        if not alerts:
+            continue
+        names = await _entity_names(db, entity, list({alert["entity_id"] for alert in alerts}))
+        for alert in alerts:
+            rule = alert["rule"]
+            rows.append({
+                "message": rule.message.format(
+                    name=names.get(alert["entity_id"], f"#{alert['entity_id']}"),
+                    current=alert["current"],
+                    previous=alert["previous"],
+                    change=alert["change"],
+                    drop=-alert["change"]
+                ),
+                "severity": rule.severity,
+                "related_type": entity,
+                "related_id": alert["entity_id"],
+                "dedup_key": f"{rule.name}:{alert['entity_id']}:{dedup_bucket}"
+            })
+    created = await notification_repo.create_notifications(db, rows, skip_duplicates=True)
+    return len(created)
+
+async def evaluate_alerts_safely(db: AsyncSession, as_of: date):
+    """Run the alert rules after ingestion; the ingestion itself never fails because of them"""
+    try:
+        await evaluate_alerts(db, as_of)
+    except Exception as e:
+        await db.rollback()
+        print(f"Error evaluating alert rules: {str(e)}")
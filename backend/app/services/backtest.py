@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import and_, extract, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.message import Message, MessageType
+from app.repositories import message as message_repo
+from app.schemas.experiment import BacktestRequest, BacktestVariant
+from app.services.experiment_stats import experiment_results
+
+# Most progress steps a streamed backtest is split into
+MAX_PROGRESS_CHUNKS = 20
+
+def variant_condition(variant: BacktestVariant):
+    """SQL predicate over Message for a backtest variant"""
+    conditions = []
+    if variant.message_types:
+        conditions.append(Message.message_type.in_([MessageType(t.value) for t in variant.message_types]))
+    if variant.min_price is not None:
+        conditions.append(Message.price >= variant.min_price)
+    if variant.max_price is not None:
+        conditions.append(Message.price <= variant.max_price)
+    if variant.send_hours:
+        conditions.append(extract("hour", Message.sent_time).in_(variant.send_hours))
+    return and_(true(), *conditions)
+
+def _chunks(start: datetime, end: datetime, count: int) -> List[Tuple[datetime, datetime]]:
+    step = (end - start) / count
+    bounds = [start + step * i for i in range(count)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def backtest_result(request: BacktestRequest, totals: np.ndarray) -> Dict[str, Any]:
+    """Per-variant totals compared with the first variant, as for a live test"""
+    analysis = experiment_results([{
+        "id": "backtest",
+        "variants": [
+            {"key": variant.key, "impressions": int(messages), "conversions": int(purchases), "revenue": float(revenue)}
+            for variant, (messages, purchases, revenue) in zip(request.variants, totals)
+        ]
+    }])["backtest"]
+    return {"start": request.start, "end": request.end, "creator_id": request.creator_id, **analysis}
+
+async def run_backtest(db: AsyncSession, request: BacktestRequest, chunks: int = 1) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Estimate each variant's conversion and revenue over historical messages
+
+    Each chunk of the date range is one conditional-aggregate query over the
+    indexed sent_time range, covering every variant at once. Yields a
+    "progress" event per chunk and a final "result" event. Messages stand in
+    for impressions and purchases for conversions.
+    """
+    conditions = [variant_condition(variant) for variant in request.variants]
+    totals = np.zeros((len(conditions), 3))
+    ranges = _chunks(request.start, request.end, max(1, min(chunks, MAX_PROGRESS_CHUNKS)))
+    for done, (chunk_start, chunk_end) in enumerate(ranges, start=1):
+        totals += np.asarray(
+            await message_repo.conditional_totals(db, conditions, chunk_start, chunk_end, request.creator_id),
+            dtype=float
+        )
+        yield "progress", {"through": chunk_end, "fraction": done / len(ranges)}
+    yield "result", backtest_result(request, totals)
@@ -4,11 +4,12 @@ from googleapiclient.http import MediaIoBaseDownload
 import io
 import os
 import hashlib
+import json
 from datetime import datetime
 import pandas as pd
 from typing import List, Dict, Any, Optional
 
-from app.core.config import settings
+from app.core import config
 
 class DriveService:
     """
@@ -19,8 +20,8 @@ class DriveService:
         """
         Initialize the Drive service with credentials
         """
-        self.credentials_file = credentials_file or settings.GOOGLE_DRIVE_CREDENTIALS_FILE
-        self.folder_id = settings.GOOGLE_DRIVE_FOLDER_ID
+        self.credentials_file = credentials_file
+        self.folder_id = config.GOOGLE_DRIVE_FOLDER_ID
         self.service = None
     
     def authenticate(self):
@@ -28,10 +29,14 @@ class DriveService:
         Authenticate with Google Drive API
         """
         try:
-            credentials = service_account.Credentials.from_service_account_file(
-                self.credentials_file,
-                scopes=['https://www.googleapis.com/auth/drive.readonly']
-            )
+            scopes = ['https://www.googleapis.com/auth/drive.readonly']
+            # A key file when given, otherwise the service account JSON from GOOGLE_DRIVE_CREDENTIALS
+            if self.credentials_file:
+                credentials = service_account.Credentials.from_service_account_file(self.credentials_file, scopes=scopes)
+            else:
+                credentials = service_account.Credentials.from_service_account_info(
+                    json.loads(config.GOOGLE_DRIVE_CREDENTIALS), scopes=scopes
+                )
             self.service = build('drive', 'v3', credentials=credentials)
             return True
         except Exception as e:
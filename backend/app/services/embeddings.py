@@ -0,0 +1,53 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+from app.core import config
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+class HashingEmbedder:
+    """
+    Dependency-free embedding from signed feature hashing
+
+    Words and word bigrams are hashed into ``dim`` buckets and the result is
+    L2-normalized. It captures lexical overlap only, but is deterministic,
+    needs no model download and embeds thousands of texts per second.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed_one(self, text: str, out: np.ndarray):
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            h = zlib.crc32(feature.encode())
+            out[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            self._embed_one(text or "", vectors[row])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model; requires the sentence-transformers package"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+def get_embedder():
+    """Build the model configured by EMBEDDING_MODEL ("hashing" or a sentence-transformers model name)"""
+    if config.EMBEDDING_MODEL == "hashing":
+        return HashingEmbedder(config.EMBEDDING_DIM)
+    return SentenceTransformerEmbedder(config.EMBEDDING_MODEL)
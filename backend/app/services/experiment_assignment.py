@@ -0,0 +1,64 @@
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Resolution of traffic splits: weights are rounded to 1/BUCKETS of traffic
+BUCKETS = 10000
+
+# Fans outside the experiment's traffic allocation
+NOT_ENROLLED = -1
+
+def _salt(experiment_id: str, purpose: str) -> np.uint64:
+    digest = hashlib.blake2b(f"{experiment_id}:{purpose}".encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "big"))
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer over a uint64 array; wraps modulo 2**64 by design"""
+    x = values + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def buckets(experiment_id: str, fan_ids: np.ndarray, purpose: str = "variant") -> np.ndarray:
+    """Stable bucket in [0, BUCKETS) for every fan, independent per experiment and purpose"""
+    with np.errstate(over="ignore"):
+        return (_mix(fan_ids.astype(np.uint64) ^ _salt(experiment_id, purpose)) % np.uint64(BUCKETS)).astype(np.int64)
+
+def assign_variants(
+    experiment_id: str,
+    fan_ids: Iterable[int],
+    weights: Sequence[float],
+    traffic_allocation: float = 1.0
+) -> np.ndarray:
+    """
+    Variant index for each fan, or NOT_ENROLLED
+
+    A pure function of its arguments, so every worker, task or client that
+    knows the experiment computes the same answer without storing anything.
+    Enrollment and the variant split hash with separate salts: raising
+    ``traffic_allocation`` only adds fans, and a fan's variant only moves
+    when the weights themselves change.
+    """
+    fan_ids = np.fromiter(fan_ids, np.int64)
+    weights = np.asarray(weights, float)
+    total = weights.sum()
+    if fan_ids.size == 0 or total <= 0:
+        return np.full(fan_ids.size, NOT_ENROLLED, np.int64)
+
+    # Upper bucket bound of each variant's share; zero-weight variants get an empty range
+    bounds = np.rint(np.cumsum(weights) / total * BUCKETS).astype(np.int64)
+    variants = np.searchsorted(bounds, buckets(experiment_id, fan_ids), side="right")
+    enrolled = buckets(experiment_id, fan_ids, "traffic") < int(round(traffic_allocation * BUCKETS))
+    return np.where(enrolled, variants, NOT_ENROLLED)
+
+def assign_variant_keys(experiment: Dict[str, Any], fan_ids: List[int]) -> List[Optional[str]]:
+    """Variant keys for an experiment snapshot, None for fans not enrolled"""
+    keys = [variant["key"] for variant in experiment["variants"]]
+    indices = assign_variants(
+        experiment["id"],
+        fan_ids,
+        [variant["weight"] for variant in experiment["variants"]],
+        experiment.get("traffic_allocation", 1.0)
+    )
+    return [keys[index] if index != NOT_ENROLLED else None for index in indices.tolist()]
@@ -0,0 +1,132 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from app.core import config
+from app.db.base import database
+from app.repositories import experiment as experiment_repo
+
+# Counter columns on experiment_variants, in the order deltas are kept
+EVENT_METRICS = ("impressions", "conversions", "revenue")
+
+# Read and clear every counter hash in one atomic step, so increments made
+# while a flush is running land in the next flush instead of being lost
+_DRAIN_SCRIPT = """
+local drained = {}
+for i, key in ipairs(KEYS) do
+    drained[i] = redis.call('HGETALL', key)
+    redis.call('DEL', key)
+end
+return drained
+"""
+
+class ExperimentEventBuffer:
+    """
+    Pending counter increments per experiment variant
+
+    Recording an event only adds to a counter, in process memory or in Redis
+    hashes (HINCRBY / HINCRBYFLOAT), so the hot path never inserts a row. A
+    periodic flush adds the accumulated deltas to experiment_variants with
+    one batched UPDATE. The memory backend holds this worker's events until
+    its next flush; with Redis every worker and Celery task feeds the same
+    counters, and any of them can flush.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, prefix: str = "experiments:events"):
+        self._pending: Dict[int, List[float]] = {}
+        self._redis = None
+        self._keys = [f"{prefix}:{metric}" for metric in EVENT_METRICS]
+        if redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url)
+            self._drain_script = self._redis.register_script(_DRAIN_SCRIPT)
+
+    async def record(self, variant_id: int, impressions: int = 0, conversions: int = 0, revenue: float = 0.0):
+        if self._redis is not None:
+            pipeline = self._redis.pipeline(transaction=False)
+            if impressions:
+                pipeline.hincrby(self._keys[0], variant_id, impressions)
+            if conversions:
+                pipeline.hincrby(self._keys[1], variant_id, conversions)
+            if revenue:
+                pipeline.hincrbyfloat(self._keys[2], variant_id, revenue)
+            await pipeline.execute()
+            return
+
+        totals = self._pending.get(variant_id)
+        if totals is None:
+            totals = self._pending[variant_id] = [0, 0, 0.0]
+        totals[0] += impressions
+        totals[1] += conversions
+        totals[2] += revenue
+
+    async def drain(self) -> Dict[int, List[float]]:
+        """Take every pending delta, leaving the buffer empty"""
+        if self._redis is None:
+            pending, self._pending = self._pending, {}
+            return pending
+
+        drained: Dict[int, List[float]] = {}
+        for position, flat in enumerate(await self._drain_script(keys=self._keys)):
+            for field, value in zip(flat[::2], flat[1::2]):
+                totals = drained.setdefault(int(field), [0, 0, 0.0])
+                totals[position] = float(value) if position == 2 else int(value)
+        return drained
+
+    async def restore(self, deltas: Dict[int, List[float]]):
+        """Put drained deltas back after a failed flush"""
+        for variant_id, (impressions, conversions, revenue) in deltas.items():
+            await self.record(variant_id, impressions, conversions, revenue)
+
+_event_buffer: Optional[ExperimentEventBuffer] = None
+
+# Bumped whenever this process adds events to the counters, so cached results know to recompute
+_events_version = 0
+
+def events_version() -> int:
+    return _events_version
+
+def get_event_buffer() -> ExperimentEventBuffer:
+    """Process-wide buffer, created on first use"""
+    global _event_buffer
+    if _event_buffer is None:
+        _event_buffer = ExperimentEventBuffer(
+            redis_url=config.REDIS_URL if config.EXPERIMENT_EVENT_BACKEND == "redis" else None
+        )
+    return _event_buffer
+
+async def flush_events(db) -> int:
+    """
+    Add the buffered deltas to the variant counters
+
+    On failure the deltas go back into the buffer for the next attempt.
+    Returns the number of variants updated.
+    """
+    buffer = get_event_buffer()
+    deltas = await buffer.drain()
+    if not deltas:
+        return 0
+    global _events_version
+    try:
+        await experiment_repo.apply_variant_deltas(db, deltas)
+    except Exception:
+        await db.rollback()
+        await buffer.restore(deltas)
+        raise
+    _events_version += 1
+    return len(deltas)
+
+async def flush_events_safely():
+    try:
+        async with database.SessionLocal() as db:
+            await flush_events(db)
+    except Exception as e:
+        print(f"Error flushing experiment events: {str(e)}")
+
+async def run_event_flusher(interval_seconds: float):
+    """Flush buffered events every ``interval_seconds`` until cancelled, then once more"""
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await flush_events_safely()
+    finally:
+        await flush_events_safely()
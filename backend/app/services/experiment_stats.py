@@ -0,0 +1,230 @@
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.models.experiment import ExperimentStatus
+from app.repositories import experiment as experiment_repo
+from app.services.experiment_events import events_version
+
+# Two-sided 95% intervals
+CONFIDENCE_Z = 1.959964
+# Sequential tests stop at this error rate however often the results are looked at
+SEQUENTIAL_ALPHA = 0.05
+# Mixing scale of the sequential test: the relative lift it is tuned to detect
+MIXTURE_RELATIVE_EFFECT = 0.1
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    """Abramowitz & Stegun 7.1.26 (absolute error below 1.5e-7), vectorized"""
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1.0 - poly * np.exp(-x * x))
+
+def normal_cdf(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + _erf(x / math.sqrt(2.0)))
+
+def analyze(
+    impressions: np.ndarray,
+    conversions: np.ndarray,
+    revenue: np.ndarray,
+    control: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Compare every variant with its control in one vectorized pass
+
+    Inputs are flat arrays over the variants of any number of experiments;
+    ``control[i]`` is the row index of variant i's control. Revenue is
+    modelled as conversions times the variant's average order value, since
+    only totals are recorded. Probability to beat control compares Beta(1+x,
+    1+n-x) posteriors through their normal approximation. The sequential
+    test is a mixture SPRT on the conversion-rate difference, so its p-value
+    stays valid however often results are checked. Undefined values (no
+    impressions yet, or a zero control rate for relative lifts) are NaN.
+    """
+    n = impressions.astype(float)
+    x = conversions.astype(float)
+    r = revenue.astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = x / n
+        rpi = r / n
+        aov = np.where(x > 0, r / x, 0.0)
+
+        n_c, rate_c, rpi_c, aov_c = n[control], rate[control], rpi[control], aov[control]
+        rate_var = rate * (1 - rate) / n
+        rate_var_c = rate_c * (1 - rate_c) / n_c
+
+        diff = rate - rate_c
+        se = np.sqrt(rate_var + rate_var_c)
+        conversion_lift = diff / rate_c
+        conversion_lift_low = (diff - CONFIDENCE_Z * se) / rate_c
+        conversion_lift_high = (diff + CONFIDENCE_Z * se) / rate_c
+
+        revenue_diff = rpi - rpi_c
+        revenue_se = np.sqrt(aov ** 2 * rate_var + aov_c ** 2 * rate_var_c)
+        revenue_lift = revenue_diff / rpi_c
+        revenue_lift_low = (revenue_diff - CONFIDENCE_Z * revenue_se) / rpi_c
+        revenue_lift_high = (revenue_diff + CONFIDENCE_Z * revenue_se) / rpi_c
+
+        a, b = 1 + x, 1 + n - x
+        mean = a / (a + b)
+        var = a * b / ((a + b) ** 2 * (a + b + 1))
+        probability_to_beat = normal_cdf((mean - mean[control]) / np.sqrt(var + var[control]))
+
+        # mSPRT with a normal mixture of variance tau2 over the true difference
+        tau2 = (MIXTURE_RELATIVE_EFFECT * rate_c) ** 2
+        v = se ** 2
+        z = diff / se
+        log_likelihood_ratio = 0.5 * np.log(v / (v + tau2)) + diff ** 2 * tau2 / (2 * v * (v + tau2))
+        p_value = np.minimum(1.0, np.exp(-log_likelihood_ratio))
+        boundary = np.sqrt(2 * (v + tau2) / tau2 * (math.log(1 / SEQUENTIAL_ALPHA) + 0.5 * np.log((v + tau2) / v)))
+
+    return {
+        "conversion_rate": rate,
+        "revenue_per_impression": rpi,
+        "conversion_lift": conversion_lift,
+        "conversion_lift_low": conversion_lift_low,
+        "conversion_lift_high": conversion_lift_high,
+        "revenue_lift": revenue_lift,
+        "revenue_lift_low": revenue_lift_low,
+        "revenue_lift_high": revenue_lift_high,
+        "probability_to_beat_control": probability_to_beat,
+        "z": z,
+        "boundary": boundary,
+        "p_value": p_value,
+        "significant": p_value <= SEQUENTIAL_ALPHA
+    }
+
+def _value(value: Any) -> Any:
+    """JSON-ready scalar: NaN and infinities become None"""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def experiment_results(experiments: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Analysis of many experiments at once, keyed by experiment id
+
+    Each experiment is a snapshot whose variants carry impressions,
+    conversions and revenue; the first variant is the control.
+    """
+    rows = [variant for experiment in experiments for variant in experiment["variants"]]
+    if not rows:
+        return {}
+    control, start = [], 0
+    for experiment in experiments:
+        control.extend([start] * len(experiment["variants"]))
+        start += len(experiment["variants"])
+    stats = analyze(
+        np.fromiter((variant["impressions"] for variant in rows), float, len(rows)),
+        np.fromiter((variant["conversions"] for variant in rows), float, len(rows)),
+        np.fromiter((variant["revenue"] for variant in rows), float, len(rows)),
+        np.asarray(control, np.int64)
+    )
+
+    results, i = {}, 0
+    for experiment in experiments:
+        variants = []
+        for position, variant in enumerate(experiment["variants"]):
+            entry = {
+                "key": variant["key"],
+                "is_control": position == 0,
+                "impressions": variant["impressions"],
+                "conversions": variant["conversions"],
+                "revenue": variant["revenue"],
+                "conversion_rate": _value(stats["conversion_rate"][i]),
+                "revenue_per_impression": _value(stats["revenue_per_impression"][i])
+            }
+            if position > 0:
+                entry.update({
+                    "conversion_lift": _value(stats["conversion_lift"][i]),
+                    "conversion_lift_ci": [_value(stats["conversion_lift_low"][i]), _value(stats["conversion_lift_high"][i])],
+                    "revenue_lift": _value(stats["revenue_lift"][i]),
+                    "revenue_lift_ci": [_value(stats["revenue_lift_low"][i]), _value(stats["revenue_lift_high"][i])],
+                    "probability_to_beat_control": _value(stats["probability_to_beat_control"][i]),
+                    "sequential": {
+                        "z": _value(stats["z"][i]),
+                        "boundary": _value(stats["boundary"][i]),
+                        "p_value": _value(stats["p_value"][i]),
+                        "significant": _value(stats["significant"][i])
+                    }
+                })
+            variants.append(entry)
+            i += 1
+
+        # The winner is the significant variant with the highest positive lift, if any
+        winners = [
+            variant for variant in variants[1:]
+            if variant["sequential"]["significant"] and (variant["conversion_lift"] or 0) > 0
+        ]
+        winner = max(winners, key=lambda variant: variant["conversion_lift"])["key"] if winners else None
+        results[experiment["id"]] = {"variants": variants, "winner": winner}
+    return results
+
+class ResultsCache:
+    """
+    Analysis of the running experiments, recomputed only after new events
+
+    An entry is reused while the event version it was computed at is
+    current. It also expires after ``ttl_seconds`` so that events flushed by
+    other workers are picked up.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entry: Optional[tuple] = None
+
+    def get(self, version: int) -> Optional[Dict[str, Dict[str, Any]]]:
+        if self._entry is None:
+            return None
+        cached_version, expires_at, results = self._entry
+        if cached_version != version or expires_at < time.monotonic():
+            return None
+        return results
+
+    def set(self, version: int, results: Dict[str, Dict[str, Any]]):
+        self._entry = (version, time.monotonic() + self.ttl_seconds, results)
+
+    def clear(self):
+        self._entry = None
+
+results_cache = ResultsCache(ttl_seconds=config.EXPERIMENT_EVENT_FLUSH_SECONDS)
+
+def _counters(experiment: Any) -> Dict[str, Any]:
+    return {
+        "id": experiment.id,
+        "variants": [
+            {
+                "key": variant.key,
+                "impressions": variant.impressions,
+                "conversions": variant.conversions,
+                "revenue": variant.revenue
+            }
+            for variant in experiment.variants
+        ]
+    }
+
+async def running_results(db: AsyncSession) -> Dict[str, Dict[str, Any]]:
+    """Analysis of every running experiment, from one query and one vectorized pass"""
+    version = events_version()
+    results = results_cache.get(version)
+    if results is None:
+        experiments = await experiment_repo.list_experiments(db, ExperimentStatus.RUNNING)
+        results = experiment_results([_counters(experiment) for experiment in experiments])
+        results_cache.set(version, results)
+    return results
+
+async def experiment_analysis(db: AsyncSession, experiment_id: str) -> Optional[Dict[str, Any]]:
+    """Analysis of one experiment; running ones come from the shared batch"""
+    results = await running_results(db)
+    if experiment_id in results:
+        return results[experiment_id]
+    experiment = await experiment_repo.get_experiment(db, experiment_id)
+    if experiment is None:
+        return None
+    return experiment_results([_counters(experiment)])[experiment_id]
@@ -0,0 +1,114 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.repositories import experiment as experiment_repo
+
+def experiment_snapshot(experiment: Any) -> Dict[str, Any]:
+    """Detached, read-only view of an experiment and its variants"""
+    return {
+        "id": experiment.id,
+        "name": experiment.name,
+        "status": experiment.status.value,
+        "traffic_allocation": experiment.traffic_allocation,
+        "start_date": experiment.start_date,
+        "end_date": experiment.end_date,
+        "variants": [
+            {"id": variant.id, "key": variant.key, "content": variant.content, "weight": variant.weight}
+            for variant in experiment.variants
+        ]
+    }
+
+class ExperimentCache:
+    """
+    In-process read cache in front of the experiment tables
+
+    Definitions are kept for ``ttl_seconds`` and dropped locally on every
+    write, so a status change made through another worker shows up here
+    within the TTL. Assignments never change once stored, so they are kept
+    without expiry in an LRU bounded by ``max_assignments`` and every worker
+    reads the same answer for a fan.
+    """
+
+    def __init__(self, ttl_seconds: float, max_assignments: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_assignments = max_assignments
+        self._definitions: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._assignments: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+
+    def get_definition(self, experiment_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._definitions.get(experiment_id)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            self._definitions.pop(experiment_id, None)
+            return None
+        return snapshot
+
+    def set_definition(self, snapshot: Dict[str, Any]):
+        self._definitions[snapshot["id"]] = (time.monotonic() + self.ttl_seconds, snapshot)
+
+    def invalidate(self, experiment_id: str):
+        self._definitions.pop(experiment_id, None)
+
+    def get_assignments(self, experiment_id: str, fan_ids: List[int]) -> Tuple[Dict[int, int], List[int]]:
+        """Cached fan id -> variant id, and the fans that missed"""
+        found, missing = {}, []
+        for fan_id in fan_ids:
+            variant_id = self._assignments.get((experiment_id, fan_id))
+            if variant_id is None:
+                missing.append(fan_id)
+            else:
+                self._assignments.move_to_end((experiment_id, fan_id))
+                found[fan_id] = variant_id
+        return found, missing
+
+    def set_assignments(self, experiment_id: str, assignments: Dict[int, int]):
+        for fan_id, variant_id in assignments.items():
+            self._assignments[(experiment_id, fan_id)] = variant_id
+            self._assignments.move_to_end((experiment_id, fan_id))
+        while len(self._assignments) > self.max_assignments:
+            self._assignments.popitem(last=False)
+
+    def clear(self):
+        self._definitions.clear()
+        self._assignments.clear()
+
+experiment_cache = ExperimentCache(
+    ttl_seconds=config.EXPERIMENT_CACHE_TTL_SECONDS,
+    max_assignments=config.EXPERIMENT_ASSIGNMENT_CACHE_SIZE
+)
+
+async def load_experiment(db: AsyncSession, experiment_id: str) -> Optional[Dict[str, Any]]:
+    """Experiment snapshot, from the cache when possible"""
+    snapshot = experiment_cache.get_definition(experiment_id)
+    if snapshot is None:
+        experiment = await experiment_repo.get_experiment(db, experiment_id)
+        if experiment is None:
+            return None
+        snapshot = experiment_snapshot(experiment)
+        experiment_cache.set_definition(snapshot)
+    return snapshot
+
+async def lookup_assignments(db: AsyncSession, experiment_id: str, fan_ids: List[int]) -> Dict[int, int]:
+    """Stored fan id -> variant id; only fans missing from the cache are read from the database"""
+    found, missing = experiment_cache.get_assignments(experiment_id, fan_ids)
+    if missing:
+        stored = await experiment_repo.get_assignments(db, experiment_id, missing)
+        experiment_cache.set_assignments(experiment_id, stored)
+        found.update(stored)
+    return found
+
+async def assign_fans(db: AsyncSession, experiment_id: str, assignments: Dict[int, int]) -> Dict[int, int]:
+    """Record assignments for fans that have none yet and return the ones in effect"""
+    existing = await lookup_assignments(db, experiment_id, list(assignments))
+    new = {fan_id: variant_id for fan_id, variant_id in assignments.items() if fan_id not in existing}
+    if new:
+        stored = await experiment_repo.record_assignments(db, experiment_id, new)
+        experiment_cache.set_assignments(experiment_id, stored)
+        existing.update(stored)
+    return existing
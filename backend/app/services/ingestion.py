@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chatter import Chatter
+from app.models.creator import Creator
+from app.models.fan import Fan
+from app.models.message import MessageType
+from app.models.upload import Upload
+from app.repositories import message as message_repo
+
+# Spreadsheet column naming each entity a message refers to
+_ENTITY_COLUMNS = (("fan_id", "fan_name", Fan), ("chatter_id", "chatter_name", Chatter), ("creator_id", "creator_name", Creator))
+
+def _value(record: Dict[str, Any], key: str) -> Any:
+    value = record.get(key)
+    # Empty cells come back from pandas as NaN or NaT
+    return None if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)) else value
+
+def _name(record: Dict[str, Any], key: str) -> Optional[str]:
+    value = _value(record, key)
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+def _message_type(value: Any) -> MessageType:
+    try:
+        return MessageType(str(value).strip().lower())
+    except ValueError:
+        return MessageType.TEXT
+
+def _sent_time(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    sent_time = pd.Timestamp(value).to_pydatetime()
+    return sent_time if sent_time.tzinfo is not None else sent_time.replace(tzinfo=timezone.utc)
+
+async def _resolve_ids(db: AsyncSession, model: Any, names: Iterable[str]) -> Dict[str, int]:
+    """Ids of the named entities, creating the ones not seen before"""
+    names = set(names)
+    if not names:
+        return {}
+    ids: Dict[str, int] = {}
+    result = await db.execute(select(model.id, model.name).where(model.name.in_(names)).order_by(model.id))
+    for entity_id, name in result.all():
+        # Names are not unique; the oldest entity keeps receiving the messages
+        ids.setdefault(name, entity_id)
+    created = [model(name=name) for name in sorted(names - ids.keys())]
+    if created:
+        db.add_all(created)
+        await db.flush()
+        ids.update({entity.name: entity.id for entity in created})
+    return ids
+
+async def processed_hashes(db: AsyncSession) -> List[str]:
+    result = await db.execute(select(Upload.file_hash).where(Upload.processed == True))  # noqa: E712
+    return list(result.scalars().all())
+
+async def ingest_records(db: AsyncSession, file_name: str, file_hash: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Store the parsed rows of an uploaded chat log as messages
+
+    Fans, chatters and creators are matched by name and created when new.
+    Messages go through ``create_messages``, so the daily rollups, the
+    semantic index and the alert rules see them. The upload, the new
+    entities and the messages commit together, so a file is ingested
+    exactly once; a file whose hash was already ingested is skipped.
+    """
+    existing = await db.execute(select(Upload).where(Upload.file_hash == file_hash))
+    upload = existing.scalar_one_or_none()
+    if upload is not None and upload.processed:
+        return {"status": "skipped", "file_name": file_name, "file_hash": file_hash, "messages_created": 0}
+
+    ids = {}
+    for id_column, name_column, model in _ENTITY_COLUMNS:
+        names = (_name(record, name_column) for record in records)
+        ids[id_column] = await _resolve_ids(db, model, (name for name in names if name))
+
+    now = datetime.now(timezone.utc)
+    if upload is None:
+        upload = Upload(file_name=file_name, file_hash=file_hash, uploaded_at=now)
+        db.add(upload)
+    upload.processed = True
+    upload.processed_at = now
+
+    rows = []
+    for record in records:
+        row = {id_column: ids[id_column].get(_name(record, name_column)) for id_column, name_column, _ in _ENTITY_COLUMNS}
+        content = _value(record, "content")
+        row.update(
+            sent_time=_sent_time(_value(record, "sent_time")),
+            message_type=_message_type(_value(record, "message_type") or "text"),
+            content=str(content) if content is not None else None,
+            price=float(_value(record, "price") or 0.0),
+            purchased=bool(_value(record, "purchased") or False)
+        )
+        rows.append(row)
+
+    try:
+        # Commits the upload and the new entities along with the messages
+        messages = await message_repo.create_messages(db, rows)
+    except IntegrityError:
+        # Another worker ingested the same file first
+        await db.rollback()
+        return {"status": "skipped", "file_name": file_name, "file_hash": file_hash, "messages_created": 0}
+    return {"status": "success", "file_name": file_name, "file_hash": file_hash, "messages_created": len(messages)}
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core import config
+
+# Fields that change on every request without changing what the model sees
+VOLATILE_FIELDS = ("analyzed_at",)
+
+def insight_cache_key(
+    target_type: str,
+    target_data: Dict[str, Any],
+    custom_prompt: Optional[str],
+    model: str,
+    template_version: str
+) -> str:
+    """Content hash of everything that determines the model's answer"""
+    normalized = {key: value for key, value in target_data.items() if key not in VOLATILE_FIELDS}
+    payload = json.dumps(
+        [str(target_type).lower(), normalized, custom_prompt, model, template_version],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class DiskInsightCache:
+    """
+    Insight cache in a local SQLite file
+
+    Entries expire after ``ttl_seconds``; once ``max_entries`` is exceeded the
+    least recently written entries are evicted. Eviction runs every
+    ``PRUNE_EVERY`` writes, so the table may briefly overshoot the bound.
+    The file is opened on first use and released by ``aclose``.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the cache file on first use; callers hold the lock"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS insight_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, written_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_insight_cache_written_at ON insight_cache (written_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM insight_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO insight_cache (key, value, expires_at, written_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + self.ttl_seconds, now)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM insight_cache WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM insight_cache WHERE key IN ("
+                    "SELECT key FROM insight_cache ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            conn.commit()
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self._set, key, value)
+
+    async def aclose(self):
+        await asyncio.to_thread(self._close)
+
+class RedisInsightCache:
+    """
+    Insight cache shared through Redis
+
+    Values expire with the key TTL; a sorted set of write times bounds the
+    number of live entries.
+    """
+
+    INDEX_KEY = "insight-cache:index"
+
+    def __init__(self, redis_url: str, ttl_seconds: int, max_entries: int):
+        import redis.asyncio as aioredis
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._redis = aioredis.from_url(redis_url)
+
+    @staticmethod
+    def _value_key(key: str) -> str:
+        return f"insight-cache:{key}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._value_key(key))
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(self._value_key(key), json.dumps(value, default=str), ex=self.ttl_seconds)
+            pipe.zadd(self.INDEX_KEY, {key: now})
+            pipe.zremrangebyscore(self.INDEX_KEY, "-inf", now - self.ttl_seconds)
+            pipe.zcard(self.INDEX_KEY)
+            results = await pipe.execute()
+
+        overflow = results[-1] - self.max_entries
+        if overflow > 0:
+            evicted = await self._redis.zpopmin(self.INDEX_KEY, overflow)
+            if evicted:
+                await self._redis.delete(*(self._value_key(member.decode()) for member, _ in evicted))
+
+    async def aclose(self):
+        await self._redis.close()
+
+def get_insight_cache():
+    """Build the cache configured by AI_CACHE_BACKEND ("disk", "redis" or "none")"""
+    if config.AI_CACHE_BACKEND == "redis":
+        return RedisInsightCache(config.REDIS_URL, config.AI_CACHE_TTL_SECONDS, config.AI_CACHE_MAX_ENTRIES)
+    if config.AI_CACHE_BACKEND == "disk":
+        return DiskInsightCache(config.AI_CACHE_PATH, config.AI_CACHE_TTL_SECONDS, config.AI_CACHE_MAX_ENTRIES)
+    return None
@@ -0,0 +1,264 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chatter import Chatter
+from app.models.creator import Creator
+from app.models.fan import Fan
+from app.models.message import Message
+from app.models.message_rollup import MessageRollup
+
+# Candidate history for fan, chatter and creator prompts; the prompt budget decides what is shown
+RECENT_MESSAGE_LIMIT = 50
+TOP_SPEND_MESSAGE_LIMIT = 10
+
+async def build_target_data(db: AsyncSession, target_type: str, target_id: Optional[int]) -> Dict[str, Any]:
+    """Collect the data an insight prompt is built from"""
+    if target_type.upper() != "GENERAL" and target_id:
+        contexts = await build_targets_data(db, target_type, [target_id])
+        return contexts.get(target_id, {})
+    return await _general_context(db)
+
+async def build_targets_data(db: AsyncSession, target_type: str, target_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Collect prompt data for many targets of one type
+
+    Issues a fixed number of queries regardless of how many targets are
+    requested. Targets that do not exist are missing from the result.
+    """
+    target_type = target_type.upper()
+    if not target_ids:
+        return {}
+    if target_type == "FAN":
+        return await _fan_contexts(db, target_ids)
+    if target_type == "CHATTER":
+        return await _chatter_contexts(db, target_ids)
+    if target_type == "CREATOR":
+        return await _creator_contexts(db, target_ids)
+    if target_type == "MESSAGE":
+        return await _message_contexts(db, target_ids)
+    general = await _general_context(db)
+    return {target_id: general for target_id in target_ids}
+
+async def _message_aggregates(db: AsyncSession, entity_type: str, key, counterpart, target_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Per-target message, PPV and spend totals in one grouped query
+
+    Totals come from the daily message_rollups maintained at ingestion, so
+    the cost grows with days of activity, not messages. Only the count of
+    distinct counterparts, which the rollups cannot answer, reads messages,
+    through the indexed target key.
+    """
+    today = date.today()
+    since_30 = today - timedelta(days=30)
+    since_60 = today - timedelta(days=60)
+    revenue = MessageRollup.revenue
+    counterparts = (
+        select(func.count(func.distinct(counterpart)))
+        .where(key == MessageRollup.entity_id)
+        .correlate(MessageRollup)
+        .scalar_subquery()
+    )
+
+    query = (
+        select(
+            MessageRollup.entity_id.label("target_id"),
+            func.sum(MessageRollup.message_count).label("message_count"),
+            func.sum(MessageRollup.ppv_offered).label("ppv_offered"),
+            func.sum(MessageRollup.ppv_purchased).label("ppv_purchased"),
+            func.sum(revenue).label("revenue_total"),
+            func.sum(case((MessageRollup.day >= since_30, revenue), else_=0.0)).label("revenue_30d"),
+            func.sum(case(
+                (and_(MessageRollup.day >= since_60, MessageRollup.day < since_30), revenue),
+                else_=0.0
+            )).label("revenue_prev_30d"),
+            counterparts.label("counterpart_count"),
+            func.max(MessageRollup.day).label("last_message_at")
+        )
+        .where(MessageRollup.entity_type == entity_type, MessageRollup.entity_id.in_(target_ids))
+        .group_by(MessageRollup.entity_id)
+    )
+    result = await db.execute(query)
+
+    aggregates = {}
+    for row in result.mappings():
+        data = dict(row)
+        target_id = data.pop("target_id")
+        data["ppv_conversion_rate"] = round(data["ppv_purchased"] / data["ppv_offered"], 3) if data["ppv_offered"] else None
+        for field in ("revenue_total", "revenue_30d", "revenue_prev_30d"):
+            data[field] = round(data[field] or 0.0, 2)
+        data["last_message_at"] = str(data["last_message_at"]) if data["last_message_at"] else None
+        aggregates[target_id] = data
+    return aggregates
+
+async def _message_history(db: AsyncSession, key, target_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Latest messages plus the highest-value purchases for every target
+
+    One windowed query ranks each target's messages by recency and by
+    purchased price; rows within either limit are returned oldest first.
+    """
+    ranked = (
+        select(
+            key.label("target_id"),
+            Message.id,
+            Message.sent_time,
+            Message.message_type,
+            Message.content,
+            Message.price,
+            Message.purchased,
+            func.row_number().over(
+                partition_by=key,
+                order_by=(Message.sent_time.desc(), Message.id.desc())
+            ).label("recency_rank"),
+            func.row_number().over(
+                partition_by=key,
+                order_by=(case((Message.purchased.is_(True), Message.price), else_=0.0).desc(), Message.id.desc())
+            ).label("spend_rank")
+        )
+        .where(key.in_(target_ids))
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranked)
+        .where(
+            (ranked.c.recency_rank <= RECENT_MESSAGE_LIMIT)
+            | and_(ranked.c.spend_rank <= TOP_SPEND_MESSAGE_LIMIT, ranked.c.purchased.is_(True))
+        )
+        .order_by(ranked.c.target_id, ranked.c.sent_time, ranked.c.id)
+    )
+
+    messages: Dict[int, List[Dict[str, Any]]] = {}
+    for row in result.mappings():
+        messages.setdefault(row["target_id"], []).append({
+            "sent_time": str(row["sent_time"]),
+            "message_type": row["message_type"].value if row["message_type"] else None,
+            "content": row["content"],
+            "price": row["price"],
+            "purchased": row["purchased"]
+        })
+    return messages
+
+async def _fan_contexts(db: AsyncSession, target_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    fans = (await db.execute(select(Fan).where(Fan.id.in_(target_ids)))).scalars().all()
+    aggregates = await _message_aggregates(db, "fan", Message.fan_id, Message.creator_id, target_ids)
+    history = await _message_history(db, Message.fan_id, target_ids)
+    analyzed_at = datetime.now().isoformat()
+
+    contexts = {}
+    for fan in fans:
+        stats = dict(aggregates.get(fan.id, {}))
+        counterpart_count = stats.pop("counterpart_count", 0)
+        contexts[fan.id] = {
+            "name": fan.name,
+            "total_spent": fan.total_spent,
+            "first_seen": str(fan.first_seen),
+            "last_active": str(fan.last_active),
+            **stats,
+            "creator_count": counterpart_count,
+            "message_history": history.get(fan.id, []),
+            "analyzed_at": analyzed_at
+        }
+    return contexts
+
+async def _chatter_contexts(db: AsyncSession, target_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    chatters = (await db.execute(select(Chatter).where(Chatter.id.in_(target_ids)))).scalars().all()
+    aggregates = await _message_aggregates(db, "chatter", Message.chatter_id, Message.fan_id, target_ids)
+    history = await _message_history(db, Message.chatter_id, target_ids)
+    analyzed_at = datetime.now().isoformat()
+
+    contexts = {}
+    for chatter in chatters:
+        stats = dict(aggregates.get(chatter.id, {}))
+        counterpart_count = stats.pop("counterpart_count", 0)
+        contexts[chatter.id] = {
+            "name": chatter.name,
+            "performance_score": chatter.performance_score,
+            "timezone": chatter.timezone,
+            **stats,
+            "fan_count": counterpart_count,
+            "message_history": history.get(chatter.id, []),
+            "analyzed_at": analyzed_at
+        }
+    return contexts
+
+async def _creator_contexts(db: AsyncSession, target_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    creators = (await db.execute(select(Creator).where(Creator.id.in_(target_ids)))).scalars().all()
+    aggregates = await _message_aggregates(db, "creator", Message.creator_id, Message.fan_id, target_ids)
+    history = await _message_history(db, Message.creator_id, target_ids)
+    analyzed_at = datetime.now().isoformat()
+
+    contexts = {}
+    for creator in creators:
+        stats = dict(aggregates.get(creator.id, {}))
+        counterpart_count = stats.pop("counterpart_count", 0)
+        contexts[creator.id] = {
+            "name": creator.name,
+            "earnings_total": creator.earnings_total,
+            "join_date": str(creator.join_date) if creator.join_date else "Unknown",
+            **stats,
+            "fan_count": counterpart_count,
+            "message_history": history.get(creator.id, []),
+            "analyzed_at": analyzed_at
+        }
+    return contexts
+
+async def _message_contexts(db: AsyncSession, target_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    # Messages carry no sender direction, so there is no reliable reply to pair them with
+    result = await db.execute(
+        select(
+            Message.id,
+            Message.content,
+            Message.message_type,
+            Message.price,
+            Message.purchased,
+            Fan.name.label("fan_name")
+        )
+        .outerjoin(Fan, Fan.id == Message.fan_id)
+        .where(Message.id.in_(target_ids))
+    )
+    analyzed_at = datetime.now().isoformat()
+
+    contexts = {}
+    for row in result.mappings():
+        contexts[row["id"]] = {
+            "fan_name": row["fan_name"],
+            "fan_message": row["content"],
+            "message_type": row["message_type"].value if row["message_type"] else None,
+            "price": row["price"],
+            "purchased": row["purchased"],
+            "analyzed_at": analyzed_at
+        }
+    return contexts
+
+async def _general_context(db: AsyncSession) -> Dict[str, Any]:
+    """Agency-wide counts in a single round trip"""
+    since_30 = datetime.now() - timedelta(days=30)
+    result = await db.execute(
+        select(
+            select(func.count(Fan.id)).scalar_subquery().label("total_fans"),
+            select(func.count(Fan.id)).where(Fan.last_active >= datetime.now().date()).scalar_subquery().label("active_fans"),
+            select(func.count(Chatter.id)).scalar_subquery().label("total_chatters"),
+            select(func.count(Creator.id)).scalar_subquery().label("total_creators"),
+            select(func.coalesce(func.sum(Message.price), 0.0))
+            .where(Message.purchased.is_(True), Message.sent_time >= since_30)
+            .scalar_subquery()
+            .label("revenue_30d")
+        )
+    )
+    data = dict(result.mappings().one())
+    data["revenue_30d"] = round(data["revenue_30d"] or 0.0, 2)
+    data["analyzed_at"] = datetime.now().isoformat()
+    return data
+
+async def get_creator_fan_ids(db: AsyncSession, creator_id: int) -> List[int]:
+    """IDs of every fan who has exchanged messages with a creator"""
+    result = await db.execute(
+        select(Message.fan_id)
+        .where(Message.creator_id == creator_id, Message.fan_id.isnot(None))
+        .distinct()
+        .order_by(Message.fan_id)
+    )
+    return list(result.scalars().all())
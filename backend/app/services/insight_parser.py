@@ -0,0 +1,259 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# (section, value) pairs reported while a response is still streaming
+SectionUpdate = Tuple[str, Any]
+
+DEFAULT_CONFIDENCE = 0.7  # Used when the response has no parseable confidence
+
+# "SUMMARY: ...", also tolerating markdown decoration such as "**Summary:**" or "## TAGS:"
+_HEADER = re.compile(
+    r"[#*_\s]*(SUMMARY|DETAILS|TAGS|CONFIDENCE(?:\s+SCORE)?|ACTION\s+ITEMS)[*_\s]*:[*_]*\s*(.*)",
+    re.IGNORECASE
+)
+# "- item", "-item", "* item", "• item", "1. item", "2) item"; "**bold**" is not a bullet
+_BULLET = re.compile(r"\s*(?:(?:[-•]|\*(?!\*))\s*|\d{1,2}[.)]\s+)(.*)")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)")
+# "7/10", "4 / 5", "8 out of 10" right after the number
+_OUT_OF = re.compile(r"\s*(?:/|out\s+of)\s*(\d+\.?\d*)", re.IGNORECASE)
+_TAG_SPLIT = re.compile(r"[,;\n]")
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+_SECTION_NAMES = {
+    "SUMMARY": "summary",
+    "DETAILS": "details",
+    "TAGS": "tags",
+    "CONFIDENCE": "confidence_score",
+    "ACTION ITEMS": "action_items"
+}
+
+def _section_name(header: str) -> str:
+    header = " ".join(header.upper().split())
+    if header.startswith("CONFIDENCE"):
+        return "confidence_score"
+    return _SECTION_NAMES[header]
+
+def _parse_confidence(text: Any) -> Optional[float]:
+    scaled = False
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        value = float(text)
+    else:
+        match = _NUMBER.search(str(text))
+        if match is None:
+            return None
+        value = float(match.group())
+        rest = str(text)[match.end():]
+        out_of = _OUT_OF.match(rest)
+        if out_of is not None:
+            # A score on its own scale; a zero scale means nothing usable was reported
+            scale = float(out_of.group(1))
+            if scale <= 0:
+                return None
+            value, scaled = value / scale, True
+        elif "%" in rest[:2]:
+            value, scaled = value / 100, True
+    # Scores clearly reported on a 0-100 scale; anything else out of range is clamped
+    if not scaled and 10.0 < value <= 100.0:
+        value /= 100
+    if value != value:  # NaN
+        return None
+    return min(max(value, 0.0), 1.0)
+
+def _split_tags(text: str) -> List[str]:
+    tags = []
+    for tag in _TAG_SPLIT.split(text):
+        bullet = _BULLET.match(tag)
+        tag = (bullet.group(1) if bullet else tag).strip().strip("#*`\"'").strip()
+        if tag:
+            tags.append(tag)
+    return tags
+
+class InsightStreamParser:
+    """
+    Single-pass parser for the SUMMARY/DETAILS/TAGS/CONFIDENCE/ACTION ITEMS format
+
+    A line-oriented state machine: a header line switches the current
+    section, every other line continues it. Feed model output in arbitrary
+    chunks; each call returns the sections that changed. The summary and
+    details are also reported while their first line is still incomplete,
+    so a client can render them before the line ends.
+    """
+
+    def __init__(self):
+        self._section: Optional[str] = None
+        self._summary: List[str] = []
+        self._details: List[str] = []
+        self._tags: List[str] = []
+        self._action_items: List[str] = []
+        self._confidence: Optional[float] = None
+        self._buffer = ""
+
+    @property
+    def result(self) -> Dict[str, Any]:
+        return {
+            "summary": " ".join(self._summary),
+            "details": " ".join(self._details),
+            "tags": list(self._tags),
+            "confidence_score": DEFAULT_CONFIDENCE if self._confidence is None else self._confidence,
+            "action_items": list(self._action_items)
+        }
+
+    def feed(self, text: str) -> List[SectionUpdate]:
+        self._buffer += text
+        updates = []
+        if "\n" in self._buffer:
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                section = self.consume_line(line)
+                if section is not None:
+                    updates.append((section, self._value(section)))
+
+        partial = self._partial_update()
+        if partial is not None:
+            updates.append(partial)
+        return updates
+
+    def close(self) -> List[SectionUpdate]:
+        """Flush the final unterminated line"""
+        line, self._buffer = self._buffer, ""
+        section = self.consume_line(line)
+        return [(section, self._value(section))] if section is not None else []
+
+    def _value(self, section: str) -> Any:
+        return self.result[section]
+
+    def _partial_update(self) -> Optional[SectionUpdate]:
+        match = _HEADER.match(self._buffer)
+        if match is None:
+            return None
+        section = _section_name(match.group(1))
+        if section not in ("summary", "details"):
+            return None
+        parts = self._summary if section == "summary" else self._details
+        # An unfinished header line replaces the section, as it will once the line completes
+        if self._section == section or not parts:
+            return (section, match.group(2).strip())
+        return None
+
+    def consume_line(self, line: str) -> Optional[str]:
+        """Apply one complete line; returns the section it changed, if any"""
+        line = line.strip()
+        if not line:
+            return None
+
+        header = _HEADER.match(line)
+        if header is not None:
+            section = _section_name(header.group(1))
+            value = header.group(2).strip()
+            self._section = section
+            if section == "summary":
+                self._summary = [value] if value else []
+            elif section == "details":
+                self._details = [value] if value else []
+            elif section == "tags":
+                self._tags = _split_tags(value)
+            elif section == "confidence_score":
+                confidence = _parse_confidence(value)
+                self._section = None
+                if confidence is None:
+                    return None
+                self._confidence = confidence
+            elif section == "action_items":
+                self._action_items = []
+                bullet = _BULLET.match(value)
+                item = bullet.group(1).strip() if bullet else value
+                if not item:
+                    return None
+                self._action_items.append(item)
+            return section
+
+        section = self._section
+        if section == "summary":
+            self._summary.append(line)
+        elif section == "details":
+            self._details.append(line)
+        elif section == "tags":
+            # Tags may continue on following lines, one per line or comma-separated
+            tags = _split_tags(line)
+            if not tags:
+                return None
+            self._tags.extend(tags)
+        elif section == "action_items":
+            bullet = _BULLET.match(line)
+            if bullet is not None:
+                item = bullet.group(1).strip()
+                if not item:
+                    return None
+                self._action_items.append(item)
+            elif self._action_items:
+                # A wrapped item continues on the next line
+                self._action_items[-1] += " " + line
+            else:
+                self._action_items.append(line)
+        else:
+            return None
+        return section
+
+def parse_insight_text(text: str) -> Dict[str, Any]:
+    """Parse a complete response in the line format"""
+    parser = InsightStreamParser()
+    for line in text.splitlines():
+        parser.consume_line(line)
+    return parser.result
+
+def _string_list(value: Any, split=None) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return split(value) if split else [value.strip()] if value.strip() else []
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if item is not None and str(item).strip()]
+    return [str(value)]
+
+def parse_insight_json(text: str) -> Dict[str, Any]:
+    """
+    Parse a structured-output (JSON) response
+
+    Tolerates code fences and prose around the object and coerces loosely
+    typed fields. Falls back to the line format if no JSON object is found.
+    """
+    match = _JSON_OBJECT.search(text)
+    data = None
+    if match is not None:
+        try:
+            data = json.loads(match.group())
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        return parse_insight_text(text)
+
+    fields = {str(key).lower().replace(" ", "_"): value for key, value in data.items()}
+    confidence = _parse_confidence(fields.get("confidence_score", fields.get("confidence")))
+    return {
+        "summary": str(fields.get("summary") or "").strip(),
+        "details": str(fields.get("details") or "").strip(),
+        "tags": _string_list(fields.get("tags"), split=_split_tags),
+        "confidence_score": DEFAULT_CONFIDENCE if confidence is None else confidence,
+        "action_items": _string_list(fields.get("action_items"))
+    }
+
+class InsightJSONStreamParser:
+    """
+    Stream parser for structured-output responses
+
+    Partial JSON is not parsed; sections are reported once the response
+    completes. Exposes the same interface as InsightStreamParser.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self.result: Dict[str, Any] = parse_insight_json("")
+
+    def feed(self, text: str) -> List[SectionUpdate]:
+        self._chunks.append(text)
+        return []
+
+    def close(self) -> List[SectionUpdate]:
+        self.result = parse_insight_json("".join(self._chunks))
+        return list(self.result.items())
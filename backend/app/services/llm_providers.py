@@ -0,0 +1,375 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import random
+import re
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+
+from app.core import config
+from app.utils.rate_limit import RateLimiter, get_rate_limiter
+from app.utils.tokens import count_tokens
+
+MAX_COMPLETION_TOKENS = 1000
+
+# One entry per prompt: the completion text, or the exception that prompt failed with
+BatchResult = Union[str, Exception]
+
+class LLMProvider(ABC):
+    """
+    Text completion backend used by AIService
+
+    Providers only turn prompts into text; prompt construction, caching and
+    parsing stay in AIService so every provider runs the same pipeline.
+    Subclasses implement ``complete``; streaming and batching fall back to it.
+    """
+
+    name = "base"
+    model = ""
+    is_mock = False
+
+    @abstractmethod
+    async def complete(self, system_prompt: str, prompt: str) -> str:
+        """Completion text for one prompt"""
+
+    async def stream(self, system_prompt: str, prompt: str) -> AsyncIterator[str]:
+        """Yield the completion in chunks; providers without streaming return it whole"""
+        yield await self.complete(system_prompt, prompt)
+
+    async def complete_batch(self, system_prompt: str, prompts: List[str]) -> List[BatchResult]:
+        """Complete many prompts, one result per prompt in input order"""
+        return await asyncio.gather(
+            *(self.complete(system_prompt, prompt) for prompt in prompts),
+            return_exceptions=True
+        )
+
+    async def aclose(self):
+        pass
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Any server speaking the OpenAI HTTP API: OpenAI itself, or a local
+    llama.cpp / vLLM server via ``base_url``
+
+    With ``batch_size`` above 1, complete_batch sends that many prompts per
+    request to the legacy /completions endpoint, which batching servers run
+    as a single forward pass; otherwise each prompt is its own
+    /chat/completions request.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        batch_size: Optional[int] = None,
+        structured_output: bool = False
+    ):
+        self.api_key = api_key if api_key is not None else config.OPENAI_API_KEY
+        self.base_url = base_url or config.OPENAI_BASE_URL
+        self.model = model or config.OPENAI_MODEL
+        self.max_concurrency = max_concurrency or config.AI_MAX_CONCURRENCY
+        self.batch_size = max(1, batch_size or config.AI_LLM_BATCH_SIZE)
+        self.max_retries = config.AI_MAX_RETRIES
+        self.retry_base_delay = config.AI_RETRY_BASE_DELAY_SECONDS
+        # Shared by every provider in the process (and across processes with the Redis backend)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.structured_output = structured_output
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Local servers usually run without a key
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=config.AI_REQUEST_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=self.max_concurrency)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count used to charge the tokens-per-minute budget"""
+        return count_tokens(text) + MAX_COMPLETION_TOKENS
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None and "retry-after" in response.headers:
+            try:
+                return float(response.headers["retry-after"])
+            except ValueError:
+                pass
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.retry_base_delay * (2 ** attempt))
+
+    def _chat_payload(self, system_prompt: str, prompt: str, stream: bool = False) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": MAX_COMPLETION_TOKENS
+        }
+        if stream:
+            payload["stream"] = True
+        if self.structured_output:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    async def _post(self, path: str, payload: Dict[str, Any], estimated_tokens: int) -> Dict[str, Any]:
+        """POST to the API, retrying rate limits and transient failures"""
+        client = self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            response = None
+            try:
+                response = await client.post(path, json=payload)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def complete(self, system_prompt: str, prompt: str) -> str:
+        data = await self._post(
+            "/chat/completions",
+            self._chat_payload(system_prompt, prompt),
+            self._estimate_tokens(system_prompt + prompt)
+        )
+        return data["choices"][0]["message"]["content"]
+
+    async def stream(self, system_prompt: str, prompt: str) -> AsyncIterator[str]:
+        """Stream content deltas from the chat completions API"""
+        payload = self._chat_payload(system_prompt, prompt, stream=True)
+        estimated_tokens = self._estimate_tokens(system_prompt + prompt)
+        client = self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            response = None
+            started = False
+            try:
+                async with client.stream("POST", "/chat/completions", json=payload) as response:
+                    if response.status_code != 429 and response.status_code < 500:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                return
+                            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+                    if attempt == self.max_retries:
+                        response.raise_for_status()
+            except httpx.TransportError:
+                # Retrying after output was sent would duplicate tokens
+                if started or attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def _complete_many(self, system_prompt: str, prompts: List[str]) -> List[str]:
+        """One /completions request carrying several prompts"""
+        rendered = [f"{system_prompt}\n\n{prompt.strip()}\n\n" for prompt in prompts]
+        data = await self._post(
+            "/completions",
+            {
+                "model": self.model,
+                "prompt": rendered,
+                "temperature": 0.7,
+                "max_tokens": MAX_COMPLETION_TOKENS
+            },
+            sum(self._estimate_tokens(text) for text in rendered)
+        )
+        texts = [None] * len(prompts)
+        for position, choice in enumerate(data["choices"]):
+            texts[choice.get("index", position)] = choice["text"]
+        if any(text is None for text in texts):
+            raise ValueError(f"Batch response has {len(data['choices'])} choices for {len(prompts)} prompts")
+        return texts
+
+    async def complete_batch(self, system_prompt: str, prompts: List[str]) -> List[BatchResult]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.batch_size == 1:
+            async def run_one(prompt: str) -> str:
+                async with semaphore:
+                    return await self.complete(system_prompt, prompt)
+
+            return await asyncio.gather(*(run_one(prompt) for prompt in prompts), return_exceptions=True)
+
+        async def run_group(group: List[str]) -> List[BatchResult]:
+            async with semaphore:
+                try:
+                    return await self._complete_many(system_prompt, group)
+                except Exception as e:
+                    return [e] * len(group)
+
+        groups = [prompts[start:start + self.batch_size] for start in range(0, len(prompts), self.batch_size)]
+        results = await asyncio.gather(*(run_group(group) for group in groups))
+        return [result for group_results in results for result in group_results]
+
+# Canned responses keyed by the target type named in the prompt
+_MOCK_RESPONSES = {
+    "fan": {
+        "summary": "High-value fan with consistent spending patterns",
+        "details": "This fan engages regularly and responds well to personalized content. Their spending pattern shows they are most active on weekends and tend to purchase premium content within 24 hours of it being offered.",
+        "tags": ["high-spender", "regular", "weekend-active", "ppv-buyer", "loyal"],
+        "action_items": [
+            "Send personalized message on Friday afternoon",
+            "Offer exclusive content package",
+            "Acknowledge loyalty with special discount"
+        ]
+    },
+    "chatter": {
+        "summary": "Solid performer with good conversion rates",
+        "details": "This chatter excels at initial engagement but could improve on follow-up conversations. Their shift covers the evening hours when fan activity is highest.",
+        "tags": ["consistent", "good-converter", "evening-shift", "fast-responder", "upseller"],
+        "action_items": [
+            "Provide training on follow-up techniques",
+            "Assign to high-value fans during peak hours",
+            "Share successful conversation templates"
+        ]
+    },
+    "creator": {
+        "summary": "Growing creator with strong potential",
+        "details": "Content receives above-average engagement, particularly photo sets and short videos. There's significant growth potential in a higher posting frequency and themed content series.",
+        "tags": ["growing", "visual-content", "engagement-focused", "steady-earner", "series-ready"],
+        "action_items": [
+            "Suggest weekly content schedule",
+            "Develop 3-part themed content series",
+            "Increase direct fan interaction by 20%"
+        ]
+    },
+    "message": {
+        "summary": "Effective conversion from casual inquiry to sale",
+        "details": "This exchange converts a casual question into a content purchase using emotional connection, exclusivity and a time-limited offer. The language was personal and engaging without being pushy.",
+        "tags": ["successful-conversion", "good-technique", "natural-upsell", "urgency", "personal-tone"],
+        "action_items": [
+            "Share as example in team training",
+            "Use similar approach for fans with similar inquiry patterns",
+            "Follow up with additional exclusive offer in 48 hours"
+        ]
+    },
+    "agency": {
+        "summary": "Agency showing strong growth with optimization opportunities",
+        "details": "The agency has a solid fan base and a healthy chatter-to-creator ratio. Key growth opportunities exist in reactivating dormant fans and increasing average spend per active fan.",
+        "tags": ["growing", "optimization-needed", "retention-focus", "scalable", "healthy-ratio"],
+        "action_items": [
+            "Launch win-back campaign for dormant fans",
+            "Implement tiered loyalty program",
+            "Optimize chatter scheduling for peak engagement times"
+        ]
+    }
+}
+_PROMPT_KIND = re.compile(r"Analyze this OnlyFans (\w+)")
+
+def format_insight_text(insight: Dict[str, Any]) -> str:
+    """Render a structured insight in the line format the model is asked to produce"""
+    lines = [
+        f"SUMMARY: {insight['summary']}",
+        f"DETAILS: {insight['details']}",
+        f"TAGS: {', '.join(insight['tags'])}",
+        f"CONFIDENCE: {insight['confidence_score']}",
+        "ACTION ITEMS:"
+    ]
+    lines.extend(f"- {item}" for item in insight["action_items"])
+    return "\n".join(lines)
+
+class MockProvider(LLMProvider):
+    """
+    Deterministic offline provider for development and load tests
+
+    The response depends only on the prompt, so repeated runs are
+    reproducible, and it is returned in the same format a real model is
+    asked for, so the full prompt/parse pipeline still runs. ``latency``
+    simulates model time per request.
+    """
+
+    name = "mock"
+    model = "mock"
+    is_mock = True
+
+    def __init__(self, structured_output: bool = False, latency: Optional[float] = None):
+        self.structured_output = structured_output
+        self.latency = config.AI_MOCK_LATENCY_SECONDS if latency is None else latency
+
+    def respond(self, prompt: str) -> str:
+        match = _PROMPT_KIND.search(prompt)
+        canned = _MOCK_RESPONSES.get(match.group(1) if match else "", _MOCK_RESPONSES["agency"])
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        insight = {
+            "summary": canned["summary"],
+            "details": canned["details"],
+            # Vary the tags and score per prompt so outputs are not all identical
+            "tags": canned["tags"][:3 + seed % 3],
+            "confidence_score": round(0.7 + (seed % 26) / 100, 2),
+            "action_items": canned["action_items"]
+        }
+        if self.structured_output:
+            return json.dumps(insight)
+        return format_insight_text(insight)
+
+    async def complete(self, system_prompt: str, prompt: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(prompt)
+
+    async def stream(self, system_prompt: str, prompt: str) -> AsyncIterator[str]:
+        text = await self.complete(system_prompt, prompt)
+        for start in range(0, len(text), 16):
+            yield text[start:start + 16]
+            await asyncio.sleep(0)
+
+    async def complete_batch(self, system_prompt: str, prompts: List[str]) -> List[BatchResult]:
+        if self.latency:
+            # A batching server answers the whole batch in about one request's time
+            await asyncio.sleep(self.latency)
+        return [self.respond(prompt) for prompt in prompts]
+
+def get_llm_provider(
+    provider: Optional[str] = None,
+    api_key: Optional[str] = None,
+    structured_output: bool = False,
+    **options: Any
+) -> LLMProvider:
+    """
+    Provider selected by ``AI_PROVIDER``
+
+    "auto" uses the OpenAI-compatible backend when an API key is configured
+    and the mock otherwise; set "openai" explicitly for a keyless local server.
+    """
+    provider = (provider or config.AI_PROVIDER).lower()
+    api_key = api_key if api_key is not None else config.OPENAI_API_KEY
+    if provider == "auto":
+        has_key = api_key and api_key != "sk-placeholder-key-for-development"
+        provider = "openai" if has_key else "mock"
+
+    if provider == "mock":
+        return MockProvider(structured_output=structured_output)
+    if provider == "openai":
+        return OpenAICompatibleProvider(api_key=api_key, structured_output=structured_output, **options)
+    raise ValueError(f"Unknown AI provider: {provider}")
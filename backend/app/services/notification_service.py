@@ -0,0 +1,114 @@
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core import config
+from app.schemas.notification import Notification as NotificationSchema
+
+def notification_payload(notification: Any) -> Dict[str, Any]:
+    """JSON-ready representation pushed to clients"""
+    return json.loads(NotificationSchema.from_orm(notification).json())
+
+class NotificationHub:
+    """
+    Fan-out of new notifications to connected clients
+
+    Every connection subscribes with its user id and gets a bounded queue.
+    With the in-process broker a publish is delivered straight to this
+    process's queues; with Redis it goes through a pub/sub channel, so
+    notifications written by Celery workers or another API worker reach
+    every process. A queue that falls behind drops its oldest entries rather
+    than slowing the publisher; clients catch up from the database when
+    they reconnect.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, channel: str = "notifications", queue_size: int = 100):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._publisher = None
+        self._publisher_loop = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        if self.redis_url and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def _deliver(self, payload: Dict[str, Any]):
+        recipient = payload.get("user_id")
+        if recipient is None:
+            queues = [queue for user_queues in self._subscribers.values() for queue in user_queues]
+        else:
+            queues = list(self._subscribers.get(recipient, ()))
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(payload)
+
+    def _redis(self):
+        # Celery tasks run each job in a new event loop, and a client cannot outlive its loop
+        loop = asyncio.get_running_loop()
+        if self._publisher is None or self._publisher_loop is not loop:
+            import redis.asyncio as aioredis
+            self._publisher = aioredis.from_url(self.redis_url)
+            self._publisher_loop = loop
+        return self._publisher
+
+    async def publish(self, payloads: List[Dict[str, Any]]):
+        if not payloads:
+            return
+        if self.redis_url is None:
+            for payload in payloads:
+                self._deliver(payload)
+            return
+        # One message per batch keeps bulk alert inserts to a single round trip
+        await self._redis().publish(self.channel, json.dumps(payloads))
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        client = aioredis.from_url(self.redis_url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            while self._subscribers:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                for payload in json.loads(message["data"]):
+                    self._deliver(payload)
+        except Exception as e:
+            print(f"Error listening for notifications: {str(e)}")
+        finally:
+            await pubsub.close()
+            await client.close()
+
+_notification_hub: Optional[NotificationHub] = None
+
+def get_notification_hub() -> NotificationHub:
+    """Process-wide hub, created on first use"""
+    global _notification_hub
+    if _notification_hub is None:
+        _notification_hub = NotificationHub(
+            redis_url=config.REDIS_URL if config.NOTIFICATION_BROKER == "redis" else None,
+            channel=config.NOTIFICATION_CHANNEL,
+            queue_size=config.NOTIFICATION_QUEUE_SIZE
+        )
+    return _notification_hub
+
+async def publish_safely(notifications: Iterable[Any]):
+    """Push stored notifications to clients; the write itself never fails because of delivery"""
+    try:
+        await get_notification_hub().publish([notification_payload(n) for n in notifications])
+    except Exception as e:
+        print(f"Error publishing notifications: {str(e)}")
@@ -0,0 +1,72 @@
+from typing import Any, Dict, List
+
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+# The newest messages are always considered first so the prompt reflects the current conversation
+ALWAYS_RECENT = 5
+
+def _message_prefix(message: Dict[str, Any]) -> str:
+    price = f" ${message['price']}" if message.get("price") else ""
+    purchased = " purchased" if message.get("purchased") else ""
+    return f"- [{message['sent_time']}] {message['message_type']}{price}{purchased}: "
+
+def _priority_order(messages: List[Dict[str, Any]]) -> List[int]:
+    """Indexes of ``messages`` (oldest first) in the order they should claim budget"""
+    newest_first = list(range(len(messages) - 1, -1, -1))
+    recent = newest_first[:ALWAYS_RECENT]
+    rest = newest_first[ALWAYS_RECENT:]
+    # Purchased PPV by value, then unsold PPV, then everything else by recency
+    rest.sort(key=lambda i: (
+        not messages[i].get("purchased"),
+        messages[i].get("message_type") != "ppv",
+        -(messages[i].get("price") or 0.0)
+    ))
+    return recent + rest
+
+def compact_message_history(
+    messages: List[Dict[str, Any]],
+    aggregates: Dict[str, Any],
+    budget_tokens: int,
+    message_tokens: int
+) -> List[str]:
+    """
+    Render message history as prompt lines within ``budget_tokens``
+
+    ``messages`` is oldest first. Recent, PPV and high-spend messages are kept
+    in preference to the rest, each message's content is capped at
+    ``message_tokens``, and whatever does not fit is summarized from the
+    precomputed ``aggregates`` (message_count, ppv_offered, revenue_total).
+    """
+    if not messages:
+        return []
+
+    header = "Message History (oldest first):"
+    # Reserve room for the header and the summary line before placing messages
+    remaining = budget_tokens - count_tokens(header) - 30
+    lines = {}
+    for index in _priority_order(messages):
+        prefix = _message_prefix(messages[index])
+        # Skip truncating content for a message that cannot fit even without it
+        if count_tokens(prefix) + 1 > remaining:
+            continue
+        line = prefix + truncate_to_tokens(messages[index].get("content") or "", message_tokens)
+        cost = count_tokens(line) + 1
+        if cost <= remaining:
+            lines[index] = line
+            remaining -= cost
+
+    shown = [messages[index] for index in lines]
+    omitted_count = max(aggregates.get("message_count", len(messages)) - len(shown), 0)
+    omitted_ppv = max(aggregates.get("ppv_offered", 0) - sum(1 for m in shown if m.get("message_type") == "ppv"), 0)
+    omitted_revenue = max(
+        (aggregates.get("revenue_total") or 0.0) - sum(m.get("price") or 0.0 for m in shown if m.get("purchased")),
+        0.0
+    )
+
+    rendered = [header]
+    if omitted_count:
+        rendered.append(
+            f"({omitted_count} other messages not shown: {omitted_ppv} PPV offers, ${omitted_revenue:.2f} purchased)"
+        )
+    rendered.extend(lines[index] for index in sorted(lines))
+    return rendered
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Any, Iterable, List, Optional, Tuple
+
+from app.core import config
+from app.services.embeddings import get_embedder
+from app.services.vector_index import VectorIndex, new_generation, publish_generation
+
+INSIGHTS = "insights"
+MESSAGES = "messages"
+
+def insight_entry(insight: Any) -> Tuple[int, str]:
+    """(id, text) pair an insight is indexed under"""
+    return insight.id, f"{insight.summary}\n{insight.details}"
+
+class SemanticIndex:
+    """
+    Embedding indexes over insights and messages
+
+    Writers call ``index`` with (id, text) pairs as rows are stored;
+    embedding and disk I/O run in a worker thread so the event loop is not
+    blocked.
+    """
+
+    def __init__(self, path: str, embedder=None):
+        self.embedder = embedder or get_embedder()
+        self.indexes = {namespace: self._open(os.path.join(path, namespace)) for namespace in (INSIGHTS, MESSAGES)}
+
+    def _open(self, path: str) -> VectorIndex:
+        return VectorIndex(
+            path,
+            self.embedder.dim,
+            ivf_min_vectors=config.EMBEDDING_IVF_MIN_VECTORS,
+            nprobe=config.EMBEDDING_IVF_NPROBE
+        )
+
+    def _add(self, index: VectorIndex, entries: List[Tuple[int, str]]):
+        entries = [(entry_id, text) for entry_id, text in entries if text]
+        if entries:
+            ids, texts = zip(*entries)
+            index.add(list(ids), self.embedder.embed(list(texts)))
+
+    async def index(self, namespace: str, entries: Iterable[Tuple[int, str]]):
+        """Embed and store (id, text) pairs, replacing earlier vectors for the same ids"""
+        await asyncio.to_thread(self._add, self.indexes[namespace], list(entries))
+
+    def stage(self, namespace: str) -> VectorIndex:
+        """
+        Empty index in a new directory for rebuilding ``namespace``
+
+        Search keeps reading the current index until ``publish``, and the new
+        one may use a different embedding dimension.
+        """
+        return self._open(new_generation(self.indexes[namespace].path))
+
+    async def index_staged(self, staged: VectorIndex, entries: Iterable[Tuple[int, str]]):
+        await asyncio.to_thread(self._add, staged, list(entries))
+
+    async def publish(self, namespace: str, staged: VectorIndex, train: bool = False):
+        """Train a staged index if asked, then swap it in for ``namespace`` atomically"""
+        if train:
+            await asyncio.to_thread(staged.train, True)
+        await asyncio.to_thread(publish_generation, self.indexes[namespace].path, staged.path)
+
+    async def remove(self, namespace: str, ids: List[int]):
+        await asyncio.to_thread(self.indexes[namespace].remove, ids)
+
+    async def train(self, namespace: str, force: bool = False) -> bool:
+        """Train the namespace's IVF lists if it has outgrown them; slow, so only called from tasks"""
+        return await asyncio.to_thread(self.indexes[namespace].train, force)
+
+    def _search(self, namespace: str, text: str, k: int, exact: bool, exclude_id: Optional[int]) -> List[Tuple[int, float]]:
+        query = self.embedder.embed([text])[0]
+        hits = self.indexes[namespace].search(query, k + (1 if exclude_id is not None else 0), exact=exact)
+        return [(hit_id, score) for hit_id, score in hits if hit_id != exclude_id][:k]
+
+    async def search(
+        self,
+        namespace: str,
+        text: str,
+        k: int = 10,
+        exact: bool = False,
+        exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """Top ``k`` (id, similarity) pairs for ``text``"""
+        return await asyncio.to_thread(self._search, namespace, text, k, exact, exclude_id)
+
+_semantic_index: Optional[SemanticIndex] = None
+
+def get_semantic_index() -> SemanticIndex:
+    """Process-wide index, opened on first use"""
+    global _semantic_index
+    if _semantic_index is None:
+        _semantic_index = SemanticIndex(config.EMBEDDING_INDEX_PATH)
+    return _semantic_index
+
+async def _send_to_index_host(task_name: str, namespace: str, ids: List[int]):
+    """Hand an index update to the embeddings queue, consumed on the host that serves search"""
+    from celery_worker import celery_app
+    await asyncio.to_thread(celery_app.send_task, task_name, kwargs={"namespace": namespace, "ids": ids})
+
+async def index_safely(namespace: str, entries: Iterable[Tuple[int, str]]):
+    """Update the index after a write; the write itself never fails because of the index"""
+    try:
+        if config.EMBEDDING_INDEX_WRITER == "queue":
+            await _send_to_index_host("app.tasks.embeddings.index_entries", namespace, [entry_id for entry_id, _ in entries])
+        else:
+            await get_semantic_index().index(namespace, entries)
+    except Exception as e:
+        print(f"Error indexing {namespace}: {str(e)}")
+
+async def remove_safely(namespace: str, ids: List[int]):
+    try:
+        if config.EMBEDDING_INDEX_WRITER == "queue":
+            await _send_to_index_host("app.tasks.embeddings.remove_entries", namespace, list(ids))
+        else:
+            await get_semantic_index().remove(namespace, ids)
+    except Exception as e:
+        print(f"Error removing {namespace} from index: {str(e)}")
@@ -0,0 +1,341 @@
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import config
+
+# Per-turn flags, packed into one small int
+ASKED_QUESTION = 1
+PERSONAL = 2
+MADE_OFFER = 4
+CONVERTED = 8
+
+# Running totals kept on every session, in this order, so metrics survive trimmed history
+TOTALS = ("turns", "questions", "personal", "offers", "conversions", "engagement")
+
+# Chance that an engaged fan accepts an offer, by spending level
+PURCHASE_PROPENSITY = {"low": 0.25, "medium": 0.45, "high": 0.7, "whale": 0.85}
+
+OFFER_PATTERN = re.compile(r"\b(exclusive|unlock|ppv|bundle|offer|deal|discount|special|premium|vip)\b|\$\d", re.I)
+EMOJI_PATTERN = re.compile("[\U0001F300-\U0001FAFF☀-➿]")
+
+OPENING_MESSAGE = "Hey there! How's it going today? 😊"
+
+# Fan replies as (kind, template); turns store an index into this table instead of the text
+FAN_REPLIES: Tuple[Tuple[str, str], ...] = (
+    ("engaged", "Haha, I love that! Tell me more? 😊"),
+    ("engaged", "That's so sweet of you to ask. Honestly, I've been really into {interest} lately"),
+    ("engaged", "You always know what to say 💕"),
+    ("personal", "Wait, you remembered I'm into {interest}? That's really cool"),
+    ("personal", "Yes!! {interest} is my favourite thing to talk about"),
+    ("neutral", "Hmm, interesting"),
+    ("neutral", "Oh nice. What else have you been up to?"),
+    ("neutral", "Cool cool"),
+    ("cold", "ok"),
+    ("cold", "lol"),
+    ("accepted", "Okay you convinced me, I'm in! 🔥"),
+    ("accepted", "Sending it now, can't wait to see it 😍"),
+    ("declined", "Maybe another time, I'm not sure it's for me"),
+    ("declined", "Hmm, that's a bit much for me right now"),
+    ("too_early", "Whoa, we only just started talking... 😅"),
+)
+_REPLIES_BY_KIND: Dict[str, List[int]] = {}
+for _index, (_kind, _) in enumerate(FAN_REPLIES):
+    _REPLIES_BY_KIND.setdefault(_kind, []).append(_index)
+
+class SimulationSession:
+    """
+    State of one training conversation
+
+    Each turn is a compact tuple ``(offset_seconds, chatter_text, reply_index,
+    engagement_percent, flags)``: the fan reply is an index into FAN_REPLIES
+    and engagement a small int, so a turn costs little more than the
+    chatter's own text. Only the last ``max_turns`` turns are kept; running
+    totals cover the whole conversation.
+    """
+
+    __slots__ = ("id", "fan_profile", "scenario", "started_at", "turns", "totals")
+
+    def __init__(
+        self,
+        id: str,
+        fan_profile: Dict[str, Any],
+        scenario: str,
+        started_at: float,
+        turns: Optional[List[tuple]] = None,
+        totals: Optional[List[float]] = None
+    ):
+        self.id = id
+        self.fan_profile = fan_profile
+        self.scenario = scenario
+        self.started_at = started_at
+        self.turns = turns if turns is not None else []
+        self.totals = totals if totals is not None else [0, 0, 0, 0, 0, 0]
+
+    def dumps(self) -> str:
+        return json.dumps([self.id, self.fan_profile, self.scenario, self.started_at, self.turns, self.totals])
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "SimulationSession":
+        id, fan_profile, scenario, started_at, turns, totals = json.loads(raw)
+        return cls(id, fan_profile, scenario, started_at, [tuple(turn) for turn in turns], totals)
+
+class SimulationSessionStore:
+    """
+    Bounded store of active simulations keyed by simulation id
+
+    The in-process backend is an LRU bounded by ``max_sessions`` whose
+    entries expire ``ttl_seconds`` after their last save, so abandoned
+    sessions never pile up. The Redis backend keeps each session as one
+    JSON value with the same sliding expiry, so any worker can serve the
+    next message.
+    """
+
+    def __init__(self, ttl_seconds: int, max_sessions: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, Tuple[float, SimulationSession]]" = OrderedDict()
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url)
+
+    @staticmethod
+    def _redis_key(simulation_id: str) -> str:
+        return f"simulator:session:{simulation_id}"
+
+    async def get(self, simulation_id: str) -> Optional[SimulationSession]:
+        if self._redis is not None:
+            raw = await self._redis.get(self._redis_key(simulation_id))
+            return SimulationSession.loads(raw) if raw else None
+
+        entry = self._entries.get(simulation_id)
+        if entry is None:
+            return None
+        expires_at, session = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(simulation_id, None)
+            return None
+        self._entries.move_to_end(simulation_id)
+        return session
+
+    async def save(self, session: SimulationSession):
+        if self._redis is not None:
+            await self._redis.set(self._redis_key(session.id), session.dumps(), ex=self.ttl_seconds)
+            return
+
+        self._entries[session.id] = (time.monotonic() + self.ttl_seconds, session)
+        self._entries.move_to_end(session.id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+    async def delete(self, simulation_id: str):
+        self._entries.pop(simulation_id, None)
+        if self._redis is not None:
+            await self._redis.delete(self._redis_key(simulation_id))
+
+    async def clear(self):
+        self._entries.clear()
+
+session_store = SimulationSessionStore(
+    ttl_seconds=config.SIMULATOR_SESSION_TTL_SECONDS,
+    max_sessions=config.SIMULATOR_MAX_SESSIONS,
+    redis_url=config.REDIS_URL if config.SIMULATOR_SESSION_BACKEND == "redis" else None
+)
+
+def new_session(simulation_id: str, simulation_data: Dict[str, Any]) -> SimulationSession:
+    fan_profile = {
+        "name": simulation_data.get("fan_name", "Simulated Fan"),
+        "spending_level": simulation_data.get("spending_level", "medium"),
+        "personality": simulation_data.get("personality", "friendly"),
+        "interests": list(simulation_data.get("interests", ["travel", "fitness"]))
+    }
+    return SimulationSession(
+        simulation_id,
+        fan_profile,
+        simulation_data.get("scenario", "general conversation"),
+        time.time()
+    )
+
+def _averages(totals: List[float]) -> Dict[str, float]:
+    turns = max(totals[0], 1)
+    return {
+        "engagement": totals[5] / turns / 100,
+        "questions": totals[1] / turns,
+        "personal": totals[2] / turns
+    }
+
+def _conversion_potential(session: SimulationSession) -> float:
+    propensity = PURCHASE_PROPENSITY.get(session.fan_profile["spending_level"], PURCHASE_PROPENSITY["medium"])
+    averages = _averages(session.totals)
+    potential = propensity * (0.4 + 0.6 * averages["engagement"]) + 0.15 * averages["personal"]
+    return min(1.0, potential)
+
+def _render_reply(session: SimulationSession, reply_index: int, turn_number: int) -> str:
+    interests = session.fan_profile["interests"] or ["chatting with you"]
+    return FAN_REPLIES[reply_index][1].format(interest=interests[turn_number % len(interests)])
+
+def _coaching_tips(session: SimulationSession, flags: int, kind: str) -> List[str]:
+    tips = []
+    if kind == "too_early":
+        tips.append("Build rapport for a few messages before making an offer")
+    elif kind == "declined":
+        tips.append("The offer was turned down; rebuild interest before trying again")
+    elif kind == "accepted":
+        tips.append("Nice close! Follow up with a thank-you to keep the fan engaged")
+    if not flags & ASKED_QUESTION:
+        tips.append("Try asking a follow-up question to keep the fan talking")
+    if not flags & PERSONAL and session.fan_profile["interests"]:
+        tips.append(f"Mention one of their interests ({', '.join(session.fan_profile['interests'][:2])}) to make it personal")
+    if not session.totals[3] and session.totals[0] >= 4 and _averages(session.totals)["engagement"] >= 0.55:
+        tips.append("Engagement is high: this would be a good time to offer exclusive content")
+    return tips[:3]
+
+def process_message(session: SimulationSession, message: str) -> Dict[str, Any]:
+    """
+    Score a chatter message, append the turn and return the fan's reply
+
+    Replies and conversions are drawn from a generator seeded with the
+    simulation id and turn number, so a replayed conversation plays out the
+    same way on any worker.
+    """
+    text = message.strip()
+    lowered = text.lower()
+    turn_number = session.totals[0]
+    rng = random.Random(f"{session.id}:{turn_number}")
+
+    flags = 0
+    if "?" in text:
+        flags |= ASKED_QUESTION
+    if any(interest.lower() in lowered for interest in session.fan_profile["interests"]) or \
+            session.fan_profile["name"].lower() in lowered:
+        flags |= PERSONAL
+    if OFFER_PATTERN.search(text):
+        flags |= MADE_OFFER
+
+    engagement = 0.3
+    engagement += 0.2 if flags & ASKED_QUESTION else 0.0
+    engagement += 0.25 if flags & PERSONAL else 0.0
+    engagement += 0.05 * min(len(EMOJI_PATTERN.findall(text)), 3)
+    engagement += 0.1 if 20 <= len(text) <= 300 else 0.0
+    if flags & MADE_OFFER and turn_number < 2:
+        engagement -= 0.2
+    engagement = min(max(engagement, 0.0), 1.0)
+
+    totals = session.totals
+    totals[0] += 1
+    totals[1] += 1 if flags & ASKED_QUESTION else 0
+    totals[2] += 1 if flags & PERSONAL else 0
+    totals[5] += round(engagement * 100)
+
+    potential = _conversion_potential(session)
+    if flags & MADE_OFFER:
+        totals[3] += 1
+        if turn_number < 2:
+            kind = "too_early"
+        elif rng.random() < potential:
+            kind = "accepted"
+            flags |= CONVERTED
+            totals[4] += 1
+        else:
+            kind = "declined"
+    elif flags & PERSONAL:
+        kind = "personal"
+    elif engagement >= 0.6:
+        kind = "engaged"
+    elif engagement >= 0.35:
+        kind = "neutral"
+    else:
+        kind = "cold"
+    reply_index = rng.choice(_REPLIES_BY_KIND[kind])
+
+    session.turns.append((
+        int(time.time() - session.started_at),
+        text[:config.SIMULATOR_MAX_MESSAGE_CHARS],
+        reply_index,
+        round(engagement * 100),
+        flags
+    ))
+    if len(session.turns) > config.SIMULATOR_MAX_TURNS:
+        del session.turns[:len(session.turns) - config.SIMULATOR_MAX_TURNS]
+
+    if engagement >= 0.6:
+        sentiment = "flirty" if session.fan_profile["personality"] == "flirty" else "positive"
+    elif engagement >= 0.35:
+        sentiment = "neutral"
+    else:
+        sentiment = "negative"
+
+    return {
+        "simulation_id": session.id,
+        "response": _render_reply(session, reply_index, turn_number),
+        "metrics": {
+            "engagement_score": _averages(totals)["engagement"],
+            "conversion_potential": potential,
+            "sentiment": sentiment
+        },
+        "coaching_tips": _coaching_tips(session, flags, kind)
+    }
+
+def session_history(session: SimulationSession) -> List[Dict[str, Any]]:
+    """Kept turns expanded into chat messages, oldest first"""
+    first_turn = session.totals[0] - len(session.turns)
+    history = []
+    for number, (offset, text, reply_index, engagement, flags) in enumerate(session.turns, start=first_turn):
+        history.append({
+            "turn": number + 1,
+            "offset_seconds": offset,
+            "message": text,
+            "response": _render_reply(session, reply_index, number),
+            "engagement_score": engagement / 100,
+            "asked_question": bool(flags & ASKED_QUESTION),
+            "personal": bool(flags & PERSONAL),
+            "made_offer": bool(flags & MADE_OFFER),
+            "converted": bool(flags & CONVERTED)
+        })
+    return history
+
+def session_results(session: SimulationSession) -> Dict[str, Any]:
+    """Final metrics and feedback for a finished simulation"""
+    turns, questions, personal, offers, conversions, _ = session.totals
+    averages = _averages(session.totals)
+    response_quality = (averages["questions"] + averages["personal"]) / 2
+    conversion_rate = conversions / offers if offers else 0.0
+    final_score = 100 * (0.4 * averages["engagement"] + 0.3 * response_quality + 0.3 * conversion_rate)
+
+    feedback = []
+    if not turns:
+        feedback.append("No messages were sent in this simulation")
+    else:
+        if averages["questions"] >= 0.5:
+            feedback.append("Good use of questions to keep the conversation going")
+        else:
+            feedback.append("Ask more questions to keep the fan talking")
+        if averages["personal"] >= 0.3:
+            feedback.append("Great job personalising messages around the fan's interests")
+        else:
+            feedback.append("Reference the fan's interests more often")
+        if not offers:
+            feedback.append("No offers were made; look for a moment to introduce premium content")
+        elif conversions:
+            feedback.append(f"Converted {conversions} of {offers} offers")
+        else:
+            feedback.append("Offers did not convert; build more engagement before selling")
+
+    return {
+        "simulation_id": session.id,
+        "status": "completed",
+        "duration_minutes": max(1, round((time.time() - session.started_at) / 60)),
+        "turns": turns,
+        "final_score": final_score,
+        "metrics": {
+            "engagement_rate": averages["engagement"],
+            "response_quality": response_quality,
+            "conversion_opportunities": offers,
+            "conversion_success": conversions
+        },
+        "feedback": feedback
+    }
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Dict, Optional, Union
+
+from app.core import config
+
+# Counter for notifications addressed to every user
+BROADCAST = "all"
+
+CounterKey = Union[int, str]
+
+# Adjust a count only while it is cached; a missing key is recounted from the database
+_ADJUST_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+class UnreadCounter:
+    """
+    Cached unread notification counts
+
+    One count per recipient user, one for broadcasts and one per user for the
+    broadcasts they have already read or archived, so a user's badge is their
+    own count plus the broadcast count less their dismissed broadcasts.
+    Writers adjust cached counts
+    in place as notifications are created, read or archived; a miss is
+    recounted from the partial unread index. Entries expire after
+    ``ttl_seconds`` so any drift (e.g. between in-process caches of several
+    workers) is bounded; use the Redis backend to share exact counts.
+    """
+
+    def __init__(self, ttl_seconds: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.redis_url = redis_url
+        self._counts: Dict[CounterKey, tuple] = {}
+        self._client = None
+        self._client_loop = None
+        self._adjust_script = None
+
+    def _redis(self):
+        # Celery tasks run each job in a new event loop, and a client cannot outlive its loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            import redis.asyncio as aioredis
+            self._client = aioredis.from_url(self.redis_url)
+            self._client_loop = loop
+            self._adjust_script = self._client.register_script(_ADJUST_SCRIPT)
+        return self._client
+
+    @staticmethod
+    def _redis_key(key: CounterKey) -> str:
+        return f"notifications:unread:{key}"
+
+    async def get(self, key: CounterKey) -> Optional[int]:
+        if self.redis_url:
+            raw = await self._redis().get(self._redis_key(key))
+            return int(raw) if raw is not None else None
+
+        entry = self._counts.get(key)
+        if entry is None:
+            return None
+        expires_at, count = entry
+        if expires_at < time.monotonic():
+            self._counts.pop(key, None)
+            return None
+        return count
+
+    async def set(self, key: CounterKey, count: int):
+        if self.redis_url:
+            await self._redis().set(self._redis_key(key), count, ex=self.ttl_seconds)
+            return
+        self._counts[key] = (time.monotonic() + self.ttl_seconds, count)
+
+    async def adjust(self, deltas: Dict[CounterKey, int]):
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+            if self.redis_url:
+                # Registered on this loop's client
+                self._redis()
+                await self._adjust_script(keys=[self._redis_key(key)], args=[delta])
+                continue
+            entry = self._counts.get(key)
+            if entry is not None:
+                expires_at, count = entry
+                self._counts[key] = (expires_at, max(count + delta, 0))
+
+    async def clear(self):
+        self._counts.clear()
+
+unread_counter = UnreadCounter(
+    ttl_seconds=config.NOTIFICATION_UNREAD_CACHE_TTL_SECONDS,
+    redis_url=config.REDIS_URL if config.NOTIFICATION_BROKER == "redis" else None
+)
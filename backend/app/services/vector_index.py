@@ -0,0 +1,383 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+class VectorIndex:
+    """
+    Append-only vector store in NumPy memory-mapped files
+
+    Vectors are unit-normalized float32 rows, so the inner product is the
+    cosine similarity. Rows are keyed by an integer id; adding an existing id
+    overwrites its row and removing one leaves a tombstone.
+
+    Once ``train`` has built an IVF coarse quantizer (spherical k-means
+    over a sample), search only scans the ``nprobe`` closest lists. Until
+    then, or with ``exact=True``, search is a brute-force matrix product.
+    Writes never train: ``needs_training`` tells a background job when the
+    index has grown past ``ivf_min_vectors`` or doubled since it was last
+    trained.
+
+    Several processes may share a directory: writers serialize on a file
+    lock and readers reopen the files when the metadata changes. ``path``
+    may be a symlink to the directory holding the files (see
+    ``publish_generation``); when it is repointed, every instance switches to
+    the new directory on its next access. Inverted
+    lists are kept in memory and extended with new rows; the ``layout``
+    counter in the metadata changes only when existing rows may have moved
+    between lists, which is when other processes rebuild theirs.
+    """
+
+    INITIAL_CAPACITY = 1024
+    TRAIN_SAMPLE = 65536
+    KMEANS_ITERATIONS = 10
+    # Rebuild the in-memory lists once this share of their entries is stale
+    MAX_STALE_RATIO = 0.25
+
+    def __init__(self, path: str, dim: int, ivf_min_vectors: int = 50000, nprobe: int = 8):
+        self.path = path
+        self.dim = dim
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        os.makedirs(path, exist_ok=True)
+        # Directory the files are read from: ``path`` itself, or the generation it links to
+        self._dir = os.path.realpath(path)
+        self._lock = threading.RLock()
+        self._meta_mtime: Optional[int] = None
+        self._meta = {"dim": dim, "count": 0, "capacity": 0, "nlist": 0, "trained_count": 0, "layout": 0}
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._lists: Optional[np.memmap] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._list_rows: List[np.ndarray] = []
+        # Rows and layout the in-memory lists cover, and how many of their entries are stale
+        self._lists_count = 0
+        self._lists_layout: Optional[int] = None
+        self._stale = 0
+        self._rows_by_id: Optional[dict] = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+    def _resolve_dir(self):
+        """Follow ``path`` to its current directory, dropping all state if a new generation was published"""
+        current = os.path.realpath(self.path)
+        if current == self._dir:
+            return
+        self._dir = current
+        self._meta_mtime = None
+        self._meta = {"dim": self.dim, "count": 0, "capacity": 0, "nlist": 0, "trained_count": 0, "layout": 0}
+        self._vectors = self._ids = self._lists = None
+        self._centroids = None
+        self._list_rows = []
+        self._lists_count = 0
+        self._lists_layout = None
+        self._stale = 0
+        self._rows_by_id = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._reload()
+            return int(np.count_nonzero(self._ids[:self._meta["count"]] >= 0)) if self._meta["count"] else 0
+
+    # Storage
+
+    def _reload(self):
+        """Reopen the memory maps if another writer changed the index"""
+        self._resolve_dir()
+        try:
+            mtime = os.stat(self._file("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        if meta["dim"] != self.dim:
+            raise ValueError(f"Index at {self.path} has dimension {meta['dim']}, expected {self.dim}")
+        meta.setdefault("layout", 0)
+
+        previous_count = self._meta["count"]
+        self._meta = meta
+        self._meta_mtime = mtime
+        self._open_maps()
+        self._rows_by_id = None
+        if meta["layout"] == self._lists_layout and previous_count == self._lists_count:
+            # Only rows appended by the other writer are new to the lists
+            rows = np.arange(previous_count, meta["count"])
+            self._extend_lists(rows, np.asarray(self._lists[previous_count:meta["count"]]) if len(rows) else rows)
+        else:
+            self._centroids = np.load(self._file("centroids.npy")) if meta["nlist"] else None
+            self._build_lists()
+
+    def _open_maps(self):
+        capacity = self._meta["capacity"]
+        if not capacity:
+            self._vectors = self._ids = self._lists = None
+            return
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._ids = np.memmap(self._file("ids.i64"), dtype=np.int64, mode="r+", shape=(capacity,))
+        self._lists = np.memmap(self._file("lists.i32"), dtype=np.int32, mode="r+", shape=(capacity,))
+
+    def _grow(self, needed: int):
+        capacity = max(self._meta["capacity"], self.INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._meta["capacity"]:
+            return
+        for name, row_bytes in (("vectors.f32", 4 * self.dim), ("ids.i64", 8), ("lists.i32", 4)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        old_capacity = self._meta["capacity"]
+        self._meta["capacity"] = capacity
+        self._open_maps()
+        # New rows start as tombstones outside every IVF list
+        self._ids[old_capacity:] = -1
+        self._lists[old_capacity:] = -1
+
+    def _write_meta(self):
+        for mapped in (self._vectors, self._ids, self._lists):
+            if mapped is not None:
+                mapped.flush()
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+        self._meta_mtime = os.stat(self._file("meta.json")).st_mtime_ns
+
+    def _writer(self):
+        """Exclusive lock shared with other processes writing this directory"""
+        self._resolve_dir()
+        lock_file = open(self._file("lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _row_lookup(self) -> dict:
+        if self._rows_by_id is None:
+            count = self._meta["count"]
+            ids = self._ids[:count] if count else np.empty(0, dtype=np.int64)
+            live = np.nonzero(ids >= 0)[0]
+            self._rows_by_id = dict(zip(ids[live].tolist(), live.tolist()))
+        return self._rows_by_id
+
+    # Writes
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """Insert or overwrite vectors for ``ids``"""
+        if len(ids) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+
+        with self._lock:
+            lock_file = self._writer()
+            try:
+                self._reload()
+                rows_by_id = self._row_lookup()
+                count = self._meta["count"]
+                rows = []
+                for vector_id in ids:
+                    row = rows_by_id.get(int(vector_id))
+                    if row is None:
+                        row = count
+                        rows_by_id[int(vector_id)] = row
+                        count += 1
+                    rows.append(row)
+
+                self._grow(count)
+                rows = np.asarray(rows, dtype=np.int64)
+                self._vectors[rows] = vectors
+                self._ids[rows] = np.asarray(ids, dtype=np.int64)
+                self._meta["count"] = count
+                if self._centroids is not None:
+                    assignment = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+                    existing = rows < self._lists_count
+                    moved = existing & (np.asarray(self._lists[rows]) != assignment)
+                    self._lists[rows] = assignment
+                    if moved.any():
+                        # Other processes cannot tell which rows moved, so they rebuild their lists
+                        self._meta["layout"] += 1
+                        self._lists_layout = self._meta["layout"]
+                        self._stale += int(moved.sum())
+                    added = ~existing | moved
+                    self._extend_lists(rows[added], assignment[added])
+                self._lists_count = count
+                self._write_meta()
+                self._compact_lists()
+            finally:
+                lock_file.close()
+
+    def remove(self, ids: Sequence[int]):
+        with self._lock:
+            lock_file = self._writer()
+            try:
+                self._reload()
+                rows_by_id = self._row_lookup()
+                rows = [rows_by_id.pop(int(vector_id)) for vector_id in ids if int(vector_id) in rows_by_id]
+                if not rows:
+                    return
+                self._ids[rows] = -1
+                self._lists[rows] = -1
+                self._vectors[rows] = 0.0
+                # Removed rows stay in the in-memory lists until compaction; search skips them
+                self._stale += len(rows)
+                self._write_meta()
+                self._compact_lists()
+            finally:
+                lock_file.close()
+
+    # IVF
+
+    @property
+    def needs_training(self) -> bool:
+        with self._lock:
+            self._reload()
+            count = self._meta["count"]
+            return count >= self.ivf_min_vectors and count >= 2 * self._meta["trained_count"]
+
+    def train(self, force: bool = False) -> bool:
+        """
+        Train the IVF quantizer and reassign every row, if the index needs it
+
+        Cost grows with the index size, so this runs from a background job
+        rather than on the write path. Returns whether training ran.
+        """
+        with self._lock:
+            lock_file = self._writer()
+            try:
+                self._reload()
+                count = self._meta["count"]
+                if not count or not (force or (count >= self.ivf_min_vectors and count >= 2 * self._meta["trained_count"])):
+                    return False
+                self._train()
+                self._meta["layout"] += 1
+                self._write_meta()
+                self._build_lists()
+                return True
+            finally:
+                lock_file.close()
+
+    def _train(self):
+        """Spherical k-means over a sample of live rows, then reassign every row"""
+        count = self._meta["count"]
+        live = np.nonzero(self._ids[:count] >= 0)[0]
+        nlist = max(int(np.sqrt(len(live))), 1)
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(live, size=min(len(live), self.TRAIN_SAMPLE), replace=False))
+        sample = np.asarray(self._vectors[sample_rows])
+
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+        for _ in range(self.KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+
+        # Assign in blocks so memory stays bounded for large indexes
+        for start in range(0, count, self.TRAIN_SAMPLE):
+            block = np.asarray(self._vectors[start:start + self.TRAIN_SAMPLE])
+            self._lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self._lists[:count][self._ids[:count] < 0] = -1
+
+        np.save(self._file("centroids.npy"), centroids)
+        self._centroids = centroids
+        self._meta["nlist"] = len(centroids)
+        self._meta["trained_count"] = count
+
+    def _build_lists(self):
+        """Inverted lists (row numbers per IVF list) derived from the whole assignment column"""
+        self._lists_count = self._meta["count"]
+        self._lists_layout = self._meta["layout"]
+        self._stale = 0
+        if self._centroids is None or not self._meta["count"]:
+            self._list_rows = []
+            return
+        assignment = np.asarray(self._lists[:self._meta["count"]])
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self._centroids) + 1))
+        self._list_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+
+    def _extend_lists(self, rows: np.ndarray, assignment: np.ndarray):
+        """Append rows to their lists; cost depends on the rows added, not the index size"""
+        self._lists_count = self._meta["count"]
+        if self._centroids is None or not len(rows):
+            return
+        order = np.argsort(assignment, kind="stable")
+        rows, assignment = rows[order], assignment[order]
+        targets, starts = np.unique(assignment, return_index=True)
+        for target, chunk in zip(targets.tolist(), np.split(rows, starts[1:])):
+            if target >= 0:
+                self._list_rows[target] = np.concatenate([self._list_rows[target], chunk])
+
+    def _compact_lists(self):
+        if self._stale > self.MAX_STALE_RATIO * max(self._meta["count"], 1):
+            self._build_lists()
+
+    # Reads
+
+    def search(self, query: np.ndarray, k: int = 10, exact: bool = False, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top ``k`` (id, cosine similarity) pairs for a unit-normalized query vector"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            self._reload()
+            count = self._meta["count"]
+            if not count or k <= 0:
+                return []
+
+            if exact or self._centroids is None:
+                rows = None
+                scores = np.asarray(self._vectors[:count]) @ query
+            else:
+                probe = np.argsort(-(self._centroids @ query))[:nprobe or self.nprobe]
+                rows = np.unique(np.concatenate([self._list_rows[i] for i in probe]))
+                # Drop stale entries: rows since removed or moved to a list outside the probe
+                rows = rows[np.isin(np.asarray(self._lists[rows]), probe)]
+                if not len(rows):
+                    return []
+                scores = np.asarray(self._vectors[rows]) @ query
+
+            ids = np.asarray(self._ids[:count]) if rows is None else np.asarray(self._ids[rows])
+            scores = np.where(ids >= 0, scores, -np.inf)
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(ids[i]), float(scores[i])) for i in top if ids[i] >= 0]
+
+    def get(self, vector_id: int) -> Optional[np.ndarray]:
+        with self._lock:
+            self._reload()
+            if not self._meta["count"]:
+                return None
+            row = self._row_lookup().get(int(vector_id))
+            return None if row is None else np.array(self._vectors[row])
+
+def new_generation(path: str) -> str:
+    """Empty directory next to ``path`` for building a replacement index"""
+    generation = f"{path}.{uuid.uuid4().hex[:12]}"
+    os.makedirs(generation)
+    return generation
+
+def publish_generation(path: str, generation: str):
+    """
+    Atomically point ``path`` at ``generation`` and delete the directory it replaced
+
+    ``path`` becomes a symlink; a plain directory left by an older layout is
+    moved aside first. Processes that still map files of the old directory
+    keep reading them until their next access follows the new link.
+    """
+    previous = os.path.realpath(path)
+    if os.path.isdir(path) and not os.path.islink(path):
+        previous = f"{path}.{uuid.uuid4().hex[:12]}"
+        os.rename(path, previous)
+    link = f"{path}.link-{uuid.uuid4().hex[:12]}"
+    os.symlink(os.path.basename(generation), link)
+    os.replace(link, path)
+    if previous != os.path.realpath(generation) and os.path.isdir(previous):
+        shutil.rmtree(previous, ignore_errors=True)
@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from celery_worker import celery_app
+from app.core import config
+from app.db.base import task_database
+from app.models.ai_insight import TargetType
+from app.repositories import ai_insight as insight_repo
+from app.schemas.ai_insight import AIInsightBulkFilter
+from app.services.ai_service import AIService
+from app.services.insight_context import build_target_data, build_targets_data, get_creator_fan_ids
+
+# Rows per transaction for bulk archive/delete jobs, keeping each lock short
+BULK_MUTATION_CHUNK_SIZE = 5000
+
+# Redis transport priorities: lower runs first, so interactive requests overtake batch backfills
+INTERACTIVE_PRIORITY = 0
+BATCH_PRIORITY = 6
+
+async def _generate_insight(target_type: str, target_id: Optional[int], custom_prompt: Optional[str]) -> Dict[str, Any]:
+    enum_target_type = TargetType[target_type.upper()]
+    ai_service = AIService()
+
+    try:
+        # Each task owns its session; nothing is borrowed from the API request
+        async with task_database.SessionLocal() as db:
+            target_data = await build_target_data(db, target_type, target_id)
+            insight_data = await ai_service.generate_insight(enum_target_type.value, target_data, custom_prompt)
+            db_insight = await insight_repo.create_insight(
+                db,
+                **insight_repo.generated_insight_fields(enum_target_type, target_id, insight_data)
+            )
+    finally:
+        await ai_service.aclose()
+
+    return {"status": "success", "insight_id": db_insight.id}
+
+async def _generate_insights_batch(
+    task,
+    target_type: str,
+    target_ids: Optional[List[int]],
+    creator_id: Optional[int],
+    custom_prompt: Optional[str]
+) -> Dict[str, Any]:
+    enum_target_type = TargetType[target_type.upper()]
+    # The service owns loop-bound state (the HTTP client), so build it inside this loop; the
+    # rate limiter is shared by the process and survives from one task to the next
+    ai_service = AIService()
+    generated = 0
+    errors: List[Dict[str, Any]] = []
+
+    try:
+        async with task_database.SessionLocal() as db:
+            if target_ids is None:
+                target_ids = await get_creator_fan_ids(db, creator_id) if creator_id else []
+            total = len(target_ids)
+
+            # Work in chunks so memory stays flat and progress is visible for large batches
+            for start in range(0, total, config.AI_BATCH_CHUNK_SIZE):
+                chunk_ids = target_ids[start:start + config.AI_BATCH_CHUNK_SIZE]
+                # One set of aggregate queries per chunk instead of per target
+                contexts = await build_targets_data(db, target_type, chunk_ids)
+                targets = [
+                    {
+                        "target_type": enum_target_type.value,
+                        "target_id": target_id,
+                        "target_data": contexts.get(target_id, {}),
+                        "custom_prompt": custom_prompt
+                    }
+                    for target_id in chunk_ids
+                ]
+
+                results = await ai_service.generate_insights_batch(targets)
+                rows = []
+                for result in results:
+                    if result["error"] is not None:
+                        errors.append({"target_id": result["target_id"], "error": result["error"]})
+                    else:
+                        rows.append(insight_repo.generated_insight_fields(
+                            enum_target_type, result["target_id"], result["insight"]
+                        ))
+                generated += await insight_repo.create_insights_bulk(db, rows)
+
+                task.update_state(
+                    state="PROGRESS",
+                    meta={"processed": start + len(chunk_ids), "total": total, "generated": generated}
+                )
+    finally:
+        await ai_service.aclose()
+
+    return {
+        "status": "success",
+        "total": len(target_ids),
+        "generated": generated,
+        "failed": len(errors),
+        "errors": errors[:100]
+    }
+
+async def _bulk_mutate_insights(task, action: str, ids: Optional[List[int]], filters: Dict[str, Any]) -> Dict[str, Any]:
+    affected = 0
+    last_id = 0
+    async with task_database.SessionLocal() as db:
+        while True:
+            chunk_ids = await insight_repo.matching_insight_ids(
+                db, last_id, BULK_MUTATION_CHUNK_SIZE, ids=ids, **filters
+            )
+            if not chunk_ids:
+                break
+            last_id = chunk_ids[-1]
+            if action == "delete":
+                affected += await insight_repo.bulk_delete(db, ids=chunk_ids)
+            elif action == "unarchive":
+                affected += await insight_repo.restore_insights(db, ids=chunk_ids)
+            else:
+                affected += await insight_repo.bulk_set_archived(db, action == "archive", ids=chunk_ids)
+            task.update_state(state="PROGRESS", meta={"action": action, "affected": affected})
+
+    return {"status": "success", "action": action, "affected": affected}
+
+async def _compact_insights() -> Dict[str, Any]:
+    archived = pruned = 0
+    async with task_database.SessionLocal() as db:
+        # Each batch commits on its own so the job never holds long locks
+        while True:
+            count = await insight_repo.archive_duplicate_live_insights(db, BULK_MUTATION_CHUNK_SIZE)
+            archived += count
+            if count < BULK_MUTATION_CHUNK_SIZE:
+                break
+
+        if config.INSIGHT_SUPERSEDED_RETENTION_DAYS > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=config.INSIGHT_SUPERSEDED_RETENTION_DAYS)
+            while True:
+                count = await insight_repo.prune_superseded_insights(db, cutoff, BULK_MUTATION_CHUNK_SIZE)
+                pruned += count
+                if count < BULK_MUTATION_CHUNK_SIZE:
+                    break
+
+    return {"status": "success", "archived": archived, "pruned": pruned}
+
+@celery_app.task(name="app.tasks.ai_insights.generate_insight")
+def generate_insight(target_type: str, target_id: Optional[int] = None, custom_prompt: Optional[str] = None):
+    """
+    Celery task to generate and store a single insight
+    """
+    return asyncio.run(_generate_insight(target_type, target_id, custom_prompt))
+
+@celery_app.task(name="app.tasks.ai_insights.generate_insights_batch", bind=True)
+def generate_insights_batch(
+    self,
+    target_type: str,
+    target_ids: Optional[List[int]] = None,
+    creator_id: Optional[int] = None,
+    custom_prompt: Optional[str] = None
+):
+    """
+    Celery task to generate insights for many targets
+
+    Either pass explicit target_ids, or a creator_id to cover every fan of that creator.
+    """
+    return asyncio.run(
+        _generate_insights_batch(self, target_type, target_ids, creator_id, custom_prompt)
+    )
+
+@celery_app.task(name="app.tasks.ai_insights.bulk_mutate_insights", bind=True)
+def bulk_mutate_insights(self, action: str, ids: Optional[List[int]] = None, filters: Optional[Dict[str, Any]] = None):
+    """
+    Celery task to archive, unarchive or delete a large selection of insights
+
+    Works through matching ids in chunks, committing each chunk separately.
+    """
+    # Filters arrive as JSON; parse dates and enums back through the request schema
+    parsed = AIInsightBulkFilter.parse_obj(filters or {}).dict(exclude_none=True)
+    return asyncio.run(_bulk_mutate_insights(self, action, ids, parsed))
+
+@celery_app.task(name="app.tasks.ai_insights.compact_insights")
+def compact_insights():
+    """
+    Celery task to keep one live insight per target and prune old superseded ones
+
+    Archives live duplicates, then deletes superseded insights once their
+    replacement is older than INSIGHT_SUPERSEDED_RETENTION_DAYS.
+    """
+    return asyncio.run(_compact_insights())
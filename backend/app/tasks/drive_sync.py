@@ -1,52 +1,39 @@
-from celery import Celery
-from celery.schedules import crontab
+import asyncio
 import os
 import tempfile
 from datetime import datetime
 from typing import List, Dict, Any
 
-from app.core.config import settings
+from app.db.base import task_database
 from app.services.drive_service import DriveService
+from app.services.ingestion import ingest_records, processed_hashes
 from app.utils.xlsx_parser import XLSXParser
+from celery_worker import celery_app
 
-# Initialize Celery
-celery_app = Celery(
-    "worker",
-    broker=settings.CELERY_BROKER_URL,
-    backend=settings.CELERY_RESULT_BACKEND
-)
+async def _processed_hashes() -> List[str]:
+    async with task_database.SessionLocal() as db:
+        return await processed_hashes(db)
 
-# Configure Celery
-celery_app.conf.task_routes = {
-    "app.tasks.drive_sync.*": {"queue": "drive-sync"},
-    "app.tasks.ai_insights.*": {"queue": "ai-insights"}
-}
-
-# Configure periodic tasks
-celery_app.conf.beat_schedule = {
-    "check-google-drive": {
-        "task": "app.tasks.drive_sync.check_drive_for_new_files",
-        "schedule": crontab(minute=f"*/{settings.GOOGLE_DRIVE_CHECK_INTERVAL_MINUTES}")
-    }
-}
+async def _ingest(file_name: str, file_hash: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async with task_database.SessionLocal() as db:
+        return await ingest_records(db, file_name, file_hash, records)
 
 @celery_app.task(name="app.tasks.drive_sync.check_drive_for_new_files")
 def check_drive_for_new_files():
     """
     Celery task to check Google Drive for new files
     """
-    from app.db.session import get_db
-    from app.models.upload import Upload
-    
-    # Get list of already processed files
-    processed_files = []
-    # In a real implementation, we would query the database for processed files
+    # Files already ingested, by content hash
+    processed = set(asyncio.run(_processed_hashes()))
     
     # Initialize Drive service
     drive_service = DriveService()
     
     # Check for new files
-    new_files = drive_service.check_for_new_files(processed_files)
+    new_files = [
+        file for file in drive_service.check_for_new_files([])
+        if file.get('md5Checksum') not in processed
+    ]
     
     # Process each new file
     for file in new_files:
@@ -83,15 +70,11 @@ def process_drive_file(file_id: str, file_name: str, file_hash: str):
         # Deduplicate records
         unique_records = XLSXParser.deduplicate_records(records)
         
-        # In a real implementation, we would:
-        # 1. Create an Upload record in the database
-        # 2. Process each record and create Message records
-        # 3. Update Fan, Chatter, and Creator records as needed
-        # 4. Mark the Upload as processed
+        # Store the records as messages, updating rollups, search and alerts
+        result = asyncio.run(_ingest(file_name, calculated_hash, unique_records))
         
         return {
-            "status": "success", 
-            "file_name": file_name, 
+            **result,
             "records_count": len(unique_records)
         }
     
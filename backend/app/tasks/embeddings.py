@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from celery_worker import celery_app
+from app.core import config
+from app.db.base import task_database
+from app.models.ai_insight import AIInsight
+from app.models.message import Message
+from app.services.semantic_search import INSIGHTS, MESSAGES, get_semantic_index, insight_entry
+
+REBUILD_CHUNK_SIZE = 5000
+
+async def _rows_after(db, namespace: str, last_id: int) -> AsyncIterator[List[Tuple[int, str]]]:
+    """(id, text) entries of every row with an id above ``last_id``, a chunk at a time"""
+    model = AIInsight if namespace == INSIGHTS else Message
+    # Keyset pagination keeps each chunk query cheap on large tables
+    while True:
+        result = await db.execute(
+            select(model).where(model.id > last_id).order_by(model.id).limit(REBUILD_CHUNK_SIZE)
+        )
+        rows = result.scalars().all()
+        if not rows:
+            return
+        if namespace == INSIGHTS:
+            yield [insight_entry(row) for row in rows]
+        else:
+            yield [(row.id, row.content) for row in rows]
+        last_id = rows[-1].id
+        db.expunge_all()
+
+async def _rebuild_index(namespace: str) -> Dict[str, Any]:
+    semantic_index = get_semantic_index()
+    # Built from scratch in a new directory, so rows deleted since the last
+    # build drop out and a new EMBEDDING_MODEL may change the dimension
+    staged = semantic_index.stage(namespace)
+    indexed = 0
+    last_id = 0
+
+    async with task_database.SessionLocal() as db:
+        async for entries in _rows_after(db, namespace, last_id):
+            await semantic_index.index_staged(staged, entries)
+            indexed += len(entries)
+            last_id = entries[-1][0]
+
+        # Search switches to the new index in one step; train first so it starts with IVF lists
+        await semantic_index.publish(namespace, staged, train=indexed >= config.EMBEDDING_IVF_MIN_VECTORS)
+
+        # Rows inserted while the rebuild ran were written to the old index
+        async for entries in _rows_after(db, namespace, last_id):
+            await semantic_index.index(namespace, entries)
+            indexed += len(entries)
+
+    return {"status": "success", "namespace": namespace, "indexed": indexed, "trained": indexed >= config.EMBEDDING_IVF_MIN_VECTORS}
+
+async def _index_entries(namespace: str, ids: List[int]) -> Dict[str, Any]:
+    model = AIInsight if namespace == INSIGHTS else Message
+    async with task_database.SessionLocal() as db:
+        result = await db.execute(select(model).where(model.id.in_(ids)))
+        rows = result.scalars().all()
+    if namespace == INSIGHTS:
+        entries = [insight_entry(row) for row in rows]
+    else:
+        entries = [(row.id, row.content) for row in rows]
+    await get_semantic_index().index(namespace, entries)
+    return {"status": "success", "namespace": namespace, "indexed": len(entries)}
+
+@celery_app.task(name="app.tasks.embeddings.rebuild_index")
+def rebuild_index(namespace: str):
+    """
+    Celery task to (re)embed every insight or message
+
+    Builds a fresh index next to the current one and swaps it in when done,
+    so search is never interrupted. Used to backfill rows written before the
+    index existed, drop vectors of deleted rows, or after switching
+    EMBEDDING_MODEL.
+    """
+    if namespace not in (INSIGHTS, MESSAGES):
+        return {"status": "error", "message": f"Unknown namespace: {namespace}"}
+    return asyncio.run(_rebuild_index(namespace))
+
+@celery_app.task(name="app.tasks.embeddings.index_entries")
+def index_entries(namespace: str, ids: List[int]):
+    """
+    Celery task to embed rows written on another host
+
+    Runs on the embeddings queue, next to the index that search reads.
+    """
+    if namespace not in (INSIGHTS, MESSAGES):
+        return {"status": "error", "message": f"Unknown namespace: {namespace}"}
+    return asyncio.run(_index_entries(namespace, ids))
+
+@celery_app.task(name="app.tasks.embeddings.remove_entries")
+def remove_entries(namespace: str, ids: List[int]):
+    """Celery task to drop rows deleted on another host from the index"""
+    if namespace not in (INSIGHTS, MESSAGES):
+        return {"status": "error", "message": f"Unknown namespace: {namespace}"}
+    asyncio.run(get_semantic_index().remove(namespace, ids))
+    return {"status": "success", "namespace": namespace, "removed": len(ids)}
+
+@celery_app.task(name="app.tasks.embeddings.train_index")
+def train_index(namespace: Optional[str] = None):
+    """
+    Celery task to train IVF lists for indexes that have outgrown them
+
+    Scheduled by Celery Beat; a no-op until an index reaches
+    EMBEDDING_IVF_MIN_VECTORS or doubles since its last training.
+    """
+    if namespace is not None and namespace not in (INSIGHTS, MESSAGES):
+        return {"status": "error", "message": f"Unknown namespace: {namespace}"}
+    semantic_index = get_semantic_index()
+    namespaces = [namespace] if namespace else [INSIGHTS, MESSAGES]
+    trained = [name for name in namespaces if asyncio.run(semantic_index.train(name))]
+    return {"status": "success", "trained": trained}
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from celery_worker import celery_app
+from app.core import config
+from app.db.base import task_database
+from app.repositories import notification as notification_repo
+
+# Rows per transaction, keeping each lock on the hot table short
+RETENTION_CHUNK_SIZE = 5000
+
+async def _retain_notifications() -> Dict[str, Any]:
+    moved = pruned = 0
+    dropped = []
+    now = datetime.now(timezone.utc)
+    async with task_database.SessionLocal() as db:
+        # Each batch commits on its own so the job never holds long locks
+        if config.NOTIFICATION_ARCHIVE_AFTER_DAYS > 0:
+            archived_before = now - timedelta(days=config.NOTIFICATION_ARCHIVE_AFTER_DAYS)
+            while True:
+                count = await notification_repo.move_archived_notifications(db, archived_before, RETENTION_CHUNK_SIZE)
+                moved += count
+                if count < RETENTION_CHUNK_SIZE:
+                    break
+
+        if config.NOTIFICATION_ARCHIVE_RETENTION_DAYS > 0:
+            created_before = now - timedelta(days=config.NOTIFICATION_ARCHIVE_RETENTION_DAYS)
+            # Whole expired months go at once on PostgreSQL; the rest is deleted in batches
+            dropped = await notification_repo.drop_archive_partitions(db, created_before)
+            while True:
+                count = await notification_repo.prune_notification_archive(db, created_before, RETENTION_CHUNK_SIZE)
+                pruned += count
+                if count < RETENTION_CHUNK_SIZE:
+                    break
+
+    return {"status": "success", "moved": moved, "pruned": pruned, "dropped_partitions": dropped}
+
+@celery_app.task(name="app.tasks.notifications.retain_notifications")
+def retain_notifications():
+    """
+    Celery task to keep the notifications table small
+
+    Moves notifications archived more than NOTIFICATION_ARCHIVE_AFTER_DAYS ago
+    to notifications_archive, then removes archive rows older than
+    NOTIFICATION_ARCHIVE_RETENTION_DAYS.
+    """
+    return asyncio.run(_retain_notifications())
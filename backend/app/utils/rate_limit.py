@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.core import config
+
+# Refill and take from a bucket atomically, on the Redis clock so workers on
+# different hosts agree; returns the seconds to wait, "0" once taken. The
+# result is a string because Redis truncates Lua numbers to integers.
+_ACQUIRE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+class TokenBucket:
+    """
+    Async token bucket
+
+    Holds up to ``capacity`` tokens and refills continuously at
+    ``refill_per_second``. Waiters are served in arrival order.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+
+    def _loop_lock(self) -> asyncio.Lock:
+        # The bucket outlives event loops (each Celery task runs its own), but a lock cannot
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        # A single request larger than the bucket can still go through once it is full
+        amount = min(amount, self.capacity)
+        async with self._loop_lock():
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.refill_per_second)
+
+class RedisTokenBucket:
+    """
+    Token bucket kept in Redis, so every process drawing from ``key`` shares one budget
+
+    The client is created per event loop, as Celery tasks each run in a new one.
+    """
+
+    def __init__(self, redis_url: str, key: str, capacity: float, refill_per_second: float):
+        self.redis_url = redis_url
+        self.key = key
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._client = None
+        self._client_loop = None
+        self._script = None
+
+    def _acquire_script(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            import redis.asyncio as aioredis
+            self._client = aioredis.from_url(self.redis_url)
+            self._client_loop = loop
+            self._script = self._client.register_script(_ACQUIRE_SCRIPT)
+        return self._script
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        while True:
+            wait = float(await self._acquire_script()(keys=[self.key], args=[self.capacity, self.refill_per_second, amount]))
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for one API key
+
+    In memory the limits apply per process, so divide the provider quota
+    across workers; with ``redis_url`` every process shares the same budget.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, redis_url: Optional[str] = None, key: str = "ai:ratelimit"):
+        if redis_url:
+            self.requests = RedisTokenBucket(redis_url, f"{key}:requests", requests_per_minute, requests_per_minute / 60.0)
+            self.tokens = RedisTokenBucket(redis_url, f"{key}:tokens", tokens_per_minute, tokens_per_minute / 60.0)
+        else:
+            self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+            self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+_rate_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Process-wide limiter for the configured provider, created on first use
+
+    Every AIService in the process draws from it, so tasks building their own
+    service do not each start with a full budget.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            config.AI_REQUESTS_PER_MINUTE,
+            config.AI_TOKENS_PER_MINUTE,
+            redis_url=config.REDIS_URL if config.AI_RATE_LIMIT_BACKEND == "redis" else None
+        )
+    return _rate_limiter
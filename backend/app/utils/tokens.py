@@ -0,0 +1,42 @@
+import math
+import re
+from functools import lru_cache
+
+# Simplified form of the cl100k pre-tokenizer: contractions, words with their
+# leading space, 1-3 digit groups, symbol runs and whitespace
+_PIECE = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]+|\s+(?!\S)|\s+")
+
+# Pieces are mostly words that repeat across messages, so their costs are memoized
+@lru_cache(maxsize=65536)
+def _piece_tokens(piece: str) -> int:
+    body = piece.strip()
+    if not body:
+        return 1
+    if body.isascii() and body.isalpha():
+        # Common words are a single token; longer ones split roughly every 4 characters
+        return 1 if len(body) <= 6 else 1 + math.ceil((len(body) - 6) / 4)
+    if body.isascii():
+        return math.ceil(len(body) / 2)
+    # Emoji and non-Latin text usually cost a token or more per character
+    return len(body)
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the token count of ``text`` without loading a BPE vocabulary
+
+    Errs on the high side of a cl100k tokenizer for English chat text, so a
+    budget computed with it is not exceeded by the real tokenizer.
+    """
+    return sum(_piece_tokens(piece) for piece in _PIECE.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` at a piece boundary so it fits ``max_tokens``"""
+    used = 0
+    end = 0
+    for match in _PIECE.finditer(text):
+        cost = _piece_tokens(match.group())
+        if used + cost > max_tokens:
+            return text[:end].rstrip() + "..."
+        used += cost
+        end = match.end()
+    return text
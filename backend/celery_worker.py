@@ -1,18 +1,55 @@
 from celery import Celery
-from app.core.config import settings
+from celery.schedules import crontab
+from app.core import config
 
 celery_app = Celery(
     "worker",
-    broker=settings.CELERY_BROKER_URL,
-    backend=settings.CELERY_RESULT_BACKEND
+    broker=config.CELERY_BROKER_URL,
+    backend=config.CELERY_RESULT_BACKEND
 )
 
 celery_app.conf.task_routes = {
     "app.tasks.drive_sync.*": {"queue": "drive-sync"},
-    "app.tasks.ai_insights.*": {"queue": "ai-insights"}
+    "app.tasks.ai_insights.*": {"queue": "ai-insights"},
+    # Index writes and training run next to the index, on the host that serves search
+    "app.tasks.embeddings.*": {"queue": "embeddings"},
+    "app.tasks.notifications.*": {"queue": "notifications"}
+}
+
+# Emulate message priorities on the Redis broker so interactive insight
+# requests are picked up ahead of queued batch work
+celery_app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "queue_order_strategy": "priority"
+}
+
+# LLM calls are long-running; reserve one message at a time so priorities
+# take effect and work is spread evenly across ai-insights workers.
+# Concurrency is set per worker: celery -A celery_worker.celery_app worker -Q ai-insights -c 4
+celery_app.conf.worker_prefetch_multiplier = 1
+
+celery_app.conf.beat_schedule = {
+    "check-google-drive": {
+        "task": "app.tasks.drive_sync.check_drive_for_new_files",
+        "schedule": crontab(minute=f"*/{config.GOOGLE_DRIVE_CHECK_INTERVAL_MINUTES}")
+    },
+    "compact-insights": {
+        "task": "app.tasks.ai_insights.compact_insights",
+        "schedule": crontab(hour=3, minute=0)
+    },
+    "train-semantic-index": {
+        "task": "app.tasks.embeddings.train_index",
+        "schedule": crontab(minute="*/15")
+    },
+    "retain-notifications": {
+        "task": "app.tasks.notifications.retain_notifications",
+        "schedule": crontab(hour=3, minute=30)
+    }
 }
 
 celery_app.conf.imports = [
     "app.tasks.drive_sync",
-    "app.tasks.ai_insights"
+    "app.tasks.ai_insights",
+    "app.tasks.embeddings",
+    "app.tasks.notifications"
 ]
@@ -1,11 +1,12 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.router import api_router
-from app.core.config import settings
-from app.db.base import Base, engine
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from app.api.endpoints import insights
+from app.core import config
+from app.db.base import create_tables
+from app.services.experiment_events import run_event_flusher
 
 app = FastAPI(
     title="Fandom Intelligence Suite API",
@@ -16,7 +17,7 @@ app = FastAPI(
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
+    allow_origins=config.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -25,6 +26,24 @@ app.add_middleware(
 # Include API router
 app.include_router(api_router, prefix="/api")
 
+@app.on_event("startup")
+async def on_startup():
+    # Create database tables
+    await create_tables()
+    # Buffered A/B test events are written to the database in the background
+    app.state.event_flusher = asyncio.create_task(run_event_flusher(config.EXPERIMENT_EVENT_FLUSH_SECONDS))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Cancelling the flusher writes out whatever is still buffered
+    app.state.event_flusher.cancel()
+    try:
+        await app.state.event_flusher
+    except asyncio.CancelledError:
+        pass
+    # Release the streaming endpoint's LLM client and insight cache
+    await insights.ai_service.aclose()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Fandom Intelligence Suite API"}
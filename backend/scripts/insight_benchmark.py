@@ -0,0 +1,60 @@
+"""
+Offline insight generation throughput benchmark.
+
+Runs AIService.generate_insights_batch against the deterministic mock
+provider, so prompt construction, history compaction and response parsing
+are measured without a model or network. ``--latency`` simulates model
+time per request to compare batch sizes.
+
+Usage:
+    python scripts/insight_benchmark.py --targets 2000 --history 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_service import AIService
+from app.services.llm_providers import MockProvider
+
+def _targets(count: int, history: int):
+    messages = [
+        {"sent_time": f"2024-01-{day % 28 + 1:02d}", "message_type": "ppv" if day % 5 == 0 else "text",
+         "content": "hey, new set just dropped " * 4, "price": 20.0 if day % 5 == 0 else 0.0,
+         "purchased": day % 10 == 0}
+        for day in range(history)
+    ]
+    return [
+        {
+            "target_type": "fan",
+            "target_id": i,
+            "target_data": {"name": f"Fan {i}", "total_spent": i * 3, "message_count": history, "message_history": messages}
+        }
+        for i in range(count)
+    ]
+
+async def main(args: argparse.Namespace):
+    targets = _targets(args.targets, args.history)
+    service = AIService(
+        provider=MockProvider(structured_output=args.json, latency=args.latency),
+        cache=None,
+        structured_output=args.json
+    )
+
+    started = time.perf_counter()
+    results = await service.generate_insights_batch(targets)
+    elapsed = time.perf_counter() - started
+
+    errors = sum(1 for result in results if result["error"] is not None)
+    print(f"{len(results)} insights in {elapsed:.2f}s: {len(results) / elapsed:.1f} insights/s, {errors} errors")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure insight generation throughput with the mock provider")
+    parser.add_argument("--targets", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=50, help="Messages of history per target")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per model request")
+    parser.add_argument("--json", action="store_true", help="Use structured (JSON) output")
+    asyncio.run(main(parser.parse_args()))
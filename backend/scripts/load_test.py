@@ -0,0 +1,54 @@
+"""
+Concurrency load test for a single API worker.
+
+Fires batches of authenticated requests at increasing concurrency levels and
+reports throughput, so it is easy to see whether requests overlap on the
+event loop or serialize behind blocking calls.
+
+Usage:
+    uvicorn main:app --workers 1 --port 8000
+    python scripts/load_test.py --token <jwt> --path /api/insights/
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+async def _run_level(client: httpx.AsyncClient, path: str, concurrency: int, requests_per_worker: int) -> List[float]:
+    latencies: List[float] = []
+
+    async def worker():
+        for _ in range(requests_per_worker):
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+async def main(args: argparse.Namespace):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=30.0) as client:
+        print(f"{'concurrency':>12} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+        for concurrency in args.levels:
+            started = time.perf_counter()
+            latencies = await _run_level(client, args.path, concurrency, args.requests)
+            elapsed = time.perf_counter() - started
+
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000
+            p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+            print(f"{concurrency:>12} {len(latencies) / elapsed:>10.1f} {p50:>10.1f} {p95:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure request throughput at increasing concurrency")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/insights/")
+    parser.add_argument("--token", default="")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per concurrent client")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+# Every model module, so create_all builds the whole schema and relationships resolve
+from app.models import ai_insight, chatter, creator, experiment, fan, message, message_rollup, notification, upload, user  # noqa: F401
+
+class SeededDatabase:
+    """
+    Runs an async scenario against a fresh in-memory SQLite database
+
+    ``run_db(scenario, rows)`` creates every table, commits ``rows`` and
+    returns ``await scenario(db)``. SQL executed by the scenario (not the
+    seeding) is collected in ``statements``, so tests can assert on the
+    number and shape of queries.
+    """
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __call__(self, scenario: Callable[[AsyncSession], Awaitable[Any]], rows: Iterable[Any] = ()) -> Any:
+        async def run():
+            engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+            event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+            SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                async with SessionLocal() as db:
+                    db.add_all(list(rows))
+                    await db.commit()
+                    self.statements.clear()
+                    return await scenario(db)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(run())
+
+@pytest.fixture
+def run_db() -> SeededDatabase:
+    return SeededDatabase()
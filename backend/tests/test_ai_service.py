@@ -0,0 +1,347 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core import config
+from app.services.ai_service import AIService
+from app.services.insight_cache import DiskInsightCache
+from app.services.insight_parser import InsightStreamParser
+from app.services.llm_providers import LLMProvider, MockProvider, OpenAICompatibleProvider
+from app.services.prompt_compaction import compact_message_history
+from app.utils import rate_limit
+from app.utils.rate_limit import RateLimiter, TokenBucket
+from app.utils.tokens import count_tokens
+
+COMPLETION_TEXT = """SUMMARY: Loyal weekend spender
+DETAILS: Buys most PPV drops within a day.
+TAGS: loyal, weekend-active
+CONFIDENCE: 0.8
+ACTION ITEMS:
+- Send a Friday preview
+- Offer a bundle discount
+"""
+
+class StubCompletionServer:
+    """Local OpenAI-compatible /chat/completions and batched /completions endpoint"""
+
+    def __init__(self, fail_first: int = 0, delay: float = 0.02):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                with stub._lock:
+                    stub.requests += 1
+                    attempt = stub.requests
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.in_flight -= 1
+
+                if attempt <= stub.fail_first:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+
+                if payload.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for start in range(0, len(COMPLETION_TEXT), 7):
+                        chunk = {"choices": [{"delta": {"content": COMPLETION_TEXT[start:start + 7]}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+
+                if "prompt" in payload:
+                    stub.batch_sizes.append(len(payload["prompt"]))
+                    # Answer out of order; clients must match choices by index
+                    choices = [{"index": i, "text": COMPLETION_TEXT} for i in reversed(range(len(payload["prompt"])))]
+                else:
+                    choices = [{"message": {"content": COMPLETION_TEXT}}]
+                body = json.dumps({"choices": choices}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def _service(base_url: str, max_concurrency: int = 4, cache=None) -> AIService:
+    service = AIService(
+        api_key="sk-test",
+        base_url=base_url,
+        max_concurrency=max_concurrency,
+        rate_limiter=RateLimiter(requests_per_minute=60000, tokens_per_minute=10_000_000),
+        cache=cache
+    )
+    service.provider.retry_base_delay = 0.01
+    return service
+
+def _targets(count: int):
+    return [
+        {"target_type": "fan", "target_id": i, "target_data": {"name": f"Fan {i}", "total_spent": i}}
+        for i in range(count)
+    ]
+
+def test_batch_generation_bounds_concurrency():
+    async def scenario(base_url):
+        service = _service(base_url, max_concurrency=4)
+        try:
+            return await service.generate_insights_batch(_targets(20))
+        finally:
+            await service.aclose()
+
+    with StubCompletionServer() as stub:
+        results = asyncio.run(scenario(stub.base_url))
+
+    assert [result["target_id"] for result in results] == list(range(20))
+    assert all(result["error"] is None for result in results)
+    assert results[0]["insight"]["summary"] == "Loyal weekend spender"
+    assert stub.max_in_flight <= 4
+
+def test_batch_generation_retries_rate_limited_requests():
+    async def scenario(base_url):
+        service = _service(base_url)
+        try:
+            return await service.generate_insights_batch(_targets(2))
+        finally:
+            await service.aclose()
+
+    with StubCompletionServer(fail_first=3) as stub:
+        results = asyncio.run(scenario(stub.base_url))
+        assert stub.requests == 5
+
+    assert all(result["error"] is None for result in results)
+
+def test_batch_generation_reports_exhausted_retries():
+    async def scenario(base_url):
+        service = _service(base_url)
+        service.provider.max_retries = 1
+        try:
+            return await service.generate_insights_batch(_targets(1))
+        finally:
+            await service.aclose()
+
+    with StubCompletionServer(fail_first=10) as stub:
+        results = asyncio.run(scenario(stub.base_url))
+
+    assert results[0]["insight"] is None
+    assert "429" in results[0]["error"]
+
+def test_batch_generation_groups_prompts_per_request():
+    async def scenario(base_url):
+        provider = OpenAICompatibleProvider(
+            api_key="",
+            base_url=base_url,
+            max_concurrency=2,
+            rate_limiter=RateLimiter(requests_per_minute=60000, tokens_per_minute=10_000_000),
+            batch_size=8
+        )
+        service = AIService(provider=provider, cache=None)
+        try:
+            return await service.generate_insights_batch(_targets(20))
+        finally:
+            await service.aclose()
+
+    with StubCompletionServer() as stub:
+        results = asyncio.run(scenario(stub.base_url))
+        assert sorted(stub.batch_sizes) == [4, 8, 8]
+
+    assert [result["target_id"] for result in results] == list(range(20))
+    assert all(result["insight"]["summary"] == "Loyal weekend spender" for result in results)
+
+def test_mock_provider_is_deterministic_and_runs_the_parser():
+    async def scenario(structured_output):
+        service = AIService(provider=MockProvider(structured_output=structured_output), cache=None,
+                            structured_output=structured_output)
+        first = await service.generate_insights_batch(_targets(50))
+        second = await service.generate_insights_batch(_targets(50))
+        streamed = [event async for event in service.stream_insight("fan", {"name": "Fan 3", "total_spent": 3})]
+        return first, second, streamed[-1][1]
+
+    for structured_output in (False, True):
+        first, second, streamed = asyncio.run(scenario(structured_output))
+        assert first == second
+        assert all(result["error"] is None for result in first)
+        assert first[0]["insight"]["summary"] == "High-value fan with consistent spending patterns"
+        assert 0.7 <= first[0]["insight"]["confidence_score"] <= 0.95
+        assert len({tuple(result["insight"]["tags"]) for result in first}) > 1
+        assert streamed == first[3]["insight"]
+
+def test_token_bucket_throttles_to_refill_rate():
+    async def scenario():
+        bucket = TokenBucket(capacity=2, refill_per_second=20)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire(1)
+        return time.monotonic() - started
+
+    # Two tokens are available immediately, the other two take 50 ms each
+    assert asyncio.run(scenario()) == pytest.approx(0.1, abs=0.05)
+
+def test_services_share_one_rate_budget_across_task_loops(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_rate_limiter", None)
+    monkeypatch.setattr(config, "AI_REQUESTS_PER_MINUTE", 2)
+    first = OpenAICompatibleProvider(api_key="test")
+    second = OpenAICompatibleProvider(api_key="test")
+    assert first.rate_limiter is second.rate_limiter
+
+    # Two tasks, each in its own event loop as Celery runs them, draw from the same buckets
+    asyncio.run(first.rate_limiter.acquire(1))
+    asyncio.run(second.rate_limiter.acquire(1))
+    assert first.rate_limiter.requests._tokens < 1
+
+def test_unchanged_target_is_served_from_cache(tmp_path):
+    cache = DiskInsightCache(str(tmp_path / "insights.db"), ttl_seconds=60, max_entries=10)
+
+    async def scenario(base_url):
+        service = _service(base_url, cache=cache)
+        try:
+            first = await service.generate_insight("fan", {"name": "Fan 1", "total_spent": 10, "analyzed_at": "t1"})
+            second = await service.generate_insight("fan", {"name": "Fan 1", "total_spent": 10, "analyzed_at": "t2"})
+            changed = await service.generate_insight("fan", {"name": "Fan 1", "total_spent": 25, "analyzed_at": "t3"})
+            return first, second, changed
+        finally:
+            await service.aclose()
+
+    with StubCompletionServer() as stub:
+        first, second, changed = asyncio.run(scenario(stub.base_url))
+        assert stub.requests == 2
+
+    assert second["summary"] == first["summary"]
+    assert second["metadata"]["cached"] is True
+    assert second["metadata"]["analyzed_at"] == "t2"
+    assert "cached" not in changed["metadata"]
+
+def test_default_cache_opens_on_first_use_and_closes_with_the_service(tmp_path, monkeypatch):
+    path = tmp_path / "insights.db"
+    monkeypatch.setattr(config, "AI_CACHE_BACKEND", "disk")
+    monkeypatch.setattr(config, "AI_CACHE_PATH", str(path))
+
+    async def scenario(base_url):
+        service = _service(base_url, cache="default")
+        assert not path.exists()
+        try:
+            await service.generate_insight("fan", {"name": "Fan 1"})
+            cache = service.cache
+            assert path.exists() and cache._conn is not None
+        finally:
+            await service.aclose()
+        return cache
+
+    with StubCompletionServer() as stub:
+        cache = asyncio.run(scenario(stub.base_url))
+    assert cache._conn is None
+
+def test_stream_parser_reports_partial_summary():
+    parser = InsightStreamParser()
+    assert parser.feed("SUMMARY: Loyal wee") == [("summary", "Loyal wee")]
+    assert parser.feed("kend spender\nDETAILS: Buys") == [
+        ("summary", "Loyal weekend spender"),
+        ("details", "Buys")
+    ]
+    parser.feed(" PPV\nTAGS: loyal, vip\nCONFIDENCE: 0.9\nACTION ITEMS:\n- Send preview")
+    assert parser.close() == [("action_items", ["Send preview"])]
+    assert parser.result["tags"] == ["loyal", "vip"]
+    assert parser.result["confidence_score"] == 0.9
+
+def test_stream_insight_emits_sections_before_completion():
+    async def scenario(base_url):
+        service = _service(base_url)
+        try:
+            return [event async for event in service.stream_insight("fan", {"name": "Fan 1"})]
+        finally:
+            await service.aclose()
+
+    with StubCompletionServer() as stub:
+        events = asyncio.run(scenario(stub.base_url))
+
+    kinds = [kind for kind, _ in events]
+    sections = [(i, data["section"]) for i, (kind, data) in enumerate(events) if kind == "section"]
+    # The summary is reported from the first chunks, long before the stream ends
+    assert sections[0][1] == "summary" and sections[0][0] <= 3
+    assert kinds[-1] == "insight"
+    assert events[-1][1]["summary"] == "Loyal weekend spender"
+    assert events[-1][1]["action_items"] == ["Send a Friday preview", "Offer a bundle discount"]
+    assert "".join(data for kind, data in events if kind == "token") == COMPLETION_TEXT
+
+def test_whale_history_is_compacted_to_budget():
+    history = [
+        {"sent_time": f"2024-01-{day % 28 + 1:02d}", "message_type": "text", "content": "hey babe " * 40,
+         "price": 0.0, "purchased": False}
+        for day in range(60)
+    ]
+    history[10] = {"sent_time": "2024-01-11", "message_type": "ppv", "content": "bundle", "price": 250.0, "purchased": True}
+    aggregates = {"message_count": 4000, "ppv_offered": 300, "revenue_total": 9000.0}
+
+    lines = compact_message_history(history, aggregates, budget_tokens=400, message_tokens=20)
+
+    assert count_tokens("\n".join(lines)) <= 400
+    # The big purchase survives even though it is far from the newest messages
+    assert any("$250.0 purchased: bundle" in line for line in lines)
+    assert lines[1].startswith("(")
+    assert "$8750.00 purchased" in lines[1]
+    assert lines[-1].startswith(f"- [{history[-1]['sent_time']}]")
+
+def test_prompt_size_does_not_grow_with_history():
+    service = AIService(api_key="", cache=None)
+
+    def prompt_tokens(count):
+        history = [
+            {"sent_time": "2024-01-01", "message_type": "text", "content": "message text " * 20,
+             "price": 0.0, "purchased": False}
+            for _ in range(count)
+        ]
+        return count_tokens(service._construct_prompt("fan", {"name": "Whale", "message_count": count, "message_history": history}))
+
+    # Only the digits of the omitted-message summary differ
+    assert abs(prompt_tokens(500) - prompt_tokens(50)) <= 5
+    assert prompt_tokens(500) - prompt_tokens(0) <= config.AI_PROMPT_HISTORY_TOKENS
+
+def test_providers_must_implement_complete():
+    class Incomplete(LLMProvider):
+        pass
+
+    class Echo(LLMProvider):
+        async def complete(self, system_prompt, prompt):
+            return prompt.upper()
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+    async def scenario():
+        provider = Echo()
+        chunks = [chunk async for chunk in provider.stream("", "hi")]
+        return chunks, await provider.complete_batch("", ["a", "b"])
+
+    # Streaming and batching fall back to complete
+    assert asyncio.run(scenario()) == (["HI"], ["A", "B"])
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.message import Message, MessageType
+from app.schemas.experiment import BacktestRequest
+from app.services.backtest import run_backtest
+
+START = datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+def _messages():
+    messages = []
+    for day in range(28):
+        for hour, price, purchased in ((9, 5.0, day % 2 == 0), (20, 5.0, day % 4 == 0), (21, 25.0, day % 7 == 0)):
+            messages.append(Message(
+                fan_id=1, chatter_id=1, creator_id=1 + day % 2,
+                sent_time=START + timedelta(days=day, hours=hour),
+                message_type=MessageType.PPV, price=price, purchased=purchased
+            ))
+        messages.append(Message(fan_id=1, chatter_id=1, creator_id=1, sent_time=START + timedelta(days=day, hours=12)))
+    return messages
+
+REQUEST = {
+    "start": START.isoformat(),
+    "end": (START + timedelta(days=28)).isoformat(),
+    "variants": [
+        {"key": "cheap_ppv", "message_types": ["ppv"], "max_price": 10},
+        {"key": "premium_ppv", "message_types": ["ppv"], "min_price": 10.01},
+        {"key": "evening_ppv", "message_types": ["ppv"], "send_hours": [18, 19, 20, 21, 22, 23]}
+    ]
+}
+
+def _backtest(run_db, request, chunks):
+    async def scenario(db):
+        return [item async for item in run_backtest(db, BacktestRequest.parse_obj(request), chunks)]
+
+    events = run_db(scenario, _messages())
+    return events, list(run_db.statements)
+
+def test_backtest_totals_every_variant_in_one_query(run_db):
+    events, statements = _backtest(run_db, REQUEST, chunks=1)
+    assert [name for name, _ in events] == ["progress", "result"]
+    assert len(statements) == 1
+    result = events[-1][1]
+    cheap, premium, evening = result["variants"]
+    assert (cheap["impressions"], cheap["conversions"], cheap["revenue"]) == (56, 21, 105.0)
+    assert (premium["impressions"], premium["conversions"], premium["revenue"]) == (28, 4, 100.0)
+    # Overlapping predicates count a message towards every variant it matches
+    assert (evening["impressions"], evening["conversions"]) == (56, 11)
+    assert cheap["is_control"] and premium["revenue_lift"] is not None
+
+def test_streamed_progress_adds_up_to_the_single_pass(run_db):
+    single, _ = _backtest(run_db, REQUEST, chunks=1)
+    chunked, statements = _backtest(run_db, REQUEST, chunks=4)
+    progress = [data for name, data in chunked if name == "progress"]
+    assert [step["fraction"] for step in progress] == [0.25, 0.5, 0.75, 1.0]
+    assert len(statements) == 4
+    assert chunked[-1][1]["variants"] == single[-1][1]["variants"]
+
+def test_creator_filter(run_db):
+    events, _ = _backtest(run_db, {**REQUEST, "creator_id": 2}, chunks=1)
+    assert events[-1][1]["variants"][0]["impressions"] == 28
@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.services.experiment_assignment import NOT_ENROLLED, assign_variant_keys, assign_variants
+
+FANS = np.arange(1, 100001)
+
+def test_assignment_is_deterministic_and_independent_per_experiment():
+    first = assign_variants("exp-1", FANS, [1, 1])
+    assert np.array_equal(first, assign_variants("exp-1", FANS, [1, 1]))
+    # Every fan's variant comes from the hash alone, not from the batch it arrived in
+    assert np.array_equal(first[:10], assign_variants("exp-1", FANS[:10][::-1], [1, 1])[::-1])
+    other = assign_variants("exp-2", FANS, [1, 1])
+    assert 0.45 < np.mean(first == other) < 0.55
+
+def test_weights_and_traffic_split_fans():
+    variants = assign_variants("exp-1", FANS, [1, 3, 0], traffic_allocation=0.5)
+    counts = np.bincount(variants[variants != NOT_ENROLLED], minlength=3) / FANS.size
+    assert abs(np.mean(variants == NOT_ENROLLED) - 0.5) < 0.01
+    assert abs(counts[0] - 0.125) < 0.01 and abs(counts[1] - 0.375) < 0.01 and counts[2] == 0
+
+def test_raising_traffic_only_adds_fans():
+    small = assign_variants("exp-1", FANS, [1, 1], traffic_allocation=0.2)
+    large = assign_variants("exp-1", FANS, [1, 1], traffic_allocation=0.6)
+    enrolled = small != NOT_ENROLLED
+    assert np.array_equal(small[enrolled], large[enrolled])
+    assert np.sum(large != NOT_ENROLLED) > np.sum(enrolled)
+
+def test_snapshot_keys():
+    experiment = {
+        "id": "exp-1",
+        "traffic_allocation": 1.0,
+        "variants": [{"key": "variant_a", "weight": 1.0}, {"key": "variant_b", "weight": 0.0}]
+    }
+    assert assign_variant_keys(experiment, [1, 2, 3]) == ["variant_a"] * 3
@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.services.experiment_stats import ResultsCache, analyze, experiment_results, normal_cdf
+
+def _experiment(experiment_id, *counts):
+    return {
+        "id": experiment_id,
+        "variants": [
+            {"key": f"variant_{chr(ord('a') + i)}", "impressions": n, "conversions": x, "revenue": r}
+            for i, (n, x, r) in enumerate(counts)
+        ]
+    }
+
+def test_normal_cdf_matches_erf():
+    x = np.linspace(-5, 5, 101)
+    expected = [0.5 * (1 + math.erf(v / math.sqrt(2))) for v in x]
+    assert np.allclose(normal_cdf(x), expected, atol=1e-6)
+
+def test_lifts_intervals_and_probability_against_control():
+    results = experiment_results([_experiment("e", (1000, 100, 1000.0), (1000, 130, 1950.0))])["e"]
+    control, variant = results["variants"]
+    assert control["is_control"] and "conversion_lift" not in control
+    assert variant["conversion_lift"] == pytest.approx(0.3)
+    se = math.sqrt(0.1 * 0.9 / 1000 + 0.13 * 0.87 / 1000)
+    assert variant["conversion_lift_ci"] == pytest.approx([(0.03 - 1.959964 * se) / 0.1, (0.03 + 1.959964 * se) / 0.1])
+    assert variant["revenue_lift"] == pytest.approx(0.95)
+    assert 0.97 < variant["probability_to_beat_control"] < 0.99
+
+def test_sequential_test_needs_more_evidence_than_a_fixed_test():
+    # z is about 2.1: enough for a one-look test, not for one that may be checked any time
+    early = experiment_results([_experiment("e", (1000, 100, 0.0), (1000, 130, 0.0))])["e"]
+    late = experiment_results([_experiment("e", (20000, 2000, 0.0), (20000, 2300, 0.0))])["e"]
+    assert early["variants"][1]["sequential"]["z"] > 1.96
+    assert not early["variants"][1]["sequential"]["significant"] and early["winner"] is None
+    assert late["variants"][1]["sequential"]["significant"] and late["winner"] == "variant_b"
+    sequential = late["variants"][1]["sequential"]
+    assert sequential["z"] > sequential["boundary"]
+
+def test_missing_data_is_reported_as_none():
+    variant = experiment_results([_experiment("e", (0, 0, 0.0), (50, 5, 10.0))])["e"]["variants"][1]
+    assert variant["conversion_lift"] is None and variant["sequential"]["p_value"] is None
+
+def test_batch_matches_experiments_analysed_alone():
+    rng = np.random.default_rng(7)
+    experiments = []
+    for i in range(300):
+        counts = [(int(n), int(n * p), float(n * p * 9.99)) for n, p in zip(rng.integers(100, 5000, 3), rng.uniform(0.05, 0.2, 3))]
+        experiments.append(_experiment(f"e{i}", *counts))
+    batch = experiment_results(experiments)
+    for experiment in experiments[:20]:
+        assert batch[experiment["id"]] == experiment_results([experiment])[experiment["id"]]
+
+def test_analyze_uses_each_rows_control():
+    stats = analyze(np.array([100, 100, 200, 200]), np.array([10, 20, 10, 40]), np.zeros(4), np.array([0, 0, 2, 2]))
+    assert np.allclose(stats["conversion_lift"], [0, 1, 0, 3])
+
+def test_results_cache_recomputes_after_new_events():
+    cache = ResultsCache(ttl_seconds=60)
+    cache.set(1, {"e": {}})
+    assert cache.get(1) == {"e": {}}
+    assert cache.get(2) is None
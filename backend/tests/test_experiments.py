@@ -0,0 +1,133 @@
+import pytest
+
+from app.models.experiment import ExperimentStatus
+from app.repositories import experiment as experiment_repo
+from app.services import experiment_events, experiment_stats, experiment_store
+from app.services.experiment_events import ExperimentEventBuffer
+from app.services.experiment_store import ExperimentCache
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = ExperimentCache(ttl_seconds=60, max_assignments=3)
+    monkeypatch.setattr(experiment_store, "experiment_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def event_buffer(monkeypatch):
+    buffer = ExperimentEventBuffer()
+    monkeypatch.setattr(experiment_events, "_event_buffer", buffer)
+    return buffer
+
+@pytest.fixture(autouse=True)
+def results_cache(monkeypatch):
+    cache = experiment_stats.ResultsCache(ttl_seconds=60)
+    monkeypatch.setattr(experiment_stats, "results_cache", cache)
+    return cache
+
+VARIANTS = [{"key": "variant_a", "content": {"content": "Hey"}}, {"key": "variant_b", "content": {"content": "Hi"}, "weight": 3}]
+
+def test_experiments_persist_and_cached_reads_skip_the_database(run_db, cache):
+    async def scenario(db):
+        created = await experiment_repo.create_experiment(db, "Greeting", VARIANTS)
+        first = await experiment_store.load_experiment(db, created.id)
+        run_db.statements.clear()
+        cached = await experiment_store.load_experiment(db, created.id)
+        reads = len(run_db.statements)
+
+        await experiment_repo.complete_experiment(db, created.id)
+        stale = (await experiment_store.load_experiment(db, created.id))["status"]
+        cache.invalidate(created.id)
+        fresh = (await experiment_store.load_experiment(db, created.id))["status"]
+        return first, cached, reads, stale, fresh
+
+    first, cached, reads, stale, fresh = run_db(scenario)
+    assert cached is first and reads == 0
+    assert [(v["key"], v["weight"]) for v in first["variants"]] == [("variant_a", 1.0), ("variant_b", 3.0)]
+    assert stale == "running" and fresh == ExperimentStatus.COMPLETED.value
+
+def test_first_recorded_assignment_sticks(run_db, cache):
+    async def scenario(db):
+        created = await experiment_repo.create_experiment(db, None, VARIANTS)
+        a, b = [variant.id for variant in created.variants]
+        first = await experiment_store.assign_fans(db, created.id, {1: a, 2: b})
+        second = await experiment_store.assign_fans(db, created.id, {1: b, 3: b})
+        run_db.statements.clear()
+        cached = await experiment_store.lookup_assignments(db, created.id, [2, 3])
+        reads = len(run_db.statements)
+        # Evicted fans are read back from the table, as another worker would
+        cache.clear()
+        stored = await experiment_store.lookup_assignments(db, created.id, [1, 2, 3, 4])
+        return (a, b), first, second, cached, reads, stored
+
+    (a, b), first, second, cached, reads, stored = run_db(scenario)
+    assert first == {1: a, 2: b}
+    assert second == {1: a, 3: b}
+    assert cached == {2: b, 3: b} and reads == 0
+    assert stored == {1: a, 2: b, 3: b}
+
+def test_events_are_buffered_and_flushed_as_deltas(run_db, event_buffer):
+    async def scenario(db):
+        created = await experiment_repo.create_experiment(db, None, VARIANTS)
+        a, b = [variant.id for variant in created.variants]
+        run_db.statements.clear()
+        for _ in range(1000):
+            await event_buffer.record(a, impressions=1)
+        await event_buffer.record(a, conversions=12, revenue=119.88)
+        await event_buffer.record(b, impressions=400, conversions=20, revenue=200.0)
+        writes_while_recording = len(run_db.statements)
+
+        flushed = await experiment_events.flush_events(db)
+        update_statements = [s for s in run_db.statements if s.startswith("UPDATE")]
+        await event_buffer.record(b, impressions=1)
+        flushed += await experiment_events.flush_events(db)
+        idle = await experiment_events.flush_events(db)
+        return (a, b), writes_while_recording, flushed, update_statements, idle, await experiment_repo.get_variant_metrics(db, created.id)
+
+    (a, b), writes_while_recording, flushed, update_statements, idle, metrics = run_db(scenario)
+    assert writes_while_recording == 0
+    assert flushed == 3 and idle == 0
+    assert len(update_statements) == 1
+    assert metrics[a] == {"impressions": 1000, "conversions": 12, "revenue": pytest.approx(119.88)}
+    assert metrics[b] == {"impressions": 401, "conversions": 20, "revenue": 200.0}
+
+def test_failed_flush_keeps_the_deltas(run_db, event_buffer, monkeypatch):
+    async def failing(db, deltas):
+        raise RuntimeError("database unavailable")
+
+    async def scenario(db):
+        created = await experiment_repo.create_experiment(db, None, VARIANTS)
+        a = created.variants[0].id
+        await event_buffer.record(a, impressions=5, conversions=1, revenue=9.99)
+        with monkeypatch.context() as patch:
+            patch.setattr(experiment_repo, "apply_variant_deltas", failing)
+            with pytest.raises(RuntimeError):
+                await experiment_events.flush_events(db)
+        await experiment_events.flush_events(db)
+        return a, await experiment_repo.get_variant_metrics(db, created.id)
+
+    a, metrics = run_db(scenario)
+    assert metrics[a] == {"impressions": 5, "conversions": 1, "revenue": pytest.approx(9.99)}
+
+def test_running_results_are_cached_until_events_are_flushed(run_db, event_buffer):
+    async def scenario(db):
+        running = await experiment_repo.create_experiment(db, None, VARIANTS)
+        stopped = await experiment_repo.create_experiment(db, None, VARIANTS)
+        await experiment_repo.complete_experiment(db, stopped.id)
+        a, b = [variant.id for variant in running.variants]
+
+        first = await experiment_stats.running_results(db)
+        run_db.statements.clear()
+        cached = await experiment_stats.running_results(db)
+        reads = len(run_db.statements)
+
+        await event_buffer.record(a, impressions=10000, conversions=1000)
+        await event_buffer.record(b, impressions=10000, conversions=1500)
+        await experiment_events.flush_events(db)
+        fresh = await experiment_stats.running_results(db)
+        return running.id, stopped.id, first, cached, reads, fresh
+
+    running_id, stopped_id, first, cached, reads, fresh = run_db(scenario)
+    assert list(first) == [running_id] and cached is first and reads == 0
+    assert first[running_id]["variants"][1]["conversion_lift"] is None
+    assert fresh[running_id]["variants"][1]["conversion_lift"] == pytest.approx(0.5)
+    assert fresh[running_id]["winner"] == "variant_b"
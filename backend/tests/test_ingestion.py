@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+
+from app.models.chatter import Chatter
+from app.models.creator import Creator
+from app.models.fan import Fan
+from app.models.message import Message, MessageType
+from app.models.message_rollup import MessageRollup
+from app.models.upload import Upload
+from app.services import ingestion, notification_service, semantic_search
+from app.services.notification_service import NotificationHub
+
+@pytest.fixture(autouse=True)
+def side_effects(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic_search, "_semantic_index", semantic_search.SemanticIndex(str(tmp_path)))
+    monkeypatch.setattr(notification_service, "_notification_hub", NotificationHub())
+
+def _record(fan, sent_time, message_type="text", price=float("nan"), purchased=False):
+    return {
+        "fan_name": fan,
+        "chatter_name": "Sam",
+        "creator_name": "Ava",
+        "sent_time": pd.Timestamp(sent_time),
+        "message_type": message_type,
+        "content": "hey",
+        "price": price,
+        "purchased": purchased
+    }
+
+def test_uploaded_records_become_messages_once(run_db):
+    records = [
+        _record("Whale", "2024-03-14 12:00"),
+        _record("Whale", "2024-03-14 13:00", message_type="PPV", price=25.0, purchased=True),
+        _record("Lurker", pd.NaT, message_type="sticker")
+    ]
+
+    async def scenario(db):
+        first = await ingestion.ingest_records(db, "chats.xlsx", "abc", records)
+        again = await ingestion.ingest_records(db, "chats.xlsx", "abc", records)
+        messages = (await db.scalars(select(Message).order_by(Message.id))).all()
+        fans = (await db.scalars(select(Fan.name).order_by(Fan.id))).all()
+        counts = (await db.scalar(select(func.count()).select_from(Creator)), await db.scalar(select(func.count()).select_from(Chatter)))
+        revenue = await db.scalar(select(func.sum(MessageRollup.revenue)).where(MessageRollup.entity_type == "creator"))
+        return first, again, messages, fans, counts, revenue, await ingestion.processed_hashes(db)
+
+    first, again, messages, fans, counts, revenue, hashes = run_db(scenario, [Creator(id=1, name="Ava")])
+    assert first["status"] == "success" and first["messages_created"] == 3
+    assert again["status"] == "skipped" and again["messages_created"] == 0
+    assert fans == ["Lurker", "Whale"]
+    # The existing creator is reused; the chatter is created once
+    assert counts == (1, 1)
+    assert all(message.creator_id == 1 for message in messages)
+    assert [message.message_type for message in messages] == [MessageType.TEXT, MessageType.PPV, MessageType.TEXT]
+    assert messages[1].price == 25.0 and messages[1].purchased and messages[0].price == 0.0
+    assert messages[2].sent_time is None
+    # Rollups only count messages with a sent time
+    assert revenue == 25.0
+    assert hashes == ["abc"]
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.models.chatter import Chatter
+from app.models.creator import Creator
+from app.models.fan import Fan
+from app.models.message import Message, MessageType
+from app.repositories.message_rollup import apply_message_deltas
+from app.services.insight_context import build_target_data, build_targets_data
+
+def _seed_rows():
+    now = datetime.now()
+    return [
+        Creator(id=1, name="Creator"),
+        Chatter(id=1, name="Chatter"),
+        Fan(id=1, name="Alice", total_spent=40.0),
+        Fan(id=2, name="Bob", total_spent=0.0),
+        Message(id=1, fan_id=1, chatter_id=1, creator_id=1, sent_time=now - timedelta(days=45),
+                message_type=MessageType.PPV, content="old drop", price=15.0, purchased=True),
+        Message(id=2, fan_id=1, chatter_id=1, creator_id=1, sent_time=now - timedelta(days=2),
+                message_type=MessageType.TEXT, content="hey there"),
+        Message(id=3, fan_id=1, chatter_id=1, creator_id=1, sent_time=now - timedelta(days=1),
+                message_type=MessageType.PPV, content="new drop", price=25.0, purchased=True),
+        Message(id=4, fan_id=2, chatter_id=1, creator_id=1, sent_time=now - timedelta(days=1),
+                message_type=MessageType.PPV, content="for bob", price=10.0, purchased=False),
+    ]
+
+def _with_rollups(run_db, build):
+    """Fold the seeded messages into the daily rollups, as ingestion does, then build"""
+    async def scenario(db):
+        messages = (await db.scalars(select(Message))).all()
+        await apply_message_deltas(db, messages)
+        await db.commit()
+        run_db.statements.clear()
+        return await build(db)
+
+    return run_db(scenario, _seed_rows())
+
+def test_fan_contexts_are_built_with_a_fixed_number_of_queries(run_db):
+    contexts = _with_rollups(run_db, lambda db: build_targets_data(db, "fan", [1, 2, 99]))
+
+    assert len(run_db.statements) == 3
+    assert set(contexts) == {1, 2}
+
+    alice = contexts[1]
+    assert alice["message_count"] == 3
+    assert alice["ppv_offered"] == 2
+    assert alice["ppv_conversion_rate"] == 1.0
+    assert alice["revenue_30d"] == 25.0
+    assert alice["revenue_prev_30d"] == 15.0
+    assert alice["creator_count"] == 1
+    assert [message["content"] for message in alice["message_history"]] == ["old drop", "hey there", "new drop"]
+
+    assert contexts[2]["ppv_conversion_rate"] == 0.0
+
+def test_chatter_context_totals_come_from_the_rollups(run_db):
+    contexts = _with_rollups(run_db, lambda db: build_targets_data(db, "chatter", [1]))
+
+    assert contexts[1]["message_count"] == 4 and contexts[1]["fan_count"] == 2
+    assert contexts[1]["revenue_total"] == 40.0
+    assert any("message_rollups" in statement for statement in run_db.statements)
+
+def test_message_context_describes_the_message_only(run_db):
+    contexts = run_db(lambda db: build_targets_data(db, "message", [2, 3]), _seed_rows())
+
+    assert contexts[2]["fan_name"] == "Alice"
+    assert contexts[3]["fan_message"] == "new drop" and contexts[3]["price"] == 25.0
+    # Messages have no sender direction, so no reply is guessed from the next row
+    assert "chatter_response" not in contexts[2]
+
+def test_general_context_uses_one_query(run_db):
+    context = run_db(lambda db: build_target_data(db, "general", None), _seed_rows())
+
+    assert len(run_db.statements) == 1
+    assert context["total_fans"] == 2
+    assert context["total_creators"] == 1
+    assert context["revenue_30d"] == 25.0
@@ -0,0 +1,126 @@
+import json
+import random
+
+from app.services.insight_parser import (
+    DEFAULT_CONFIDENCE,
+    InsightJSONStreamParser,
+    InsightStreamParser,
+    parse_insight_json,
+    parse_insight_text
+)
+
+RESPONSE = """SUMMARY: Loyal weekend spender
+who buys quickly
+DETAILS: Buys most PPV drops within a day.
+TAGS: loyal, weekend-active,
+high-value
+CONFIDENCE: 0.8
+ACTION ITEMS:
+- Send a Friday-night preview
+- Offer a 2-for-1 bundle
+  to re-engage after a quiet week
+"""
+
+def _assert_well_formed(result):
+    assert isinstance(result["summary"], str)
+    assert isinstance(result["details"], str)
+    assert all(isinstance(tag, str) and tag for tag in result["tags"])
+    assert all(isinstance(item, str) and item for item in result["action_items"])
+    assert 0.0 <= result["confidence_score"] <= 1.0
+
+def test_parser_keeps_hyphens_and_multiline_sections():
+    result = parse_insight_text(RESPONSE)
+
+    assert result["summary"] == "Loyal weekend spender who buys quickly"
+    assert result["tags"] == ["loyal", "weekend-active", "high-value"]
+    assert result["confidence_score"] == 0.8
+    assert result["action_items"] == [
+        "Send a Friday-night preview",
+        "Offer a 2-for-1 bundle to re-engage after a quiet week"
+    ]
+
+def test_parser_accepts_markdown_numbering_and_percentages():
+    result = parse_insight_text(
+        "**Summary:** Churn risk\r\n"
+        "## Tags:\r\n- at-risk\r\n- lapsed\r\n"
+        "**Confidence:** 85%\r\n"
+        "**Action Items:**\r\n1. Send a check-in\r\n2) Offer a discount\r\n"
+    )
+
+    assert result["summary"] == "Churn risk"
+    assert result["tags"] == ["at-risk", "lapsed"]
+    assert result["confidence_score"] == 0.85
+    assert result["action_items"] == ["Send a check-in", "Offer a discount"]
+
+def test_stream_parser_matches_single_pass_parser_for_any_chunking():
+    rng = random.Random(7)
+    expected = parse_insight_text(RESPONSE)
+    for _ in range(50):
+        parser = InsightStreamParser()
+        position = 0
+        while position < len(RESPONSE):
+            step = rng.randint(1, 12)
+            parser.feed(RESPONSE[position:position + step])
+            position += step
+        parser.close()
+        assert parser.result == expected
+
+def test_json_mode_tolerates_fences_and_loose_types():
+    text = "```json\n" + json.dumps({
+        "Summary": "Whale",
+        "details": "Spends on every drop",
+        "tags": "vip, big-spender",
+        "confidence": "90%",
+        "action_items": ["Offer early access", None, ""]
+    }) + "\n```"
+
+    result = parse_insight_json(text)
+
+    assert result["summary"] == "Whale"
+    assert result["tags"] == ["vip", "big-spender"]
+    assert result["confidence_score"] == 0.9
+    assert result["action_items"] == ["Offer early access"]
+
+def test_json_mode_falls_back_to_line_format():
+    assert parse_insight_json(RESPONSE) == parse_insight_text(RESPONSE)
+
+    parser = InsightJSONStreamParser()
+    parser.feed('{"summary": "Whale", "confidence_score": 1.7')
+    parser.feed("}")
+    assert dict(parser.close())["summary"] == "Whale"
+    assert parser.result["confidence_score"] == 1.0
+
+def test_fuzzed_responses_never_break_the_parser():
+    rng = random.Random(1234)
+    fragments = RESPONSE.splitlines() + [
+        "CONFIDENCE: high", "CONFIDENCE: -3", "CONFIDENCE: 250", "CONFIDENCE: nan", "CONFIDENCE: 7/10",
+        "CONFIDENCE: 9 / 0", "CONFIDENCE: 3 out of 4", "CONFIDENCE: 1e309/10", "TAGS:", "TAGS: ,,, ;", "-Send x", "*Offer y",
+        "ACTION ITEMS: Call them", "- ", "-", "•  ", "SUMMARY:", "{", "}", '{"summary": 3, "tags": {"a": 1}}',
+        "— emoji \U0001F525 line", "\x00\x1b[31m", " " * 40, "DETAILS: " + "x" * 5000
+    ]
+    for _ in range(500):
+        lines = [rng.choice(fragments) for _ in range(rng.randint(0, 15))]
+        text = rng.choice(["\n", "\r\n", "\n\n"]).join(lines)
+        if rng.random() < 0.3:
+            text = text[:rng.randint(0, len(text))]
+
+        for result in (parse_insight_text(text), parse_insight_json(text)):
+            _assert_well_formed(result)
+
+        parser = InsightStreamParser()
+        for start in range(0, len(text), 9):
+            parser.feed(text[start:start + 9])
+        parser.close()
+        _assert_well_formed(parser.result)
+
+def test_unspaced_bullets_and_scaled_confidences():
+    result = parse_insight_text("CONFIDENCE: 7/10\nACTION ITEMS:\n-Send x\n-Offer y\n•Call z\n**Note:** soon")
+    assert result["action_items"] == ["Send x", "Offer y", "Call z **Note:** soon"]
+    assert result["confidence_score"] == 0.7
+
+    for text, expected in (("4 / 5", 0.8), ("8 out of 10", 0.8), ("85%", 0.85), ("85", 0.85), ("12/10", 1.0)):
+        assert parse_insight_text(f"CONFIDENCE: {text}")["confidence_score"] == expected
+    assert parse_insight_text("CONFIDENCE: 3/0")["confidence_score"] == DEFAULT_CONFIDENCE
+
+def test_missing_confidence_uses_default():
+    assert parse_insight_text("SUMMARY: Quiet fan")["confidence_score"] == DEFAULT_CONFIDENCE
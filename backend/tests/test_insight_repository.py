@@ -0,0 +1,219 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.models.ai_insight import AIInsight, TargetType
+from app.models.message import Message
+from app.repositories import ai_insight as insight_repo
+from app.services import semantic_search
+
+@pytest.fixture(autouse=True)
+def semantic_index(tmp_path, monkeypatch):
+    # Keep index writes made by the repository out of the working directory
+    monkeypatch.setattr(semantic_search, "_semantic_index", semantic_search.SemanticIndex(str(tmp_path)))
+
+def _insight(target_id, tags, is_archived=False, target_type=TargetType.FAN):
+    return AIInsight(
+        target_type=target_type,
+        target_id=target_id,
+        summary=f"Fan {target_id}",
+        details="details",
+        tags=tags,
+        confidence_score=0.8,
+        action_items=[],
+        is_archived=is_archived
+    )
+
+def _fields(target_id):
+    return {
+        "target_type": TargetType.FAN,
+        "target_id": target_id,
+        "summary": f"Fan {target_id}",
+        "details": "details",
+        "tags": [],
+        "confidence_score": 0.8,
+        "action_items": [],
+        "metadata": {}
+    }
+
+def test_cursor_pagination_walks_every_row_once(run_db):
+    rows = [_insight(target_id=1, tags=["fan"]) for _ in range(7)] + [_insight(target_id=2, tags=["fan"])]
+
+    async def scenario(db):
+        pages, cursor = [], None
+        while True:
+            page = await insight_repo.list_insights(
+                db, target_type=TargetType.FAN, target_id=1, before_id=cursor, limit=3
+            )
+            if not page:
+                return pages
+            pages.append([insight.id for insight in page])
+            cursor = page[-1].id
+
+    pages = run_db(scenario, rows)
+    assert pages == [[7, 6, 5], [4, 3, 2], [1]]
+
+def test_tag_filter_requires_every_tag(run_db):
+    rows = [
+        _insight(1, ["vip", "weekend-active"]),
+        _insight(2, ["vip"]),
+        _insight(3, ["weekend-active"]),
+        _insight(4, None)
+    ]
+
+    async def scenario(db):
+        both = await insight_repo.list_insights(db, tags=["vip", "weekend-active"])
+        vip = await insight_repo.list_insights(db, tags=["vip"])
+        return [i.target_id for i in both], [i.target_id for i in vip]
+
+    both, vip = run_db(scenario, rows)
+    assert both == [1]
+    assert vip == [2, 1]
+
+def test_target_listing_uses_composite_index(run_db):
+    async def scenario(db):
+        result = await db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM ai_insights "
+            "WHERE is_archived = 0 AND target_type = 'FAN' AND target_id = 1 AND id < 100 "
+            "ORDER BY id DESC LIMIT 20"
+        ))
+        return " ".join(str(row[-1]) for row in result)
+
+    plan = run_db(scenario, [])
+    assert "ix_ai_insights_target_listing" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_bulk_archive_by_creator_filter_is_one_statement(run_db):
+    rows = [
+        Message(fan_id=1, creator_id=7, sent_time=datetime.now()),
+        _insight(1, ["vip"]),
+        _insight(1, ["vip"], is_archived=True),
+        _insight(2, ["vip"]),
+        _insight(7, None, target_type=TargetType.CREATOR),
+        _insight(7, None, target_type=TargetType.CHATTER)
+    ]
+
+    async def scenario(db):
+        affected = await insight_repo.bulk_set_archived(db, True, creator_id=7, is_archived=False)
+        archived = await insight_repo.list_insights(db, is_archived=True)
+        return affected, sorted((i.target_type.value, i.target_id) for i in archived)
+
+    affected, archived = run_db(scenario, rows)
+    assert affected == 2
+    assert archived == [("creator", 7), ("fan", 1), ("fan", 1)]
+
+def test_bulk_delete_by_ids_and_tag_returns_count(run_db):
+    rows = [_insight(i, ["stale"] if i % 2 else ["fresh"]) for i in range(1, 11)]
+
+    async def scenario(db):
+        deleted = await insight_repo.bulk_delete(db, ids=[1, 2, 3, 4, 5], tags=["stale"])
+        remaining = await insight_repo.list_insights(db)
+        chunk = await insight_repo.matching_insight_ids(db, after_id=0, limit=2, tags=["stale"])
+        return deleted, len(remaining), chunk
+
+    deleted, remaining, chunk = run_db(scenario, rows)
+    assert deleted == 3
+    assert remaining == 7
+    assert chunk == [7, 9]
+
+def test_bulk_mutations_with_only_empty_filters_touch_nothing(run_db):
+    rows = [_insight(i, ["stale"]) for i in range(1, 6)]
+
+    async def scenario(db):
+        assert not insight_repo.has_bulk_conditions(db, tags=[])
+        deleted = await insight_repo.bulk_delete(db, tags=[])
+        archived = await insight_repo.bulk_set_archived(db, True, tags=[])
+        chunk = await insight_repo.matching_insight_ids(db, after_id=0, limit=10, tags=[])
+        return deleted, archived, chunk, len(await insight_repo.list_insights(db))
+
+    assert run_db(scenario, rows) == (0, 0, [], 5)
+
+def test_new_insight_supersedes_live_one_for_same_target(run_db):
+    async def scenario(db):
+        first = await insight_repo.create_insight(db, **_fields(1))
+        other_target = await insight_repo.create_insight(db, **_fields(2))
+        second = await insight_repo.create_insight(db, **_fields(1))
+        await db.refresh(first)
+        return first, other_target, second
+
+    first, other_target, second = run_db(scenario, [])
+    assert first.is_archived and first.superseded_by_id == second.id
+    assert not second.is_archived
+    assert not other_target.is_archived
+
+def test_bulk_create_keeps_one_live_insight_per_target(run_db):
+    async def scenario(db):
+        await insight_repo.create_insight(db, **_fields(1))
+        created = await insight_repo.create_insights_bulk(db, [_fields(1), _fields(2), _fields(2)])
+        live = await insight_repo.list_insights(db)
+        archived = await insight_repo.list_insights(db, is_archived=True)
+        return created, [i.target_id for i in live], [(i.target_id, i.superseded_by_id) for i in archived]
+
+    created, live, archived = run_db(scenario, [])
+    assert created == 2
+    assert sorted(live) == [1, 2]
+    assert archived == [(1, 2)]
+
+def test_compaction_archives_duplicates_and_prunes_superseded(run_db):
+    rows = [_insight(1, None), _insight(1, None), _insight(1, None), _insight(2, None)]
+
+    async def scenario(db):
+        archived = await insight_repo.archive_duplicate_live_insights(db, limit=100)
+        kept = await insight_repo.prune_superseded_insights(db, datetime(2000, 1, 1), limit=100)
+        pruned = await insight_repo.prune_superseded_insights(db, datetime(2100, 1, 1), limit=100)
+        remaining = await insight_repo.matching_insight_ids(db, after_id=0, limit=100, ids=[1, 2, 3, 4])
+        return archived, kept, pruned, remaining
+
+    archived, kept, pruned, remaining = run_db(scenario, rows)
+    assert (archived, kept, pruned) == (2, 0, 2)
+    assert remaining == [3, 4]
+
+def test_unarchived_insight_replaces_the_live_one_and_survives_compaction(run_db):
+    rows = [_insight(1, None), _insight(1, None), _insight(2, None)]
+
+    async def scenario(db):
+        await insight_repo.archive_duplicate_live_insights(db, limit=100)
+        db.expire_all()
+        older = await insight_repo.get_insight(db, 1)
+        older = await insight_repo.update_insight(db, older, {"is_archived": False})
+        archived = await insight_repo.archive_duplicate_live_insights(db, limit=100)
+        pruned = await insight_repo.prune_superseded_insights(db, datetime(2000, 1, 1), limit=100)
+        result = await db.execute(
+            text("SELECT id, is_archived, superseded_by_id FROM ai_insights ORDER BY id")
+        )
+        return older.superseded_by_id, archived, pruned, [tuple(row) for row in result]
+
+    superseded_by, archived, pruned, state = run_db(scenario, rows)
+    assert superseded_by is None
+    assert (archived, pruned) == (0, 0)
+    assert state == [(1, 0, None), (2, 1, 1), (3, 0, None)]
+
+def test_bulk_restore_keeps_one_live_insight_per_target(run_db):
+    rows = [_insight(1, ["old"], is_archived=True), _insight(1, ["old"], is_archived=True), _insight(1, None)]
+
+    async def scenario(db):
+        restored = await insight_repo.restore_insights(db, tags=["old"])
+        result = await db.execute(
+            text("SELECT id, is_archived, superseded_by_id FROM ai_insights ORDER BY id")
+        )
+        return restored, [tuple(row) for row in result]
+
+    restored, state = run_db(scenario, rows)
+    assert restored == 1
+    assert state == [(1, 1, 2), (2, 0, None), (3, 1, 2)]
+
+def test_queued_index_writes_send_ids_to_the_index_host(run_db, monkeypatch):
+    import celery_worker
+    from app.core import config
+
+    sent = []
+    monkeypatch.setattr(config, "EMBEDDING_INDEX_WRITER", "queue")
+    monkeypatch.setattr(celery_worker.celery_app, "send_task", lambda name, kwargs: sent.append((name, kwargs)))
+
+    async def scenario(db):
+        return await insight_repo.create_insight(db, **_fields(1))
+
+    insight = run_db(scenario, [])
+    assert sent == [("app.tasks.embeddings.index_entries", {"namespace": "insights", "ids": [insight.id]})]
+    assert len(semantic_search.get_semantic_index().indexes["insights"]) == 0
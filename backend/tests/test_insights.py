@@ -159,3 +159,29 @@ def test_delete_insight(test_db, admin_token, test_insight):
         headers={"Authorization": f"Bearer {admin_token}"}
     )
     assert response.status_code == 404
+
+def test_generate_stream_does_not_hold_a_request_session():
+    from app.db.base import get_db
+
+    route = next(route for route in app.routes if getattr(route, "path", "") == "/api/insights/generate/stream")
+
+    def calls(dependant):
+        yield dependant.call
+        for dependency in dependant.dependencies:
+            yield from calls(dependency)
+
+    assert get_db not in set(calls(route.dependant))
+
+def test_bulk_delete_rejects_a_filter_of_only_empty_lists(test_db, admin_token, test_insight):
+    response = client.post(
+        "/api/insights/bulk/delete",
+        json={"filter": {"tags": []}},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 400
+
+    response = client.get(
+        f"/api/insights/{test_insight}",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
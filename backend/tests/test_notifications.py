@@ -0,0 +1,200 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text, update
+
+from app.models.notification import Notification, NotificationArchive, NotificationReceipt, NotificationSeverity
+from app.models.user import User
+from app.repositories import notification as notification_repo
+from app.services import notification_service
+from app.services.notification_service import NotificationHub
+from app.services.unread_counter import BROADCAST, UnreadCounter
+
+@pytest.fixture(autouse=True)
+def hub(monkeypatch):
+    hub = NotificationHub(queue_size=3)
+    monkeypatch.setattr(notification_service, "_notification_hub", hub)
+    return hub
+
+@pytest.fixture(autouse=True)
+def counter(monkeypatch):
+    counter = UnreadCounter(ttl_seconds=60)
+    monkeypatch.setattr(notification_repo, "unread_counter", counter)
+    return counter
+
+def _user(username):
+    return User(username=username, email=f"{username}@example.com", hashed_password="x")
+
+def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+def test_hub_routes_to_recipient_and_broadcasts_to_everyone(hub):
+    async def scenario():
+        alice, alice_tab, bob = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+        await hub.publish([{"id": 1, "user_id": 1}, {"id": 2, "user_id": None}, {"id": 3, "user_id": 2}])
+        hub.unsubscribe(2, bob)
+        await hub.publish([{"id": 4, "user_id": 2}])
+        return [[item["id"] for item in _drain(queue)] for queue in (alice, alice_tab, bob)]
+
+    alice, alice_tab, bob = asyncio.run(scenario())
+    assert alice == alice_tab == [1, 2]
+    assert bob == [2, 3]
+
+def test_slow_subscriber_drops_oldest_without_blocking(hub):
+    async def scenario():
+        queue = hub.subscribe(1)
+        await hub.publish([{"id": i, "user_id": 1} for i in range(1, 6)])
+        return [item["id"] for item in _drain(queue)]
+
+    assert asyncio.run(scenario()) == [3, 4, 5]
+
+def test_created_notifications_are_stored_and_pushed(run_db, hub):
+    async def scenario(db):
+        queue = hub.subscribe(1)
+        created = await notification_repo.create_notifications(db, [
+            {"message": "Creator revenue down 30%", "severity": NotificationSeverity.RISK, "user_id": 1},
+            {"message": "Weekly report generated"},
+            {"message": "For someone else", "user_id": 2}
+        ])
+        visible = await notification_repo.list_notifications(db, 1)
+        missed = await notification_repo.notifications_after(db, 1, created[0].id, limit=10)
+        return created, _drain(queue), visible, missed
+
+    created, pushed, visible, missed = run_db(scenario, [_user("alice"), _user("bob")])
+    assert [n.id for n in created] == [1, 2, 3]
+    assert [p["message"] for p in pushed] == ["Creator revenue down 30%", "Weekly report generated"]
+    assert pushed[0]["severity"] == "risk" and pushed[0]["is_read"] is False
+    assert [n.id for n in visible] == [2, 1]
+    assert [n.id for n in missed] == [2]
+
+def test_unread_counters_follow_inserts_reads_and_archives(run_db, counter):
+    async def scenario(db):
+        counts = []
+        created = await notification_repo.create_notifications(db, [
+            {"message": "direct", "user_id": 1},
+            {"message": "direct", "user_id": 1},
+            {"message": "everyone"},
+            {"message": "someone else", "user_id": 2}
+        ])
+        counts.append(await notification_repo.count_unread(db, 1))
+        # Cached from here on: writes adjust the counters in place
+        await notification_repo.create_notifications(db, [{"message": "everyone again"}])
+        counts.append(await counter.get(1) + await counter.get(BROADCAST))
+        await notification_repo.mark_read(db, 1, [created[0].id])
+        await notification_repo.mark_read(db, 1, [created[0].id])
+        counts.append(await notification_repo.count_unread(db, 1))
+        await notification_repo.archive(db, 1, [created[1].id, created[3].id])
+        counts.append(await notification_repo.count_unread(db, 1))
+        counts.append(await notification_repo.mark_read(db, 1))
+        counts.append(await notification_repo.count_unread(db, 1))
+        await counter.clear()
+        counts.append(await notification_repo.count_unread(db, 1))
+        counts.append(await notification_repo.count_unread(db, 2))
+        return counts
+
+    # Alice reading the broadcasts leaves them unread for Bob
+    assert run_db(scenario, [_user("alice"), _user("bob")]) == [3, 4, 3, 2, 2, 0, 0, 3]
+
+def test_redis_counter_opens_a_client_per_event_loop():
+    counter = UnreadCounter(ttl_seconds=60, redis_url="redis://localhost:6379/0")
+
+    async def client():
+        return counter._redis(), counter._redis(), counter._adjust_script
+
+    # Celery runs each task in a new loop; a client bound to a closed loop would fail
+    first, again, script = asyncio.run(client())
+    second, _, second_script = asyncio.run(client())
+    assert first is again
+    assert second is not first and second_script is not script
+    assert second_script.registered_client is second
+
+def test_broadcast_read_and_archive_state_is_per_user(run_db, counter):
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=400)
+
+    async def scenario(db):
+        created = await notification_repo.create_notifications(db, [{"message": "everyone"}, {"message": "everyone again"}])
+        first, second = (n.id for n in created)
+        counts = [await notification_repo.count_unread(db, user_id) for user_id in (1, 2)]
+        changed = [
+            await notification_repo.mark_read(db, 1, [first]),
+            await notification_repo.mark_read(db, 1, [first]),
+            await notification_repo.archive(db, 2, [first, second])
+        ]
+        counts += [await notification_repo.count_unread(db, user_id) for user_id in (1, 2)]
+        await counter.clear()
+        counts += [await notification_repo.count_unread(db, user_id) for user_id in (1, 2)]
+
+        views = {}
+        for user_id in (1, 2):
+            views[user_id] = [(n.is_read, n.is_archived) for n in await notification_repo.list_notifications(db, user_id)]
+        inbox = [n.id for n in await notification_repo.list_notifications(db, 2, is_archived=False)]
+        unread = [n.id for n in await notification_repo.list_notifications(db, 1, is_read=False)]
+        shared = (await db.execute(select(Notification.is_read, Notification.is_archived).order_by(Notification.id))).all()
+
+        # Users archiving their copy does not send a broadcast to cold storage
+        await db.execute(update(Notification).values(updated_at=old))
+        await db.execute(update(NotificationReceipt).values(updated_at=old))
+        await db.commit()
+        moved = await notification_repo.move_archived_notifications(db, now, limit=10)
+        return counts, changed, views, inbox, unread, shared, moved, second
+
+    counts, changed, views, inbox, unread, shared, moved, second = run_db(scenario, [_user("alice"), _user("bob")])
+    assert counts == [2, 2, 1, 0, 1, 0]
+    assert changed == [1, 0, 2]
+    assert views[1] == [(False, False), (True, False)]
+    assert views[2] == [(False, True), (False, True)]
+    assert inbox == [] and unread == [second]
+    assert shared == [(False, False), (False, False)]
+    assert moved == 0
+
+def test_unread_count_uses_partial_index(run_db):
+    async def scenario(db):
+        # Mostly read history, as in a long-lived inbox
+        await notification_repo.create_notifications(
+            db, [{"message": "old", "user_id": 1, "is_read": True} for _ in range(200)] + [{"message": "new", "user_id": 1}]
+        )
+        await db.execute(text("ANALYZE"))
+        result = await db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT count(*) FROM notifications "
+            "WHERE user_id = 1 AND is_read = 0 AND is_archived = 0"
+        ))
+        return " ".join(str(row[-1]) for row in result)
+
+    assert "ix_notifications_unread" in run_db(scenario, [_user("alice")])
+
+def test_retention_moves_old_archived_notifications_in_batches(run_db, counter):
+    now = datetime.now(timezone.utc)
+    old, recent = now - timedelta(days=400), now - timedelta(days=2)
+    rows = [
+        Notification(message="archived long ago", user_id=1, is_archived=True, created_at=old, updated_at=old),
+        Notification(message="archived long ago", user_id=1, is_archived=True, created_at=old, updated_at=old),
+        Notification(message="archived last month", is_archived=True, created_at=now - timedelta(days=45), updated_at=now - timedelta(days=40)),
+        Notification(message="archived this week", user_id=1, is_archived=True, created_at=recent, updated_at=recent),
+        Notification(message="old but unread", user_id=1, created_at=old, updated_at=old)
+    ]
+
+    async def scenario(db):
+        unread_before = await notification_repo.count_unread(db, 1)
+        batches = []
+        while True:
+            moved = await notification_repo.move_archived_notifications(db, now - timedelta(days=30), limit=2)
+            batches.append(moved)
+            if moved < 2:
+                break
+        hot = (await db.scalars(select(Notification.id).order_by(Notification.id))).all()
+        cold = (await db.scalars(select(NotificationArchive.id).order_by(NotificationArchive.id))).all()
+        pruned = await notification_repo.prune_notification_archive(db, now - timedelta(days=365), limit=10)
+        kept = (await db.scalars(select(NotificationArchive.message))).all()
+        return batches, hot, cold, pruned, kept, unread_before, await notification_repo.count_unread(db, 1)
+
+    batches, hot, cold, pruned, kept, unread_before, unread_after = run_db(scenario, [_user("alice")] + rows)
+    assert batches == [2, 1]
+    assert hot == [4, 5]
+    assert cold == [1, 2, 3]
+    assert pruned == 2 and kept == ["archived last month"]
+    assert unread_before == unread_after == 1
@@ -0,0 +1,14 @@
+import asyncio
+
+from app.core.security import get_password_hash_async, verify_password_async
+
+def test_password_hashing_runs_off_event_loop():
+    async def scenario():
+        hashed = await get_password_hash_async("testpassword")
+        results = await asyncio.gather(
+            verify_password_async("testpassword", hashed),
+            verify_password_async("wrongpassword", hashed)
+        )
+        assert results == [True, False]
+
+    asyncio.run(scenario())
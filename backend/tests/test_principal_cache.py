@@ -0,0 +1,44 @@
+import asyncio
+
+from app.core.principal_cache import PrincipalCache
+from app.models.user import User, UserRole
+from app.repositories import user as user_repo
+
+def test_principal_cache_hit_and_invalidate():
+    cache = PrincipalCache(ttl_seconds=30, max_size=2)
+    user = User(id=1, username="cached", email="cached@example.com", role=UserRole.ADMIN, is_active=True)
+
+    async def scenario():
+        assert await cache.get("cached") is None
+        await cache.set("cached", user)
+        hit = await cache.get("cached")
+        assert hit.id == 1 and hit.role == UserRole.ADMIN
+
+        await cache.invalidate("cached")
+        assert await cache.get("cached") is None
+
+    asyncio.run(scenario())
+
+def test_principal_cache_evicts_least_recently_used():
+    cache = PrincipalCache(ttl_seconds=30, max_size=2)
+
+    async def scenario():
+        for i, name in enumerate(["a", "b", "c"]):
+            await cache.set(name, User(id=i, username=name, email=f"{name}@example.com", role=UserRole.TRAINER))
+        assert await cache.get("a") is None
+        assert (await cache.get("c")).username == "c"
+
+    asyncio.run(scenario())
+
+def test_renaming_a_user_invalidates_the_old_subject(run_db, monkeypatch):
+    cache = PrincipalCache(ttl_seconds=30, max_size=10)
+    monkeypatch.setattr(user_repo, "principal_cache", cache)
+
+    async def scenario(db):
+        db_user = await user_repo.get_user_by_username(db, "old-name")
+        await cache.set("old-name", db_user)
+        await user_repo.update_user(db, db_user, {"username": "new-name"})
+        return await cache.get("old-name")
+
+    rows = [User(username="old-name", email="old@example.com", hashed_password="x", role=UserRole.TRAINER)]
+    assert run_db(scenario, rows) is None
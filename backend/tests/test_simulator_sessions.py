@@ -0,0 +1,67 @@
+import asyncio
+
+from app.core import config
+from app.services.simulator_sessions import (
+    SimulationSession,
+    SimulationSessionStore,
+    new_session,
+    process_message,
+    session_history,
+    session_results
+)
+
+PROFILE = {"fan_name": "Alex", "spending_level": "high", "interests": ["fitness", "travel"]}
+
+def test_sessions_keep_history_and_running_metrics(monkeypatch):
+    monkeypatch.setattr(config, "SIMULATOR_MAX_TURNS", 3)
+    session = new_session("sim-1", PROFILE)
+    first = process_message(session, "Hey Alex! How was your fitness class today? 😊")
+    assert first["metrics"]["engagement_score"] > 0.7
+    for text in ("ok", "Do you travel much?", "Want to unlock my exclusive travel set? 🔥", "cool"):
+        process_message(session, text)
+
+    # Only the last turns are kept, but metrics cover the whole conversation
+    history = session_history(session)
+    assert [turn["turn"] for turn in history] == [3, 4, 5]
+    assert history[1]["made_offer"] and history[1]["message"].startswith("Want to unlock")
+    results = session_results(session)
+    assert results["turns"] == 5
+    assert results["metrics"]["conversion_opportunities"] == 1
+    assert 0 < results["final_score"] <= 100
+
+def test_replies_are_reproducible_and_early_offers_backfire():
+    replies = []
+    for _ in range(2):
+        session = new_session("sim-2", PROFILE)
+        replies.append([process_message(session, text)["response"] for text in ("Hi!", "How are you?", "Buy my PPV")])
+    assert replies[0] == replies[1]
+
+    session = new_session("sim-3", PROFILE)
+    result = process_message(session, "Check out my exclusive bundle")
+    assert "Build rapport" in result["coaching_tips"][0]
+    assert session_results(session)["metrics"]["conversion_success"] == 0
+
+def test_store_is_bounded_and_expires_sessions(monkeypatch):
+    async def scenario():
+        store = SimulationSessionStore(ttl_seconds=60, max_sessions=2)
+        for simulation_id in ("a", "b"):
+            await store.save(new_session(simulation_id, PROFILE))
+        await store.get("a")
+        await store.save(new_session("c", PROFILE))
+        # "b" was least recently used
+        assert await store.get("b") is None
+        assert await store.get("a") is not None
+
+        store.ttl_seconds = -1
+        await store.save(new_session("d", PROFILE))
+        assert await store.get("d") is None
+
+    asyncio.run(scenario())
+
+def test_sessions_round_trip_through_json():
+    session = new_session("sim-4", PROFILE)
+    process_message(session, "What are you up to, Alex?")
+    restored = SimulationSession.loads(session.dumps().encode())
+    assert restored.turns == session.turns
+    assert restored.totals == session.totals
+    assert session_history(restored) == session_history(session)
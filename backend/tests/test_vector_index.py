@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+from app.services.embeddings import HashingEmbedder
+from app.services.vector_index import VectorIndex, new_generation, publish_generation
+
+def _unit(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def test_exact_search_upsert_and_remove(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=3, ivf_min_vectors=1000)
+    index.add([10, 20, 30], _unit([[1, 0, 0], [0, 1, 0], [0, 0, 1]]))
+
+    assert index.search(_unit([[1, 0.1, 0]])[0], k=1)[0][0] == 10
+
+    # Re-adding an id replaces its vector instead of duplicating it
+    index.add([10], _unit([[0, 0, 1]]))
+    assert len(index) == 3
+    assert [hit_id for hit_id, _ in index.search(_unit([[0, 0, 1]])[0], k=2)] in ([10, 30], [30, 10])
+
+    index.remove([30])
+    assert [hit_id for hit_id, _ in index.search(_unit([[0, 0, 1]])[0], k=3)] == [10, 20]
+
+def test_index_is_reopened_from_disk(tmp_path):
+    writer = VectorIndex(str(tmp_path), dim=3)
+    writer.add([1, 2], _unit([[1, 0, 0], [0, 1, 0]]))
+
+    reader = VectorIndex(str(tmp_path), dim=3)
+    assert reader.search(_unit([[0, 1, 0]])[0], k=1)[0][0] == 2
+
+    # Readers pick up later writes from other instances
+    writer.add([3], _unit([[0, 0, 1]]))
+    assert reader.search(_unit([[0, 0, 1]])[0], k=1)[0][0] == 3
+
+def test_ivf_search_matches_exact_on_clustered_data(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(40, 32))
+    points = np.repeat(centers, 250, axis=0) + rng.normal(scale=0.1, size=(10000, 32))
+    index = VectorIndex(str(tmp_path), dim=32, ivf_min_vectors=5000, nprobe=4)
+    index.add(list(range(10000)), _unit(points))
+    # Writes never train; a background job does once the index is large enough
+    assert index.needs_training and index._centroids is None
+    assert index.train()
+    assert not index.needs_training
+
+    queries = _unit(centers[:20] + rng.normal(scale=0.1, size=(20, 32)))
+    recall = []
+    scanned = []
+    for query in queries:
+        approximate = {hit_id for hit_id, _ in index.search(query, k=10)}
+        exact = {hit_id for hit_id, _ in index.search(query, k=10, exact=True)}
+        recall.append(len(approximate & exact) / 10)
+        probe = np.argsort(-(index._centroids @ query))[:index.nprobe]
+        scanned.append(sum(len(index._list_rows[i]) for i in probe))
+
+    assert np.mean(recall) >= 0.9
+    # Only the probed lists are scored, a small fraction of the index
+    assert max(scanned) <= len(index) // 10
+
+def test_inverted_lists_stay_in_sync_without_rebuilding(tmp_path, monkeypatch):
+    rng = np.random.default_rng(2)
+    writer = VectorIndex(str(tmp_path), dim=8, ivf_min_vectors=100, nprobe=64)
+    writer.add(list(range(200)), _unit(rng.normal(size=(200, 8))))
+    writer.train()
+    reader = VectorIndex(str(tmp_path), dim=8, ivf_min_vectors=100, nprobe=64)
+    reader.search(_unit(rng.normal(size=(1, 8)))[0])
+
+    rebuilds = []
+    monkeypatch.setattr(VectorIndex, "_build_lists", lambda self: rebuilds.append(self))
+    writer.add(list(range(200, 260)), _unit(rng.normal(size=(60, 8))))
+    query = _unit(rng.normal(size=(1, 8)))[0]
+    # With every list probed, IVF search sees exactly what a full scan sees
+    assert reader.search(query, k=20) == writer.search(query, k=20) == writer.search(query, k=20, exact=True)
+    assert rebuilds == []
+
+    # Overwriting and removing existing rows leaves stale entries that search skips
+    writer.add(list(range(10)), _unit(rng.normal(size=(10, 8))))
+    writer.remove(list(range(10, 20)))
+    hits = writer.search(query, k=300)
+    assert [hit_id for hit_id, _ in hits] == [hit_id for hit_id, _ in writer.search(query, k=300, exact=True)]
+    assert len(hits) == 250
+
+def test_published_generation_replaces_the_index_for_every_reader(tmp_path):
+    path = str(tmp_path / "messages")
+    old = VectorIndex(path, dim=3)
+    old.add([1, 2], _unit([[1, 0, 0], [0, 1, 0]]))
+    assert len(old) == 2
+    # Opened by a process that already runs the new embedding model
+    reader = VectorIndex(path, dim=4)
+
+    # Rebuilt without the deleted row 2 and with a new embedding dimension
+    staged = VectorIndex(new_generation(path), dim=4)
+    staged.add([1, 3], _unit([[1, 0, 0, 0], [0, 0, 0, 1]]))
+    publish_generation(path, staged.path)
+
+    assert [hit_id for hit_id, _ in reader.search(_unit([[0, 0, 0, 1]])[0], k=5)] == [3, 1]
+    assert reader.get(2) is None
+    # The replaced directory is gone and writers go to the new generation
+    assert sorted(entry.name for entry in tmp_path.iterdir() if entry.is_dir() and not entry.is_symlink()) == [os.path.basename(staged.path)]
+    reader.add([4], _unit([[0, 1, 0, 0]]))
+    assert len(staged) == 3
+
+    # A second rebuild swaps the link again
+    rebuilt = VectorIndex(new_generation(path), dim=4)
+    rebuilt.add([5], _unit([[0, 0, 1, 0]]))
+    publish_generation(path, rebuilt.path)
+    assert [hit_id for hit_id, _ in reader.search(_unit([[0, 0, 1, 0]])[0], k=5)] == [5]
+    assert not os.path.exists(staged.path)
+
+def test_hashing_embedder_ranks_lexical_overlap():
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.embed(["buys every ppv bundle on friday", "never opens paid messages", "friday ppv bundle buyer"])
+
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[2] > vectors[0] @ vectors[1]
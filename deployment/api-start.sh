@@ -0,0 +1,19 @@
+#!/bin/bash
+# API start script for Render.com deployment
+#
+# The semantic index lives on this service's disk and Render disks cannot be
+# shared, so the embeddings queue is consumed here next to the API. Both run
+# in the foreground; when either exits the other is stopped and the script
+# fails, so Render restarts the whole service instead of leaving the index
+# without a writer.
+
+celery -A celery_worker.celery_app worker -Q embeddings -c 1 --loglevel=info &
+gunicorn -w 4 -k uvicorn.workers.UvicornWorker main:app --bind 0.0.0.0:$PORT &
+
+trap 'kill -TERM $(jobs -p) 2>/dev/null' TERM INT
+wait -n
+status=$?
+echo "A process exited with status $status; stopping the service"
+kill -TERM $(jobs -p) 2>/dev/null
+wait
+exit $(( status == 0 ? 1 : status ))
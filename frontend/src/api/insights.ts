@@ -5,6 +5,9 @@ export const getInsights = async (params?: {
   target_type?: string;
   target_id?: number;
   is_archived?: boolean;
+  tags?: string;
+  cursor?: number;
+  limit?: number;
 }): Promise<AIInsight[]> => {
   try {
     const response = await api.get('/insights', { params });
@@ -83,3 +86,52 @@ export const deleteInsight = async (id: number): Promise<void> => {
     throw error;
   }
 };
+
+export type InsightStreamEvent =
+  | { event: 'token'; data: string }
+  | { event: 'section'; data: { section: string; value: any } }
+  | { event: 'insight'; data: AIInsight & { insight_id: number } }
+  | { event: 'error'; data: { detail: string } };
+
+// Streams /insights/generate/stream (Server-Sent Events over POST, so fetch rather than EventSource)
+export const streamInsight = async (
+  params: AIInsightGenerateParams,
+  onEvent: (event: InsightStreamEvent) => void
+): Promise<void> => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${api.defaults.baseURL}/insights/generate/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(params),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Error streaming insight: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const eventLine = frame.split('\n').find((line) => line.startsWith('event:'));
+      const dataLine = frame.split('\n').find((line) => line.startsWith('data:'));
+      if (eventLine && dataLine) {
+        onEvent({
+          event: eventLine.slice(6).trim(),
+          data: JSON.parse(dataLine.slice(5).trim()),
+        } as InsightStreamEvent);
+      }
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+};
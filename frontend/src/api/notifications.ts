@@ -11,7 +11,69 @@ export const markNotificationRead = async (notificationId: number): Promise<any>
   return response.data;
 };
 
+export const markAllNotificationsRead = async (severity?: string): Promise<{ status: string; updated: number }> => {
+  const response = await api.post('/notifications/read-all', null, { params: severity ? { severity } : undefined });
+  return response.data;
+};
+
+export const getUnreadCount = async (): Promise<number> => {
+  const response = await api.get('/notifications/unread-count');
+  return response.data.unread;
+};
+
 export const archiveNotification = async (notificationId: number): Promise<any> => {
   const response = await api.post(`/notifications/${notificationId}/archive`);
   return response.data;
 };
+
+// Streams /notifications/stream (Server-Sent Events via fetch so the bearer token can be sent).
+// Reconnects with Last-Event-ID after a dropped connection so nothing is missed; abort the
+// signal to stop.
+export const subscribeNotifications = async (
+  onNotification: (notification: Notification) => void,
+  signal: AbortSignal
+): Promise<void> => {
+  let lastEventId: string | null = null;
+  while (!signal.aborted) {
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${api.defaults.baseURL}/notifications/stream`, {
+        headers: {
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+          ...(lastEventId ? { 'Last-Event-ID': lastEventId } : {}),
+        },
+        signal,
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Error streaming notifications: ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+          const lines = buffer.slice(0, boundary).split('\n');
+          buffer = buffer.slice(boundary + 2);
+          const idLine = lines.find((line) => line.startsWith('id:'));
+          const dataLine = lines.find((line) => line.startsWith('data:'));
+          if (idLine && dataLine) {
+            lastEventId = idLine.slice(3).trim();
+            onNotification(JSON.parse(dataLine.slice(5).trim()));
+          }
+          boundary = buffer.indexOf('\n\n');
+        }
+      }
+    } catch (error) {
+      if (signal.aborted) return;
+      console.error('Notification stream interrupted:', error);
+    }
+    // Back off briefly before reconnecting
+    await new Promise((resolve) => setTimeout(resolve, 2000));
+  }
+};
@@ -1,5 +1,5 @@
 import api from './index';
-import { TestResult } from '../types';
+import { TestAnalysis, TestResult } from '../types';
 
 export const startTest = async (testData: any): Promise<any> => {
   const response = await api.post('/test/start', testData);
@@ -10,3 +10,40 @@ export const getTestResults = async (testId: string): Promise<TestResult> => {
   const response = await api.get(`/test/results/${testId}`);
   return response.data;
 };
+
+export interface TestEvent {
+  variant: string;
+  impressions?: number;
+  conversions?: number;
+  revenue?: number;
+}
+
+export const recordTestEvents = async (testId: string, events: TestEvent[]): Promise<{ test_id: string; accepted: number }> => {
+  const response = await api.post(`/test/events/${testId}`, { events });
+  return response.data;
+};
+
+export const assignVariants = async (testId: string, fanIds: number[]): Promise<Record<number, string | null>> => {
+  const response = await api.post(`/test/assign/${testId}`, { fan_ids: fanIds });
+  return response.data.assignments;
+};
+
+export interface BacktestVariant {
+  key: string;
+  message_types?: string[];
+  min_price?: number;
+  max_price?: number;
+  send_hours?: number[];
+}
+
+export interface BacktestRequest {
+  start: string;
+  end: string;
+  creator_id?: number;
+  variants: BacktestVariant[];
+}
+
+export const runBacktest = async (request: BacktestRequest): Promise<TestAnalysis & { start: string; end: string }> => {
+  const response = await api.post('/test/backtest', request);
+  return response.data;
+};
@@ -3,9 +3,18 @@ import { Outlet } from 'react-router-dom';
 import Sidebar from './Sidebar';
 import Topbar from './Topbar';
 import NotificationDrawer from './NotificationDrawer';
+import { getUnreadCount } from '../api/notifications';
 
 const Layout: React.FC = () => {
   const [showNotifications, setShowNotifications] = React.useState(false);
+  const [unreadCount, setUnreadCount] = React.useState(0);
+
+  // Fetched once; the drawer keeps it current from pushed notifications and read/archive actions
+  React.useEffect(() => {
+    getUnreadCount()
+      .then(setUnreadCount)
+      .catch((error) => console.error('Error fetching unread count:', error));
+  }, []);
 
   const toggleNotifications = () => {
     setShowNotifications(!showNotifications);
@@ -19,7 +28,7 @@ const Layout: React.FC = () => {
       {/* Main Content */}
       <div className="flex-1 flex flex-col overflow-hidden">
         {/* Top Navigation */}
-        <Topbar toggleNotifications={toggleNotifications} />
+        <Topbar toggleNotifications={toggleNotifications} unreadCount={unreadCount} />
 
         {/* Main Content Area */}
         <main className="flex-1 overflow-y-auto p-4 md:p-6">
@@ -31,6 +40,8 @@ const Layout: React.FC = () => {
       <NotificationDrawer 
         isOpen={showNotifications} 
         onClose={() => setShowNotifications(false)} 
+        onUnreadChange={(delta) => setUnreadCount((count) => Math.max(count + delta, 0))}
+        onAllRead={() => setUnreadCount(0)}
       />
     </div>
   );
@@ -1,28 +1,47 @@
 import React, { useState, useEffect } from 'react';
 import { XMarkIcon } from '@heroicons/react/24/outline';
-import { getNotifications, markNotificationRead, archiveNotification } from '../api/notifications';
+import {
+  getNotifications,
+  markNotificationRead,
+  markAllNotificationsRead,
+  archiveNotification,
+  subscribeNotifications
+} from '../api/notifications';
 import { Notification, NotificationSeverity } from '../types';
 
 interface NotificationDrawerProps {
   isOpen: boolean;
   onClose: () => void;
+  onUnreadChange: (delta: number) => void;
+  onAllRead: () => void;
 }
 
-const NotificationDrawer: React.FC<NotificationDrawerProps> = ({ isOpen, onClose }) => {
+const NotificationDrawer: React.FC<NotificationDrawerProps> = ({ isOpen, onClose, onUnreadChange, onAllRead }) => {
   const [notifications, setNotifications] = useState<Notification[]>([]);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState<'all' | 'normal' | 'caution' | 'risk'>('all');
 
   useEffect(() => {
-    if (isOpen) {
-      fetchNotifications();
-    }
-  }, [isOpen]);
+    fetchNotifications();
+  }, []);
+
+  // New notifications are pushed by the server, so the list never has to be refetched
+  useEffect(() => {
+    const controller = new AbortController();
+    subscribeNotifications((notification) => {
+      setNotifications((current) => {
+        if (current.some((existing) => existing.id === notification.id)) return current;
+        if (!notification.is_read) onUnreadChange(1);
+        return [notification, ...current];
+      });
+    }, controller.signal);
+    return () => controller.abort();
+  }, []);
 
   const fetchNotifications = async () => {
     try {
       setLoading(true);
-      const data = await getNotifications();
+      const data = await getNotifications({ is_archived: false });
       setNotifications(data);
     } catch (error) {
       console.error('Error fetching notifications:', error);
@@ -34,6 +53,7 @@ const NotificationDrawer: React.FC<NotificationDrawerProps> = ({ isOpen, onClose
   const handleMarkAsRead = async (id: number) => {
     try {
       await markNotificationRead(id);
+      onUnreadChange(-1);
       setNotifications(notifications.map(notification => 
         notification.id === id ? { ...notification, is_read: true } : notification
       ));
@@ -45,6 +65,8 @@ const NotificationDrawer: React.FC<NotificationDrawerProps> = ({ isOpen, onClose
   const handleArchive = async (id: number) => {
     try {
       await archiveNotification(id);
+      const archived = notifications.find(notification => notification.id === id);
+      if (archived && !archived.is_read) onUnreadChange(-1);
       setNotifications(notifications.map(notification => 
         notification.id === id ? { ...notification, is_archived: true } : notification
       ));
@@ -53,6 +75,16 @@ const NotificationDrawer: React.FC<NotificationDrawerProps> = ({ isOpen, onClose
     }
   };
 
+  const handleMarkAllAsRead = async () => {
+    try {
+      await markAllNotificationsRead();
+      onAllRead();
+      setNotifications(notifications.map(notification => ({ ...notification, is_read: true })));
+    } catch (error) {
+      console.error('Error marking all notifications as read:', error);
+    }
+  };
+
   const filteredNotifications = notifications.filter(notification => {
     if (filter === 'all') return !notification.is_archived;
     return notification.severity === filter && !notification.is_archived;
@@ -77,6 +109,9 @@ const NotificationDrawer: React.FC<NotificationDrawerProps> = ({ isOpen, onClose
         {/* Header */}
         <div className="p-4 border-b border-dark-300 flex items-center justify-between">
           <h2 className="text-xl font-heading font-semibold">Notifications</h2>
+          <button onClick={handleMarkAllAsRead} className="ml-auto mr-2 text-xs text-accent hover:underline">
+            Mark all read
+          </button>
           <button onClick={onClose} className="p-1 rounded-full hover:bg-dark-200">
             <XMarkIcon className="h-6 w-6" />
           </button>
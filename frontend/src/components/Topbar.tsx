@@ -3,9 +3,10 @@ import { BellIcon, MagnifyingGlassIcon } from '@heroicons/react/24/outline';
 
 interface TopbarProps {
   toggleNotifications: () => void;
+  unreadCount: number;
 }
 
-const Topbar: React.FC<TopbarProps> = ({ toggleNotifications }) => {
+const Topbar: React.FC<TopbarProps> = ({ toggleNotifications, unreadCount }) => {
   return (
     <header className="bg-dark-100 border-b border-dark-300 py-3 px-4 md:px-6">
       <div className="flex items-center justify-between">
@@ -34,7 +35,11 @@ const Topbar: React.FC<TopbarProps> = ({ toggleNotifications }) => {
             className="relative p-2 rounded-full hover:bg-dark-200"
           >
             <BellIcon className="h-6 w-6 text-light-300" />
-            <span className="absolute top-0 right-0 h-3 w-3 rounded-full bg-status-risk"></span>
+            {unreadCount > 0 && (
+              <span className="absolute -top-1 -right-1 min-w-[1.25rem] h-5 px-1 rounded-full bg-status-risk text-xs leading-5 text-center">
+                {unreadCount > 99 ? '99+' : unreadCount}
+              </span>
+            )}
           </button>
         </div>
       </div>
@@ -62,7 +62,7 @@ const Simulator: React.FC = () => {
       // Add initial fan message
       const initialMessages = [
         {
-          text: "Hey there! How's it going today? 😊",
+          text: response.opening_message,
           sender: 'fan' as const,
           time: new Date()
         }
@@ -67,6 +67,9 @@ const Testing: React.FC = () => {
     return (conversions / impressions) * 100;
   };
 
+  const formatPercent = (value?: number | null) =>
+    value === null || value === undefined ? '–' : `${(value * 100).toFixed(1)}%`;
+
   const getWinningVariant = () => {
     if (!activeTest) return null;
     
@@ -90,6 +93,7 @@ const Testing: React.FC = () => {
     const conversionRateA = calculateConversionRate(variant_a.conversions, variant_a.impressions);
     const conversionRateB = calculateConversionRate(variant_b.conversions, variant_b.impressions);
     const winner = getWinningVariant();
+    const challenger = activeTest.analysis?.variants.find((variant) => !variant.is_control);
     
     return (
       <div className="mt-8">
@@ -153,6 +157,33 @@ const Testing: React.FC = () => {
           </div>
         </div>
         
+        {challenger && (
+          <div className="card mb-6">
+            <h3 className="text-lg font-medium mb-3">Statistics</h3>
+            <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
+              <div>
+                <p className="text-sm text-light-300">Chance B beats A</p>
+                <p className="text-xl font-semibold">{formatPercent(challenger.probability_to_beat_control)}</p>
+              </div>
+              <div>
+                <p className="text-sm text-light-300">Conversion lift (95% CI)</p>
+                <p className="text-xl font-semibold">
+                  {formatPercent(challenger.conversion_lift)}
+                  <span className="text-sm text-light-300 ml-2">
+                    {formatPercent(challenger.conversion_lift_ci?.[0])} to {formatPercent(challenger.conversion_lift_ci?.[1])}
+                  </span>
+                </p>
+              </div>
+              <div>
+                <p className="text-sm text-light-300">Sequential test</p>
+                <p className="text-xl font-semibold">
+                  {challenger.sequential?.significant ? 'Significant' : 'Not yet significant'}
+                </p>
+              </div>
+            </div>
+          </div>
+        )}
+
         <div className="card">
           <h3 className="text-lg font-medium mb-3">AI Analysis</h3>
           
@@ -88,6 +88,7 @@ export interface Notification {
   severity: NotificationSeverity;
   related_id: number | null;
   related_type: string | null;
+  user_id: number | null;
   is_read: boolean;
   is_archived: boolean;
   created_at: string;
@@ -118,6 +119,32 @@ export interface LoginResponse {
   user: User;
 }
 
+export interface VariantAnalysis {
+  key: string;
+  is_control: boolean;
+  impressions: number;
+  conversions: number;
+  revenue: number;
+  conversion_rate: number | null;
+  revenue_per_impression: number | null;
+  conversion_lift?: number | null;
+  conversion_lift_ci?: [number | null, number | null];
+  revenue_lift?: number | null;
+  revenue_lift_ci?: [number | null, number | null];
+  probability_to_beat_control?: number | null;
+  sequential?: {
+    z: number | null;
+    boundary: number | null;
+    p_value: number | null;
+    significant: boolean;
+  };
+}
+
+export interface TestAnalysis {
+  variants: VariantAnalysis[];
+  winner: string | null;
+}
+
 export interface TestResult {
   id: string;
   name: string;
@@ -138,6 +165,7 @@ export interface TestResult {
       revenue: number;
     };
   };
+  analysis?: TestAnalysis | null;
 }
 
 export interface SimulationResponse {
@@ -150,6 +178,7 @@ export interface SimulationResponse {
     interests: string[];
   };
   scenario: string;
+  opening_message: string;
   start_time: string;
 }
 
@@ -168,6 +197,7 @@ export interface SimulationResult {
   simulation_id: string;
   status: string;
   duration_minutes: number;
+  turns: number;
   final_score: number;
   metrics: {
     engagement_rate: number;